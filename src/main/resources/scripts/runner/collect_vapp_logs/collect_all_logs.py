@@ -21,9 +21,9 @@ MS_LITP_LOGS = "/root/litp_logs"
 # COPY COLLECTION SCRIPTS TO MS
 DIR_PATH = os.path.dirname(os.path.realpath(__file__))
 
-scp_scripts = "scp -r {0} root@{1}:/root/{2}".format(
-        DIR_PATH, MS_IP, MS_SCRIPTS_DIR)
-collect_logs_funcs.expect_cmd(scp_scripts, MS_PASSWORD)
+push_scripts = collect_logs_funcs.get_tar_push_cmd(
+        DIR_PATH, "root", MS_IP, "/root/{0}".format(MS_SCRIPTS_DIR))
+collect_logs_funcs.expect_pipe_cmd(push_scripts, MS_PASSWORD)
 
 MS_COLLECT_SCRIPT = "/root/{0}/{1}".format(MS_SCRIPTS_DIR, MS_SCRIPT)
 
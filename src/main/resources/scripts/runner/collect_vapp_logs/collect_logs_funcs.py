@@ -63,6 +63,46 @@ def expect_cmd(command, password):
     print child.before
 
 
+def expect_pipe_cmd(command, password):
+    """
+    Runs a shell pipeline which may prompt once for a password,
+    waiting without a timeout for it to finish.
+    """
+    print command
+    child = pexpect.spawn("/bin/bash", ["-c", command], timeout=None)
+    if child.expect(["password:", pexpect.EOF]) == 0:
+        child.sendline(password)
+        child.expect(pexpect.EOF)
+    # Print the output
+    print child.before
+
+
+def get_tar_pull_cmd(user, host, remote_dir, local_dir):
+    """
+    Returns a pipeline copying a remote directory into a local directory
+    as one compressed tar stream over a single SSH connection, extracted
+    as it arrives. Avoids the per file overhead of scp -r.
+    The peer nodes and the MS share a LAN so the fastest gzip level is
+    used, it still shrinks logs several times.
+    """
+    parent_dir, dir_name = os.path.split(remote_dir.rstrip("/"))
+    return "set -o pipefail; ssh -o StrictHostKeyChecking=no {0}@{1} " \
+           "'tar -C {2} -cf - {3} | gzip -1' | tar -xzf - -C {4}".format(
+               user, host, parent_dir, dir_name, local_dir)
+
+
+def get_tar_push_cmd(local_dir, user, host, remote_dir):
+    """
+    Returns a pipeline copying the contents of a local directory into a
+    remote directory as one compressed tar stream over a single SSH
+    connection, extracted as it arrives.
+    """
+    return "set -o pipefail; tar -C {0} -cf - . | gzip -1 | " \
+           "ssh -o StrictHostKeyChecking=no {1}@{2} " \
+           "'mkdir -p {3} && tar -xzf - -C {3}'".format(
+               local_dir, user, host, remote_dir)
+
+
 def copy_file_bash(source, dest, directory=False):
     """
     NOT USED
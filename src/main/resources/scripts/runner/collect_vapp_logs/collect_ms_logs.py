@@ -17,7 +17,6 @@ Read the README file to find out how to run this script!
 
 import sys
 import subprocess
-import pexpect
 import os.path
 import glob
 import time
@@ -148,13 +147,10 @@ if os.path.isfile(NODES_FILE):
         NODES_LIST = f.readlines()
 
     for node in NODES_LIST:
-        cmd = "scp -o StrictHostKeyChecking=no -r " \
-              "{0}@{1}:/home/{0}/{1} {2}".format(
-            PEER_USER, node.rstrip(), MS_LITP_LOGS)
-        child = pexpect.spawn(cmd)
-        child.expect(["password:", pexpect.EOF])
-        child.sendline(PEER_PASSWORD)
-        child.expect(pexpect.EOF)
+        cmd = collect_logs_funcs.get_tar_pull_cmd(
+            PEER_USER, node.rstrip(),
+            "/home/{0}/{1}".format(PEER_USER, node.rstrip()), MS_LITP_LOGS)
+        collect_logs_funcs.expect_pipe_cmd(cmd, PEER_PASSWORD)
 else:
     print "{0} NOT FOUND. COULD NOT SCP PEER NODE LOGS TO MS.\n" \
           "-- Only the MS logs will be tarred...".format(NODES_FILE)
@@ -67,7 +67,9 @@ for node in PEER_NODES.splitlines():
         node_dir.run_cmds()
 
         # Read file of logs to copy and copy them to directory created on node
+        # All copies run in one su session rather than one session per file
         print "COPYING FILES TO TEMP DIRECTORY..."
+        cp_cmds = []
         for line in COPY_LOGS:
             line = line.rstrip()
             cp_from = line.split()[0]
@@ -79,9 +81,11 @@ for node in PEER_NODES.splitlines():
             if cp_from[-1] == '/':
                 cmd += " -r"
 
-            copy_file = RunSUCommands(hostname, PEER_USER,
-                                      PEER_PASSWORD, PEER_SU_PASSWORD, cmd)
-            copy_file.run_su_cmds()
+            cp_cmds.append(cmd)
+
+        copy_files = RunSUCommands(hostname, PEER_USER, PEER_PASSWORD,
+                                   PEER_SU_PASSWORD, "\n".join(cp_cmds))
+        copy_files.run_su_cmds()
 
         # Read file of commands to run, run them on the node and save each
         #   commands output to a file in the directory created on node
@@ -96,7 +100,7 @@ for node in PEER_NODES.splitlines():
             exec_cmd.run_su_cmds()
 
         # Change user permissions on all files in
-        # created log directory so they can be SCPed
+        # created log directory so they can be streamed to the MS
         cmd = "chmod -R 745 {0}/*".format(peer_dir)
 
         run_cmd = RunSUCommands(hostname, PEER_USER,
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+'''
+COPYRIGHT Ericsson 2019
+The copyright to the computer program(s) herein is the property of
+Ericsson Inc. The programs may be used and/or copied only with written
+permission from Ericsson Inc. or in accordance with the terms and
+conditions stipulated in the agreement/contract under which the
+program(s) have been supplied.
+
+@since:     October 2026
+@summary:   History of test case durations used to shard test runs
+'''
+
+import heapq
+import json
+import os
+import threading
+
+
+class TestDurations(object):
+    """
+    Keeps the duration of each test case over past runs in a local file,
+    and splits test lists into shards of about the same total duration.
+
+    Shards are only complementary if every executor splits the same list
+    with the same history, so all executors of a sharded run must be given
+    the same history file, frozen so no shard changes it during the run.
+    """
+
+    DEFAULT_DURATIONS_FILE = os.path.expanduser(
+        "~/.litp_test_durations.json")
+
+    # Weight of the latest run in the recorded duration
+    SMOOTHING = 0.5
+
+    # Duration of a test case with no history, if no test case has one
+    DEFAULT_SECS = 60.0
+
+    def __init__(self, durations_file=None, frozen=False):
+        """
+        Initialise the history, loading the history file if it exists.
+
+        Kwargs:
+            durations_file (str): Path of the history file. Defaults to
+                LITP_TEST_DURATIONS from the environment or
+                ~/.litp_test_durations.json.
+
+            frozen (bool): If set, durations are not recorded and the
+                history file is never written, e.g. while it is the
+                snapshot the shards of a run are split from.
+        """
+        self.durations_file = durations_file or \
+            os.environ.get("LITP_TEST_DURATIONS",
+                           self.DEFAULT_DURATIONS_FILE)
+        self.frozen = frozen
+        # test key -> duration in seconds
+        self.durations = dict()
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.durations_file) as durations:
+                self.durations = dict((str(key), float(secs)) for key, secs
+                                      in json.load(durations).iteritems())
+        except (IOError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def get_test_key(test_file, test_name):
+        """
+        Returns the key of a test case in the history, which does not
+        depend on where the tests are checked out.
+
+        Args:
+            test_file (str): Path of the test file.
+
+            test_name (str): Name of the test method.
+
+        Returns:
+            str. The key, e.g. 'testset_story123.py.test_01_p_create'.
+        """
+        return "{0}.{1}".format(os.path.basename(test_file), test_name)
+
+    @staticmethod
+    def parse_time_taken(time_taken):
+        """
+        Parses a duration as nose prints it.
+
+        Args:
+            time_taken (str): The duration, e.g. '12.345s'.
+
+        Returns:
+            float. The duration in seconds or None if it cannot be parsed.
+        """
+        try:
+            return float(str(time_taken).rstrip("s"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def parse_shard(shard):
+        """
+        Parses a shard option.
+
+        Args:
+            shard (str): The shard to run and the number of shards, e.g.
+                '2/4' for the second of four shards.
+
+        Returns:
+            int, int. The index of the shard, from 0, and the number of
+            shards.
+
+        Raises:
+            ValueError if the option is not valid.
+        """
+        index, count = [int(part) for part in shard.split("/")]
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError("Shard {0} is not in 1/N..N/N".format(shard))
+
+        return index - 1, count
+
+    def record(self, test_key, secs):
+        """
+        Records the duration of a run of a test case.
+
+        Args:
+            test_key (str): The key of the test case.
+
+            secs (float): The duration in seconds.
+        """
+        if self.frozen:
+            return
+
+        with self.lock:
+            if test_key in self.durations:
+                self.durations[test_key] = \
+                    self.SMOOTHING * secs + \
+                    (1 - self.SMOOTHING) * self.durations[test_key]
+            else:
+                self.durations[test_key] = secs
+
+    def get(self, test_key):
+        """
+        Returns the expected duration of a test case.
+
+        Args:
+            test_key (str): The key of the test case.
+
+        Returns:
+            float. The recorded duration or, for a test case with no
+            history, the median duration of all test cases.
+        """
+        with self.lock:
+            if test_key in self.durations:
+                return self.durations[test_key]
+            known = sorted(self.durations.values())
+
+        if not known:
+            return self.DEFAULT_SECS
+
+        return known[len(known) / 2]
+
+    def save(self):
+        """
+        Writes the history file, unless the history is frozen. Errors are
+        ignored, the history is then only missing the durations of this run.
+        """
+        if self.frozen:
+            return
+
+        with self.lock:
+            durations = dict(self.durations)
+
+        tmp_file = "{0}.{1}".format(self.durations_file, os.getpid())
+        try:
+            with open(tmp_file, "w") as durations_fd:
+                json.dump(durations, durations_fd, indent=1, sort_keys=True)
+            os.rename(tmp_file, self.durations_file)
+        except (IOError, OSError) as except_err:
+            print "WARNING: Cannot save test durations {0}: {1}".format(
+                self.durations_file, except_err)
+
+    def split(self, test_ids, shard_count, get_key, chains=(), weights=None):
+        """
+        Splits test cases into shards of about the same expected duration,
+        longest first onto the least loaded shard. Test cases of a chain
+        stay in the same shard.
+
+        Args:
+            test_ids (list): The test cases, in the order they run.
+
+            shard_count (int): The number of shards.
+
+            get_key (function): Called with a test id, returns its key in
+                the history.
+
+        Kwargs:
+            chains (list): Lists of test ids which must run in the same
+                shard, e.g. those of an ordered_tcs.txt file.
+
+            weights (dict): Test id mapped to a factor applied to its
+                expected duration, e.g. 0 for test cases which are skipped.
+
+        Returns:
+            list. The test ids of each shard, in the order of test_ids.
+        """
+        weights = weights or dict()
+        positions = dict()
+        for position, test_id in enumerate(test_ids):
+            positions.setdefault(test_id, position)
+
+        # Each test case is in one unit, a chain or on its own
+        unit_of = dict()
+        for chain in chains:
+            unit = [test_id for test_id in chain
+                    if test_id in positions and test_id not in unit_of]
+            for test_id in unit:
+                unit_of[test_id] = unit
+        units = []
+        for test_id in sorted(positions, key=positions.get):
+            if test_id in unit_of and test_id != unit_of[test_id][0]:
+                continue
+            units.append(unit_of.get(test_id, [test_id]))
+
+        def get_cost(unit):
+            """Returns the expected duration of a unit"""
+            return sum([self.get(get_key(test_id)) *
+                        weights.get(test_id, 1) for test_id in unit])
+
+        units.sort(key=lambda unit: (-get_cost(unit),
+                                     min([positions[test_id]
+                                          for test_id in unit])))
+
+        loads = [(0.0, index) for index in range(shard_count)]
+        shard_of = dict()
+        for unit in units:
+            load, index = heapq.heappop(loads)
+            for test_id in unit:
+                shard_of[test_id] = index
+            heapq.heappush(loads, (load + get_cost(unit), index))
+
+        return [[test_id for test_id in test_ids
+                 if shard_of.get(test_id) == index]
+                for index in range(shard_count)]
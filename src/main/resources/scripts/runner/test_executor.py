@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+'''
+COPYRIGHT Ericsson 2019
+The copyright to the computer program(s) herein is the property of
+Ericsson Inc. The programs may be used and/or copied only with written
+permission from Ericsson Inc. or in accordance with the terms and
+conditions stipulated in the agreement/contract under which the
+program(s) have been supplied.
+
+@since:     October 2026
+@summary:   Runs python test cases in the test runner process
+'''
+
+import imp
+import os
+import sys
+import time
+import traceback
+import unittest
+from xml.sax.saxutils import quoteattr
+
+
+class ResultCollector(unittest.TestResult):
+    """
+    Test result recording the type and message of each error, failure and
+    skip as well as the formatted traceback kept by unittest.
+    """
+
+    def __init__(self):
+        """ Initialise the result """
+        unittest.TestResult.__init__(self)
+        # (outcome, exception type, message, traceback) for each problem
+        self.problems = []
+
+    def addError(self, test, err):
+        """ Record an error raised by a test or its fixtures """
+        unittest.TestResult.addError(self, test, err)
+        self.problems.append(("ERROR", self.get_type_name(err[0]),
+                              str(err[1]), self.errors[-1][1]))
+
+    def addFailure(self, test, err):
+        """ Record a failed assertion """
+        unittest.TestResult.addFailure(self, test, err)
+        self.problems.append(("FAIL", self.get_type_name(err[0]),
+                              str(err[1]), self.failures[-1][1]))
+
+    def addSkip(self, test, reason):
+        """ Record a skipped test """
+        unittest.TestResult.addSkip(self, test, reason)
+        self.problems.append(("SKIPPED", "unittest.case.SkipTest", reason,
+                              reason))
+
+    @staticmethod
+    def get_type_name(exc_type):
+        """
+        Returns the full name of an exception type, as nose writes it.
+
+        Args:
+            exc_type (type): The exception type.
+
+        Returns:
+            str. The module and name of the type.
+        """
+        return "{0}.{1}".format(exc_type.__module__, exc_type.__name__)
+
+    def get_outcome(self):
+        """
+        Returns the outcome of the test.
+
+        Returns:
+            str. ERROR, FAIL, SKIPPED or PASS.
+        """
+        for outcome in ["ERROR", "FAIL", "SKIPPED"]:
+            if [problem for problem in self.problems
+                    if problem[0] == outcome]:
+                return outcome
+
+        return "PASS"
+
+
+class TestExecutor(object):
+    """
+    Runs selected test cases in this process. Test modules are loaded once
+    and the test utilities they import, their parsed connection data and
+    open SSH connections are shared by all tests of the run.
+
+    Each test writes its output to its own file, and a nose compatible
+    xunit file, so reports are built as with a nosetests process per test.
+    """
+
+    def __init__(self):
+        """ Initialise the executor """
+        # test file path -> loaded module
+        self.modules = dict()
+        # One dict per test run, in the order they ran
+        self.results = []
+
+        # Tests import the utilities as nosetests processes did, from the
+        # PYTHONPATH set by the runner
+        for path in os.environ.get("PYTHONPATH", "").split(":"):
+            if path and path not in sys.path:
+                sys.path.append(path)
+
+    def load_module(self, test_file):
+        """
+        Loads a test file as a module, once.
+
+        Args:
+            test_file (str): Path of the test file.
+
+        Returns:
+            module. The loaded module.
+        """
+        test_file = os.path.abspath(test_file)
+        if test_file in self.modules:
+            return self.modules[test_file]
+
+        test_dir = os.path.dirname(test_file)
+        if test_dir not in sys.path:
+            sys.path.insert(0, test_dir)
+
+        module_name = os.path.splitext(os.path.basename(test_file))[0]
+        loaded = sys.modules.get(module_name)
+        if loaded and os.path.splitext(
+                os.path.abspath(getattr(loaded, "__file__", "")))[0] != \
+                os.path.splitext(test_file)[0]:
+            # Test files of other directories may have the same name
+            module_name = "{0}_{1}".format(module_name, len(self.modules))
+
+        module = imp.load_source(module_name, test_file)
+        self.modules[test_file] = module
+
+        return module
+
+    @staticmethod
+    def __redirect_output(output_file):
+        """
+        Points stdout and stderr of the process at a file, so output of
+        loggers, prints and child processes all go to it.
+
+        Args:
+            output_file (file): The open output file.
+
+        Returns:
+            int, int. Copies of the original stdout and stderr descriptors.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        output_file.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        os.dup2(output_file.fileno(), 1)
+        os.dup2(output_file.fileno(), 2)
+
+        return saved_fds
+
+    @staticmethod
+    def __restore_output(saved_fds):
+        """
+        Restores stdout and stderr of the process.
+
+        Args:
+            saved_fds (tuple): The descriptors from __redirect_output.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        os.close(saved_fds[0])
+        os.close(saved_fds[1])
+
+    def run_test(self, test_file, class_name, test_name, output_file,
+                 xunit_file=None):
+        """
+        Runs a test case, with the setUp and tearDown of its class.
+
+        Args:
+            test_file (str): Path of the test file.
+
+            class_name (str): Name of the test class.
+
+            test_name (str): Name of the test method.
+
+            output_file (file): Open file the test output is written to.
+
+        Kwargs:
+            xunit_file (str): Path of the xunit file to write, if any.
+
+        Returns:
+            dict. The result of the test, with its outcome as 'result'
+            (PASS, FAIL, ERROR or SKIPPED), 'time_taken' as nose prints it,
+            e.g. '1.234s', and 'start'/'stop' times in milliseconds.
+        """
+        collector = ResultCollector()
+        start_time = time.time()
+
+        saved_fds = self.__redirect_output(output_file)
+        try:
+            try:
+                test_class = getattr(self.load_module(test_file), class_name)
+                suite = unittest.TestSuite([test_class(test_name)])
+            except Exception:
+                exc_info = sys.exc_info()
+                collector.problems.append(
+                    ("ERROR", collector.get_type_name(exc_info[0]),
+                     str(exc_info[1]), traceback.format_exc()))
+            else:
+                suite.run(collector)
+        finally:
+            self.__restore_output(saved_fds)
+
+        stop_time = time.time()
+        module_name = os.path.splitext(os.path.basename(test_file))[0]
+
+        for outcome, _, _, details in collector.problems:
+            if outcome != "SKIPPED":
+                output_file.write("{0}\n{1}: {2} ({3}.{4})\n{5}\n{6}\n"
+                                  .format("=" * 70, outcome, test_name,
+                                          module_name, class_name, "-" * 70,
+                                          details))
+
+        result = {"test_file": test_file,
+                  "class": class_name,
+                  "name": test_name,
+                  "result": collector.get_outcome(),
+                  "time_taken": "{0:.3f}s".format(stop_time - start_time),
+                  "start": int(round(start_time * 1000)),
+                  "stop": int(round(stop_time * 1000)),
+                  "problems": collector.problems}
+        self.results.append(result)
+
+        if xunit_file:
+            self.write_xunit(xunit_file, "{0}.{1}".format(module_name,
+                                                          class_name),
+                             test_name, stop_time - start_time,
+                             collector.problems)
+
+        return result
+
+    @staticmethod
+    def write_xunit(xunit_file, classname, test_name, elapsed, problems):
+        """
+        Writes the xunit file of one test, in the nose xunit format.
+
+        Args:
+            xunit_file (str): Path of the xunit file.
+
+            classname (str): Module and class of the test.
+
+            test_name (str): Name of the test method.
+
+            elapsed (float): Duration of the test in seconds.
+
+            problems (list): (outcome, exception type, message, traceback)
+                for each problem, as recorded by ResultCollector.
+        """
+        tags = {"ERROR": "error", "FAIL": "failure", "SKIPPED": "skipped"}
+        counts = dict((outcome, len([problem for problem in problems
+                                     if problem[0] == outcome]))
+                      for outcome in tags)
+
+        body = "".join(["<{0} type={1} message={2}><![CDATA[{3}]]></{0}>"
+                        .format(tags[outcome], quoteattr(exc_type),
+                                quoteattr(message),
+                                details.replace("]]>", "]]>]]&gt;<![CDATA["))
+                        for outcome, exc_type, message, details in problems])
+
+        with open(xunit_file, "w") as xunit:
+            xunit.write('<?xml version="1.0" encoding="UTF-8"?>'
+                        '<testsuite name="nosetests" tests="1" errors="{0}" '
+                        'failures="{1}" skip="{2}">'
+                        '<testcase classname={3} name={4} time="{5:.3f}">'
+                        '{6}</testcase></testsuite>'
+                        .format(counts["ERROR"], counts["FAIL"],
+                                counts["SKIPPED"], quoteattr(classname),
+                                quoteattr(test_name), elapsed, body))
+
+    @staticmethod
+    def write_skipped_xunit(xunit_file):
+        """
+        Writes the xunit file of a test which is not run, as nosetests
+        --exclude writes it once its skip count is set.
+
+        Args:
+            xunit_file (str): Path of the xunit file.
+        """
+        with open(xunit_file, "w") as xunit:
+            xunit.write('<?xml version="1.0" encoding="UTF-8"?>'
+                        '<testsuite name="nosetests" tests="0" errors="0" '
+                        'failures="0" skip="1"></testsuite>')
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+
+'''
+COPYRIGHT Ericsson 2019
+The copyright to the computer program(s) herein is the property of
+Ericsson Inc. The programs may be used and/or copied only with written
+permission from Ericsson Inc. or in accordance with the terms and
+conditions stipulated in the agreement/contract under which the
+program(s) have been supplied.
+
+@since:     October 2026
+@summary:   Index of python test cases found by parsing testset files
+'''
+
+import ast
+import hashlib
+import json
+import os
+
+
+class TestIndex(object):
+    """
+    Finds the test cases of testset*.py files by parsing each file once with
+    ast, extracting test names, @attr tags, @tmsid ids and docstrings
+    together.
+
+    Results are kept in an index file keyed by file path. A file is parsed
+    again only if its modification time or size changed and its md5
+    checksum no longer matches.
+    """
+
+    # Bump when the format of the test entries changes
+    VERSION = 1
+
+    DEFAULT_INDEX_FILE = os.path.expanduser("~/.litp_test_index.json")
+
+    def __init__(self, index_file=None):
+        """
+        Initialise the index, loading the index file if it exists.
+
+        Kwargs:
+            index_file (str): Path of the index file. Defaults to
+                LITP_TEST_INDEX from the environment or
+                ~/.litp_test_index.json.
+        """
+        self.index_file = index_file or \
+            os.environ.get("LITP_TEST_INDEX", self.DEFAULT_INDEX_FILE)
+        self.files = dict()
+        self.changed = False
+
+        try:
+            with open(self.index_file) as index:
+                data = json.load(index)
+            if data.get("version") == self.VERSION:
+                self.files = self.to_str(data["files"])
+        except (IOError, ValueError, KeyError):
+            pass
+
+    @classmethod
+    def to_str(cls, value):
+        """
+        Converts the unicode strings loaded from the index file back to utf-8
+        encoded strings, as read from the test files.
+
+        Args:
+            value: A value loaded from the index file.
+
+        Returns:
+            The value with str in place of unicode.
+        """
+        if isinstance(value, unicode):
+            return value.encode("utf-8")
+        if isinstance(value, list):
+            return [cls.to_str(item) for item in value]
+        if isinstance(value, dict):
+            return dict((cls.to_str(key), cls.to_str(item))
+                        for key, item in value.iteritems())
+
+        return value
+
+    @staticmethod
+    def find_test_files(test_dir):
+        """
+        Finds all testset*.py files under a directory.
+
+        Args:
+            test_dir (str): The directory to search.
+
+        Returns:
+            list. Paths of the test files, sorted.
+        """
+        test_files = []
+
+        for dirpath, dirnames, filenames in os.walk(test_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.startswith("testset") and \
+                        filename.endswith(".py"):
+                    test_files.append(os.path.join(dirpath, filename))
+
+        return test_files
+
+    @staticmethod
+    def get_literal(node):
+        """
+        Returns the value of a decorator argument.
+
+        Args:
+            node (ast.AST): The argument.
+
+        Returns:
+            The value if the argument is a literal, otherwise its name or
+            None.
+        """
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            if isinstance(node, ast.Name):
+                return node.id
+            if isinstance(node, ast.Attribute):
+                return node.attr
+
+        return None
+
+    @classmethod
+    def get_decorators(cls, node):
+        """
+        Returns the arguments of the decorators of a function or class.
+
+        Args:
+            node (ast.AST): The function or class definition.
+
+        Returns:
+            list. (name, args, kwargs) for each decorator which is called.
+        """
+        decorators = []
+
+        for decorator in node.decorator_list:
+            if not isinstance(decorator, ast.Call):
+                continue
+            func = decorator.func
+            if isinstance(func, ast.Name):
+                name = func.id
+            elif isinstance(func, ast.Attribute):
+                name = func.attr
+            else:
+                continue
+            args = [cls.get_literal(arg) for arg in decorator.args]
+            kwargs = dict((keyword.arg, cls.get_literal(keyword.value))
+                          for keyword in decorator.keywords)
+            decorators.append((name, args, kwargs))
+
+        return decorators
+
+    @classmethod
+    def get_attrs(cls, node):
+        """
+        Returns the nose attributes set by @attr decorators.
+
+        Args:
+            node (ast.AST): The function or class definition.
+
+        Returns:
+            list, dict, bool. Positional tags, keyword attributes and True
+            if the node has an @attr decorator.
+        """
+        tags = []
+        kwargs = dict()
+        has_attr = False
+
+        for name, dec_args, dec_kwargs in cls.get_decorators(node):
+            if name == "attr":
+                has_attr = True
+                tags.extend([str(arg) for arg in dec_args])
+                kwargs.update(dec_kwargs)
+
+        return tags, kwargs, has_attr
+
+    @staticmethod
+    def get_doc_lines(lines, node):
+        """
+        Returns the source lines of a test from its def line to the end of
+        its docstring.
+
+        Args:
+            lines (list): Lines of the test file.
+
+            node (ast.FunctionDef): The test definition.
+
+        Returns:
+            list. The lines.
+        """
+        index = node.lineno - 1
+        # The line number of a decorated function may be its first decorator
+        while index < len(lines) and \
+                "def {0}(".format(node.name) not in lines[index]:
+            index += 1
+
+        doc_lines = lines[index:index + 1]
+        if ast.get_docstring(node) is None:
+            return doc_lines
+
+        opened = False
+        for line in lines[index + 1:]:
+            doc_lines.append(line)
+            quotes = line.count('"""') + line.count("'''")
+            if quotes and (opened or quotes > 1):
+                break
+            if quotes:
+                opened = True
+
+        return doc_lines
+
+    @classmethod
+    def parse_file(cls, test_file, source):
+        """
+        Parses a test file.
+
+        Args:
+            test_file (str): Path of the test file.
+
+            source (str): Contents of the test file.
+
+        Returns:
+            list. A dict for each test method of each class in the file, in
+            the order of the file.
+        """
+        try:
+            tree = ast.parse(source, test_file)
+        except SyntaxError as except_err:
+            print "WARNING: Cannot parse {0}: {1}".format(test_file,
+                                                          except_err)
+            return []
+
+        lines = source.splitlines()
+        tests = []
+
+        for class_node in tree.body:
+            if not isinstance(class_node, ast.ClassDef):
+                continue
+            class_tags, class_kwargs = cls.get_attrs(class_node)[:2]
+            class_attrs = dict((tag, True) for tag in class_tags)
+            class_attrs.update(class_kwargs)
+
+            for node in class_node.body:
+                if not isinstance(node, ast.FunctionDef) or \
+                        not node.name.startswith("test_"):
+                    continue
+                tags, kwargs, has_attr = cls.get_attrs(node)
+                tms_ids = []
+                for name, dec_args, _ in cls.get_decorators(node):
+                    if name == "tmsid":
+                        tms_ids.extend([str(arg) for arg in dec_args])
+
+                tests.append({"file": test_file,
+                              "class": class_node.name,
+                              "name": node.name,
+                              "line": node.lineno,
+                              "tags": tags,
+                              "attr_kwargs": kwargs,
+                              "has_attr": has_attr,
+                              "class_attrs": class_attrs,
+                              "tms_ids": tms_ids,
+                              "docstring": ast.get_docstring(node) or "",
+                              "doc_lines": cls.get_doc_lines(lines, node)})
+
+        return tests
+
+    def get_file_tests(self, test_file):
+        """
+        Returns the tests of a file, parsing it only if it changed since it
+        was indexed.
+
+        Args:
+            test_file (str): Path of the test file.
+
+        Returns:
+            list. The tests, as returned by parse_file.
+        """
+        file_stat = os.stat(test_file)
+        entry = self.files.get(test_file)
+
+        if entry and entry["mtime"] == file_stat.st_mtime and \
+                entry["size"] == file_stat.st_size:
+            return entry["tests"]
+
+        with open(test_file) as test_fd:
+            source = test_fd.read()
+        checksum = hashlib.md5(source).hexdigest()
+
+        if not entry or entry["md5"] != checksum:
+            entry = {"md5": checksum,
+                     "tests": self.parse_file(test_file, source)}
+
+        entry["mtime"] = file_stat.st_mtime
+        entry["size"] = file_stat.st_size
+        self.files[test_file] = entry
+        self.changed = True
+
+        return entry["tests"]
+
+    def find_tests(self, test_dir):
+        """
+        Finds all tests under a directory and saves the index.
+
+        Args:
+            test_dir (str): The directory to search.
+
+        Returns:
+            list. The tests, as returned by parse_file, ordered by file and
+            then by their order in the file.
+        """
+        tests = []
+
+        for test_file in self.find_test_files(test_dir):
+            tests.extend(self.get_file_tests(test_file))
+
+        self.save()
+
+        return tests
+
+    def get_test(self, test_file, test_name):
+        """
+        Returns a test of a file.
+
+        Args:
+            test_file (str): Path of the test file.
+
+            test_name (str): Name of the test method.
+
+        Returns:
+            dict. The test or None if the file has no such test.
+        """
+        if not os.path.isfile(test_file):
+            return None
+
+        for test in self.get_file_tests(test_file):
+            if test["name"] == test_name:
+                return test
+
+        return None
+
+    def save(self):
+        """
+        Writes the index file if the index changed. Errors are ignored, the
+        index is then built again by the next run.
+        """
+        if not self.changed:
+            return
+
+        tmp_file = "{0}.{1}".format(self.index_file, os.getpid())
+        try:
+            with open(tmp_file, "w") as index:
+                json.dump({"version": self.VERSION, "files": self.files},
+                          index)
+            os.rename(tmp_file, self.index_file)
+            self.changed = False
+        except (IOError, OSError) as except_err:
+            print "WARNING: Cannot save test index {0}: {1}".format(
+                self.index_file, except_err)
+
+    @staticmethod
+    def get_attr_str(test):
+        """
+        Returns the @attr decorator of a test as written in the legacy
+        format, e.g. "@attr('all', 'revert')".
+
+        Args:
+            test (dict): The test.
+
+        Returns:
+            str. The decorator or an empty string if the test has none.
+        """
+        if not test["has_attr"]:
+            return ""
+
+        args = ["'{0}'".format(tag) for tag in test["tags"]]
+        args.extend(["{0}='{1}'".format(key, value) for key, value
+                     in sorted(test["attr_kwargs"].items())])
+
+        return "@attr({0})".format(", ".join(args))
+
+    @staticmethod
+    def get_attrs_of_test(test):
+        """
+        Returns all nose attributes of a test, with those of its class.
+
+        Args:
+            test (dict): The test.
+
+        Returns:
+            dict. Attribute name mapped to its value.
+        """
+        attrs = dict(test["class_attrs"])
+        attrs.update((tag, True) for tag in test["tags"])
+        attrs.update(test["attr_kwargs"])
+
+        return attrs
+
+    @classmethod
+    def matches_attr(cls, test, attr_expr):
+        """
+        Checks a test against a nose -a attribute expression, with the
+        semantics of the nose attrib plugin.
+
+        Args:
+            test (dict): The test.
+
+            attr_expr (str): The expression, e.g. 'all', '!manual' or
+                'speed=slow'. Comma separated expressions must all match.
+
+        Returns:
+            bool. True if the test matches.
+        """
+        attrs = cls.get_attrs_of_test(test)
+
+        for expr in attr_expr.strip().split(","):
+            expr = expr.strip()
+            if not expr:
+                continue
+            if "=" in expr:
+                key, value = expr.split("=", 1)
+            elif expr.startswith("!"):
+                key, value = expr[1:], False
+            else:
+                key, value = expr, True
+            attr = attrs.get(key)
+
+            if value is True:
+                matched = bool(attr)
+            elif value is False:
+                matched = not attr
+            elif isinstance(attr, list):
+                matched = value.lower() in [str(item).lower()
+                                            for item in attr]
+            else:
+                matched = value.lower() == str(attr).lower()
+
+            if not matched:
+                return False
+
+        return True
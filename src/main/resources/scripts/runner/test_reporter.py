@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+
+'''
+COPYRIGHT Ericsson 2019
+The copyright to the computer program(s) herein is the property of
+Ericsson Inc. The programs may be used and/or copied only with written
+permission from Ericsson Inc. or in accordance with the terms and
+conditions stipulated in the agreement/contract under which the
+program(s) have been supplied.
+
+@since:     October 2026
+@summary:   Builds the HTML, JSON and Allure test reports as results come in
+'''
+
+import json
+import os
+import shutil
+import time
+
+
+class TestReporter(object):
+    """
+    Builds the test reports one result at a time. Each result is counted
+    and rendered once, when it is added, so the reports can be written
+    after every test case and writing the final reports only joins the
+    rendered results.
+
+    Results are the report rows of the test runner:
+    [name, description, doc link, result, time taken, log link, module]
+    for the HTML report and
+    [test file, test name, log file, result, start, stop, tms doc,
+    doc file, module] for the Allure report, the module being included
+    only with the module report.
+    """
+
+    STATUSES = ["PASS", "FAIL", "ERROR", "SKIPPED"]
+
+    ALLURE_STATUSES = {"PASS": "passed", "FAIL": "failed",
+                       "ERROR": "broken", "SKIPPED": "skipped"}
+
+    HTML_REPORT = "test_report.html"
+    JSON_REPORT = "test_report.json"
+    ALLURE_DIR = "allure_reporting"
+    ALLURE_REPORT = "allure_report-testsuite.xml"
+
+    def __init__(self, results_dir, include_module_report=False):
+        """
+        Initialise the reporter.
+
+        Args:
+            results_dir (str): Directory the reports are written to.
+
+        Kwargs:
+            include_module_report (bool): Report the results of each
+                module, taken from the last column of the report rows.
+        """
+        self.results_dir = results_dir
+        self.include_module_report = include_module_report
+        # Results of each status, overall and per module
+        self.counts = dict((status, 0) for status in self.STATUSES)
+        self.module_counts = dict()
+        # id of a report row -> (row, rendered html, json entry). The row
+        # is kept so its id is not reused.
+        self.__results = dict()
+        # id of an allure row -> (row, rendered test case)
+        self.__allure_results = dict()
+
+    @staticmethod
+    def replace_xml_chars(text):
+        """
+        Replace any xml characters with the escaped xml representation:
+        '&' = '&amp;', '<' = '&lt;', '>' = '&gt;'
+
+        Args:
+            text (str): String of text to be formatted.
+
+        Returns:
+            str: Reformatted string.
+        """
+        return text.replace("&", "&amp;").replace("<", "&lt;")\
+            .replace(">", "&gt;")
+
+    def __write_file(self, file_path, content):
+        """
+        Writes a report file in one go, so a partial report being read is
+        never half written.
+
+        Args:
+            file_path (str): Path of the report file.
+
+            content (str): The report.
+        """
+        tmp_file = "{0}.{1}".format(file_path, os.getpid())
+        with open(tmp_file, "w") as fopen:
+            fopen.write(content)
+        os.rename(tmp_file, file_path)
+
+    def add_result(self, line):
+        """
+        Counts and renders the result of a test case, once.
+
+        Args:
+            line (list): The report row of the test case.
+        """
+        if id(line) in self.__results:
+            return
+
+        if line[3] in self.counts:
+            self.counts[line[3]] += 1
+            if self.include_module_report:
+                if line[6] not in self.module_counts:
+                    self.module_counts[line[6]] = dict(
+                        (status, 0) for status in self.STATUSES)
+                self.module_counts[line[6]][line[3]] += 1
+
+        html = "<tr>\n"
+        if self.include_module_report:
+            html += "<td>{0}</td>\n".format(line[6])
+        html += "<td>{0}</td>\n".format(line[0])
+        html += "<td>{0}</td>\n".format(line[1])
+        html += '<td><pre><a href="{0}">Doc Link</a><br></pre></td>'\
+            .format(line[2])
+        if line[3] == "PASS":
+            html += '<td bgcolor="#80FF00">\n'
+        if line[3] == "FAIL" or line[3] == "ERROR":
+            html += '<td bgcolor="#FF0000">\n'
+        if line[3] == "SKIPPED":
+            html += '<td bgcolor="#FACC2E">\n'
+        html += "{0}</td>\n".format(line[3])
+        html += "<td>{0}</td>\n".format(line[4])
+        if line[3] == "SKIPPED":
+            html += '<td></td>'
+        else:
+            html += '<td><pre><a href="{0}">Logs</a><br></pre></td>'\
+                .format(line[5])
+        html += "</tr>\n"
+
+        entry = {"name": line[0],
+                 "description": line[1],
+                 "doc_link": line[2],
+                 "result": line[3],
+                 "time_taken": line[4],
+                 "log_link": line[5]}
+        if self.include_module_report:
+            entry["module"] = line[6]
+
+        self.__results[id(line)] = (line, html, entry)
+
+    def add_allure_result(self, line):
+        """
+        Renders the Allure test case of a result, once, copying its log
+        and documentation as attachments.
+
+        Args:
+            line (list): The Allure row of the test case.
+        """
+        if id(line) in self.__allure_results:
+            return
+
+        allure_report_dir = os.path.join(self.results_dir, self.ALLURE_DIR)
+        if not os.path.isdir(allure_report_dir):
+            os.mkdir(allure_report_dir)
+
+        tms_doc = line[6]
+        testfilename = line[0].replace(".py", "").replace("testset_", "")
+        testcase_doc_file = "{0}_{1}_documentation-attachment.txt".format(
+            testfilename, line[1])
+        testcase_report_file = "{0}_{1}-attachment.txt".format(testfilename,
+                                                               line[1])
+        # COPY REPORT FILES
+        for source, attachment in [(line[2], testcase_report_file),
+                                   (line[7], testcase_doc_file)]:
+            try:
+                shutil.copy(os.path.join(self.results_dir, source),
+                            os.path.join(allure_report_dir, attachment))
+            except (IOError, OSError):
+                pass
+
+        case = ""
+        if line[3] in self.ALLURE_STATUSES:
+            case += '    <test-case start="{0}" status="{1}" stop="{2}">\n'\
+                .format(line[4], self.ALLURE_STATUSES[line[3]], line[5])
+        if "add_to_allure" in tms_doc:
+            case += '     <name>{0} - {1} - {2}</name>\n'.format(
+                testfilename, line[1],
+                self.replace_xml_chars(tms_doc["tms_id"]))
+            case += '     <title>{0}</title>\n'.format(
+                self.replace_xml_chars(tms_doc["tms_title"]))
+            case += '     <description>{0}</description>\n'.format(
+                self.replace_xml_chars(tms_doc["tms_description"]))
+        else:
+            case += '     <name>{0} - {1}</name>\n'.format(testfilename,
+                                                          line[1])
+        case += '     <attachments>\n'
+        case += '       <attachment source="{0}" title="test_log.txt" ' \
+            'type="text/plain"/>\n'.format(testcase_report_file)
+        case += '       <attachment source="{0}" title="test_doc.txt" ' \
+            'type="text/plain"/>\n'.format(testcase_doc_file)
+        case += '     </attachments>\n'
+        case += '     <labels>\n'
+        if self.include_module_report:
+            case += '       <label name="feature" value="{0}"/>\n'.format(
+                line[8])
+        else:
+            case += '       <label name="feature" value="{0}"/>\n'.format(
+                os.environ.get("JOB_NAME", "LITP"))
+        if "add_to_allure" in tms_doc and 'tms_story_title' in tms_doc:
+            for stor in tms_doc["tms_story_title"]:
+                case += '       <label name="story" value="{0}"/>\n'.format(
+                    stor)
+            case += '       <label name="execution_type" value="{0}"/>\n'\
+                .format(tms_doc["tms_execution_type"])
+            case += '       <label name="testId" value="{0}"/>\n'.format(
+                tms_doc["tms_id"])
+            case += '       <label name="severity" value="{0}"/>\n'.format(
+                tms_doc["tms_priority"]["tms_priority_title"].lower())
+        case += '     </labels>\n'
+        case += '     <steps/>\n'
+        case += '    </test-case>\n'
+
+        self.__allure_results[id(line)] = (line, case)
+
+    @classmethod
+    def get_summary(cls, counts):
+        """
+        Returns the summary of a set of results.
+
+        Args:
+            counts (dict): Number of results of each status.
+
+        Returns:
+            list. Tests found, tests run, passed, failed, errors, skipped
+            and the pass rate, as in the summary tables.
+        """
+        passed, failed, errors, skipped = [counts[status] for status
+                                           in cls.STATUSES]
+        total = passed + failed + errors
+        if failed == 0 and errors == 0:
+            passrate = 100.00
+        else:
+            passrate = float(passed) / float(total)
+
+        return [total + skipped, total, passed, failed, errors, skipped,
+                passrate]
+
+    def get_html(self, lines, complete=True):
+        """
+        Returns the HTML report.
+
+        Args:
+            lines (list): The report rows, in the order to report them.
+
+        Kwargs:
+            complete (bool): False if test cases are still running.
+
+        Returns:
+            str. The report.
+        """
+        for line in lines:
+            self.add_result(line)
+
+        html = ["<!DOCTYPE html>\n",
+                '<style type="text/css">\n',
+                ".myTable { background-color:#FFFFE0;"
+                "border-collapse:collapse; }\n",
+                ".myTable td, .myTable th { padding:5px;"
+                "border:1px solid #BDB76B; }\n",
+                "</style>\n",
+                "\n",
+                "<html>\n",
+                "<body>\n"]
+        if not complete:
+            html.append('<p align="center"><big>TEST RUN IN PROGRESS, '
+                        'UPDATED {0}</big></p>\n'.format(time.ctime()))
+        html.append('<table class="myTable" border="8" width="1500" '
+                    'align="center"\n')
+        html.append("<tr>\n")
+        if self.include_module_report:
+            html.append("<th><big>Module</big></th>\n")
+        for title in ["Test Case Name", "Test Case Description", "Docs Link",
+                      "Test Result", "Test Time", "Logs"]:
+            html.append("<th><big>{0}</big></th>\n".format(title))
+        html.append("</tr>\n")
+
+        html.extend([self.__results[id(line)][1] for line in lines])
+
+        html.extend(["</tr>\n",
+                     "</table>\n",
+                     "<br>\n",
+                     "<br>\n",
+                     "<br>\n",
+                     '<table class="myTable" border="8" width="1300" '
+                     'align="center">\n',
+                     "<tr>\n",
+                     '<th colspan="7"><big>OVERALL SUMMARY REPORT</big>'
+                     '</th>\n',
+                     "</tr>\n"])
+        summary_titles = ["TESTS FOUND", "TESTS RUN", "PASSED", "FAILED",
+                          "ERRORS", "SKIPPED",
+                          "PASS PERCENTAGE RATE(OF TESTS RUN)"]
+        for title in summary_titles:
+            if title.startswith("TESTS"):
+                title = "TOTAL " + title
+            html.append("<th><big>{0}</big></th>\n".format(title))
+        html.append("</tr>\n")
+        html.append("<tr>{0}</tr>\n".format("".join(
+            ["<td><big>{0}</big></td>".format(value) for value
+             in self.get_summary(self.counts)])))
+        html.append("</table>\n")
+
+        if self.include_module_report:
+            html.extend(["</tr>\n",
+                         "</table>\n",
+                         "<br>\n",
+                         "<br>\n",
+                         "<br>\n",
+                         '<table class="myTable" border="8" width="1300" '
+                         'align="center">\n',
+                         "<tr>\n",
+                         '<th colspan="8"><big>MODULE SUMMARY REPORT</big>'
+                         '</th>\n',
+                         "</tr>\n",
+                         "<th><big>MODULE</big></th>\n"])
+            for title in summary_titles:
+                html.append("<th><big>{0}</big></th>\n".format(title))
+            html.append("</tr>\n")
+            for module in self.module_counts:
+                html.append("<tr>\n")
+                html.append("<tr><td><big>{0}</big></td>{1}</tr>\n".format(
+                    module, "".join(["<td><big>{0}</big></td>".format(value)
+                                     for value in self.get_summary(
+                                         self.module_counts[module])])))
+                html.append("</tr>\n")
+            html.append("</table>\n")
+
+        html.append("</body>\n")
+        html.append("</html>\n")
+
+        return "".join(html)
+
+    def get_json(self, lines, complete=True):
+        """
+        Returns the JSON report.
+
+        Args:
+            lines (list): The report rows, in the order to report them.
+
+        Kwargs:
+            complete (bool): False if test cases are still running.
+
+        Returns:
+            str. The report.
+        """
+        for line in lines:
+            self.add_result(line)
+
+        keys = ["found", "run", "passed", "failed", "errors", "skipped",
+                "pass_rate"]
+        report = {"complete": complete,
+                  "updated": int(round(time.time() * 1000)),
+                  "summary": dict(zip(keys, self.get_summary(self.counts))),
+                  "tests": [self.__results[id(line)][2] for line in lines]}
+        if self.include_module_report:
+            report["modules"] = dict(
+                (module, dict(zip(keys, self.get_summary(counts))))
+                for module, counts in self.module_counts.iteritems())
+
+        return json.dumps(report, indent=1, sort_keys=True)
+
+    def get_allure(self, lines, start_time, stop_time):
+        """
+        Returns the Allure report.
+
+        Args:
+            lines (list): The Allure rows, in the order to report them.
+
+            start_time (int): Start of the run in milliseconds.
+
+            stop_time (int): End of the run in milliseconds.
+
+        Returns:
+            str. The report.
+        """
+        for line in lines:
+            self.add_allure_result(line)
+
+        allure = ['<ns2:test-suite xmlns:ns2="urn:model.allure.qatools.'
+                  'yandex.ru" start="{0}" stop="{1}">\n'.format(start_time,
+                                                                stop_time),
+                  '  <name>{0}</name>\n'.format(os.environ.get("JOB_NAME",
+                                                              "JOB NAME")),
+                  '  <test-cases>\n']
+        allure.extend([self.__allure_results[id(line)][1] for line in lines])
+        allure.extend(['  </test-cases>\n',
+                       '  <labels/>\n',
+                       '</ns2:test-suite>\n'])
+
+        return "".join(allure)
+
+    def write_reports(self, lines, complete=True):
+        """
+        Writes the HTML and JSON reports.
+
+        Args:
+            lines (list): The report rows, in the order to report them.
+
+        Kwargs:
+            complete (bool): False if test cases are still running.
+        """
+        self.__write_file(os.path.join(self.results_dir, self.HTML_REPORT),
+                          self.get_html(lines, complete))
+        self.__write_file(os.path.join(self.results_dir, self.JSON_REPORT),
+                          self.get_json(lines, complete))
+
+    def write_allure_report(self, lines, start_time, stop_time=None):
+        """
+        Writes the Allure report.
+
+        Args:
+            lines (list): The Allure rows, in the order to report them.
+
+            start_time (int): Start of the run in milliseconds.
+
+        Kwargs:
+            stop_time (int): End of the run in milliseconds, now if not
+                given.
+        """
+        allure_report_dir = os.path.join(self.results_dir, self.ALLURE_DIR)
+        if not os.path.isdir(allure_report_dir):
+            os.mkdir(allure_report_dir)
+        if stop_time is None:
+            stop_time = int(round(time.time() * 1000))
+
+        self.__write_file(os.path.join(allure_report_dir, self.ALLURE_REPORT),
+                          self.get_allure(lines, start_time, stop_time))
@@ -19,8 +19,15 @@ import pexpect
 import subprocess
 import time
 import datetime
+import threading
+import glob
 import pprint
 from run_sshcmds import NodeConnect
+from test_index import TestIndex
+from test_executor import TestExecutor
+from test_scheduler import TestScheduler
+from test_durations import TestDurations
+from test_reporter import TestReporter
 import urllib, urllib2, json
 
 
@@ -40,6 +47,11 @@ USAGE = "USAGE:\n\npython test_runner.py -rs --test-dir=xxx --results-dir=xxx --
         + "--include-bur-tests-only -> Will run backup and restore test cases\n" \
         + "--run-non-reg -> This option will only run new test cases and not show regression in the test report, if left out new test cases will not show up in the regression report. New test cases should be tagged as 'pre-reg'\n" \
         + "--create-allure-report -> Create an result xml file that can be used for allure test reporting - aimed at TAF\n" \
+        + "--workers=<number of test cases run at a time> -> Test cases with a 'parallel' attribute may then overlap, unless they share a resource named in their 'resources' attribute, other test cases still run alone\n" \
+        + "--shard=<shard>/<number of shards> -> Run one of a number of shards of about the same duration, based on the test case durations of past runs in --durations-file, which is required\n" \
+        + "--durations-file=<file> -> Test case durations to split shards from. Give every shard a copy of the same file, it is not updated during a sharded run. Without --shard, durations are recorded in this file (default LITP_TEST_DURATIONS or ~/.litp_test_durations.json)\n" \
+        + "--merge-shard-results -> Create the reports from the shard results found in --results-dir, where the results directories of all shards have been collected, instead of running test cases\n" \
+        + "--run-in-process -> Run test cases in the test runner process instead of starting nosetests for each test case, test modules and connections are then shared by all test cases\n" \
         + "--copy-vm-image=<path to vm image> -> Copies the vm image found in selected path to the MS\n\n" \
         + "The test runner run's based on test tags, with one of 'all' or 'pre-reg' must be included as a tag.\n" \
         + "Test case tags must conform to the standards described: https://arm1s11-eiffel004.eiffel.gic.ericsson.se:8443/nexus/content/sites/litp2/ERIClitputils-testware/latest/fw_docs/processes/reviews.html#kgb-cdb-test-tags\n\n"
@@ -49,7 +61,7 @@ class RunTestCases():
     Class to run a set of test cases
     """
 
-    def __init__(self, test_runner_option, test_directory, results_dir, connection_file, is_snapshot, test_type='', continue_on_fail=False, run_sanity_check=False, run_regres=True, report_only_run=False, test_ai_option=False, include_physical=False, include_expansion=False, include_cdb=False, include_kgb_other=False, include_kgb_physical=False, include_module_report=False, allure_report=False, cdb_regression=False, include_prepare_restore_other=False, add_to_tms=False, exclude_db=False, ignore_sfs=False,ignore_va=False,verbose_logging=False):
+    def __init__(self, test_runner_option, test_directory, results_dir, connection_file, is_snapshot, test_type='', continue_on_fail=False, run_sanity_check=False, run_regres=True, report_only_run=False, test_ai_option=False, include_physical=False, include_expansion=False, include_cdb=False, include_kgb_other=False, include_kgb_physical=False, include_module_report=False, allure_report=False, cdb_regression=False, include_prepare_restore_other=False, add_to_tms=False, exclude_db=False, ignore_sfs=False,ignore_va=False,verbose_logging=False, run_in_process=False, workers=1, shard=None, merge_shards=False, durations_file=None):
         """
         initialise test runner properties
         """
@@ -73,6 +85,8 @@ class RunTestCases():
         self.test_ai_option = test_ai_option
         self.report_only_run = report_only_run
         self.include_module_report = include_module_report
+        # BUILDS THE REPORTS AS TEST CASES FINISH
+        self.reporter = TestReporter(results_dir, include_module_report)
         self.cdb_regression = cdb_regression
         self.tms = Tms()
         self.tms.add_to_tms = add_to_tms
@@ -81,6 +95,7 @@ class RunTestCases():
         self.overall_finish_time = None
         self.allure_report = allure_report
         self.full_test_case_list = []
+        self.test_index = TestIndex()
         self.email_url = "https://fem112-eiffel004.lmera.ericsson.se:8443/jenkins/job/Generate_Fail_Email/"
         self.fail_mail_count = 0
         # Max number of fail mails to send
@@ -98,6 +113,26 @@ class RunTestCases():
         self.ignore_va = ignore_va
         self.ignore_sfs = ignore_sfs
         self.log=self.VerboseLogger(verbose_logging)
+        # RUN TEST CASES IN THIS PROCESS IF SET, OTHERWISE WITH NOSETESTS
+        self.executor = None
+        if run_in_process:
+            self.executor = TestExecutor()
+        # NUMBER OF TEST CASES RUN AT A TIME, TESTS IN THIS PROCESS AND
+        # SANITY CHECKS BETWEEN TESTS NEED THEM TO RUN ONE AT A TIME
+        self.workers = workers
+        if workers > 1 and (run_in_process or run_sanity_check):
+            print "Running one test case at a time, not supported with --run-in-process or --run-sanity"
+            self.workers = 1
+        # DURATIONS OF PAST RUNS, AND SHARD TO RUN AS (INDEX, COUNT)
+        # SHARDS SPLIT FROM THE SAME FROZEN DURATIONS, NOT UPDATED DURING THE RUN
+        self.durations = TestDurations(durations_file, frozen=bool(shard))
+        self.shard = None
+        if shard:
+            self.shard = TestDurations.parse_shard(shard)
+        self.merge_shards = merge_shards
+        # TEST CASES OF EACH ORDERED FILE, IN ORDER
+        self.ordered_chains = []
+        self.report_lock = threading.Lock()
 
     class VerboseLogger:
         def __init__(self,verbose):
@@ -170,6 +205,10 @@ class RunTestCases():
         """
         Run a suite of test cases
         """
+        if self.merge_shards:
+            # REPORT ON TEST CASES RUN BY ALL SHARDS
+            self.merge_shard_results()
+            return
         # CHECK ENVIRONMENT IS OK FOR TESTING
         self.validate_environment()
         if self.run_sanity:
@@ -193,6 +232,9 @@ class RunTestCases():
 
         # RUN THE TESTS CASES AND RETURN THE RESULT
         run_result = self.run_test_cases(list_of_tcs)
+        # KEEP THE RESULTS OF THIS SHARD TO MERGE THEM WITH OTHER SHARDS
+        if self.shard:
+            self.save_shard_results(run_result)
         # IF PASSED THEN PASS THIS TO THE REPORT METHODS
         if run_result:
             res_run = True
@@ -214,6 +256,88 @@ class RunTestCases():
             if not res_run:
                 exit(1)
 
+    def save_shard_results(self, run_result):
+        """
+        Save the results of this shard in the results directory
+        """
+        shard_file = "{0}/shard_results_{1}_of_{2}.json".format(self.results_dir, self.shard[0] + 1, self.shard[1])
+        with open(shard_file, "w") as fopen:
+            json.dump({"run_result": run_result,
+                       "timeout_failure": self.timeout_failure,
+                       "start_time": self.overall_start_time,
+                       "finish_time": self.overall_finish_time,
+                       "res_report": self.res_report,
+                       "res_allure_report": self.res_allure_report}, fopen)
+
+    def merge_shard_results(self):
+        """
+        Create the reports from the results of all shards
+        """
+        shard_files = sorted(glob.glob("{0}/shard_results_*.json".format(self.results_dir)))
+        if shard_files == []:
+            print "ERROR: No shard results found in {0}".format(self.results_dir)
+            exit(1)
+        # EVERY SHARD OF ONE RUN MUST HAVE RESULTS, OR TEST CASES WOULD BE MISSING FROM THE REPORTS
+        counts = set([os.path.basename(shard_file).split(".")[0].split("_")[-1] for shard_file in shard_files])
+        if len(counts) != 1:
+            print "ERROR: Shard results of different runs found in {0}: {1}".format(self.results_dir, shard_files)
+            exit(1)
+        count = int(counts.pop())
+        expected_files = ["{0}/shard_results_{1}_of_{2}.json".format(self.results_dir, index, count) for index in range(1, count + 1)]
+        missing_files = [shard_file for shard_file in expected_files if shard_file not in shard_files]
+        if missing_files:
+            print "ERROR: Shard results missing: {0}".format(missing_files)
+            exit(1)
+
+        run_result = True
+        start_times = []
+        finish_times = []
+        for shard_file in shard_files:
+            print "Merging shard results {0}".format(shard_file)
+            with open(shard_file) as fopen:
+                shard_results = json.load(fopen)
+            run_result = run_result and shard_results["run_result"]
+            self.timeout_failure = self.timeout_failure or shard_results["timeout_failure"]
+            start_times.append(shard_results["start_time"])
+            finish_times.append(shard_results["finish_time"])
+            self.res_report.extend(TestIndex.to_str(shard_results["res_report"]))
+            self.res_allure_report.extend(TestIndex.to_str(shard_results["res_allure_report"]))
+        self.overall_start_time = min(start_times)
+        self.overall_finish_time = max(finish_times)
+
+        # CREATE LITP REPORT
+        res_run = self.create_report(run_result)
+        # IF ALLURE REPORT IS TO BE INCLUDED
+        if self.allure_report:
+            self.create_allure_report(run_result)
+        if run_result and not res_run:
+            exit(1)
+
+    def select_shard(self, list_of_tcs):
+        """
+        Keep the test cases of this shard in the test case list, shards
+        having about the same duration in past runs
+
+        Returns:
+        list. The selected test cases of this shard.
+        """
+        index, count = self.shard
+        # TEST CASES WHICH ARE NOT RUN TAKE NO TIME
+        weights = dict((testcase, 0) for testcase in self.full_test_case_list if testcase not in list_of_tcs)
+        shards = self.durations.split(self.full_test_case_list, count, self.get_duration_key, chains=self.ordered_chains, weights=weights)
+        for shard_index, shard_list in enumerate(shards):
+            print "Shard {0} of {1}: {2} test cases, {3:.0f}s expected".format(shard_index + 1, count, len(shard_list), sum([self.durations.get(self.get_duration_key(testcase)) for testcase in shard_list if testcase in list_of_tcs]))
+        self.full_test_case_list = shards[index]
+
+        return [testcase for testcase in list_of_tcs if testcase in shards[index]]
+
+    def get_duration_key(self, testcase):
+        """
+        Get the key of a test case in the durations of past runs
+        """
+        splitname = testcase.split(":")
+        return TestDurations.get_test_key(splitname[0], splitname[1])
+
     def get_test_tags(self, testfile):
         """
         Gets all tags for a test, supports multiline tagging.
@@ -223,25 +347,12 @@ class RunTestCases():
         Returns:
         str. A string of all the test tags.
         """
-        cmd = 'grep -B5 "def {0}" {1}'.format(testfile[1], testfile[0])
-
-        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
+        test = self.test_index.get_test(testfile[0], testfile[1])
 
-        if exit_code != 0:
+        if not test:
             return None
 
-        start = False
-        tags = ""
-        for line1 in stdout:
-            line = line1.replace("\"", "'")
-            if '@attr' in line:
-                start = True
-            if 'def test' in line:
-                break
-            if start:
-                tags += line.strip('/n')
-
-        return tags.strip()
+        return TestIndex.get_attr_str(test)
 
     def get_ordered_tc_list(self, unordered_test_case_list):
         """
@@ -306,14 +417,11 @@ class RunTestCases():
         """
         Find all test cases in the given directory
         """
-        # GREP ALL FILES CALLED "testset*.py" FOR "def test_"
-        cmd = 'grep -R "def test_" {0} | grep "testset" | grep ".py:"'.format(self.test_directory)
-        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-        if stderr != [] or exit_code != 0:
-            print "ERROR: stderr is {0} and exit code is {1}".format(stderr, exit_code)
-            exit(1)
+        # PARSE ALL FILES CALLED "testset*.py" FOR TEST CASES
+        stdout = ["{0}:{1}".format(test["file"], test["name"]) for test
+                  in self.test_index.find_tests(self.test_directory)]
         if stdout == []:
-            print "ERROR: stderr is {0}".format(stdout)
+            print "ERROR: No test cases found in {0}".format(self.test_directory)
             exit(1)
         # THE RETURNED OUTPUT WILL BE PATH TO THE FILE AND THE TEST CASE
         test_case_list = []
@@ -500,10 +608,13 @@ class RunTestCases():
                                 temp_full_list.remove(line1)
                                 ordered_final_list.append(line1)
                     test_case_list.extend(temp_full_list)
+                    ordered_chain = []
                     for line in stdout:
                         for line1 in ordered_final_list:
                             if line in line1:
                                 test_case_list.append(line1)
+                                ordered_chain.append(line1)
+                    self.ordered_chains.append(ordered_chain)
 
             full_list.extend(test_case_list)
 
@@ -526,10 +637,13 @@ class RunTestCases():
                             test_case_list.remove(line1)
                             ordered_final_list.append(line1)
                 full_list.extend(test_case_list)
+                ordered_chain = []
                 for line in stdout:
                     for line1 in ordered_final_list:
                         if line in line1:
                             full_list.append(line1)
+                            ordered_chain.append(line1)
+                self.ordered_chains.append(ordered_chain)
             else:
                 print "No ordered task file found"
                 full_list.extend(test_case_list)
@@ -565,31 +679,29 @@ class RunTestCases():
         print "Searching for testcases with the following tags:"
         for line in test_types:
             print "- {0}".format(line)
-        # CREATE THE NOSETESTS COMMAND THAT WILL CHECK IF TEST BEING RUN HAS
-        # THE TEST TAG EXISTS
-        nosecheck = "nosetests -s --collect-only"
-        for nosen in test_types:
-            nosecheck = nosecheck + " -a '{0}'".format(nosen)
         # FIND ALL TEST CASES IN THE REGRESSION SUITE AND RETURN IN A LIST
         full_list = self.find_all_test_cases()
 
-        # BASED ON THE RETURNED TEST CASES, CHECK EACH ONE, IF TEST RUNS
-        # CORRECTLY THEN ADD IT TO LIST OF TEST CASES WHICH WILL BE RUN
+        # BASED ON THE RETURNED TEST CASES, CHECK EACH ONE, IF ITS ATTRIBUTES
+        # MATCH ANY OF THE TAGS AS NOSETESTS -a WOULD THEN ADD IT TO LIST OF
+        # TEST CASES WHICH WILL BE RUN
         final_list = []
-        debug_failure = []
         for testname in full_list:
             testfile = testname.split(":")
-            cmd = "{0} --testmatch={1} {2}".format(nosecheck, testfile[1], testfile[0])
-            for line in pexpect.spawn(cmd, timeout=2000):
-                debug_failure.append(line)
-                if "Ran 1 test in" in line:
-                    final_list.append(testname)
+            test = self.test_index.get_test(testfile[0], testfile[1])
+            if test and any([TestIndex.matches_attr(test, nosen)
+                             for nosen in test_types]):
+                final_list.append(testname)
         if final_list == []:
             print "ERROR: Cannot find any test cases with tags given"
             exit(1)
         else:
             print "Test cases found..."
 
+        # IF SHARDED, KEEP THE TEST CASES OF THIS SHARD ONLY
+        if self.shard:
+            final_list = self.select_shard(final_list)
+
         return final_list
 
     def run_test_cases(self, list_of_tcs):
@@ -607,108 +719,193 @@ class RunTestCases():
         time_test_start = 0
         time_test_stop = 0
 
+        if self.workers > 1:
+            run_result = self.run_test_cases_parallel(list_of_tcs, nose_res_dir)
+            self.overall_finish_time = int(round(time.time() * 1000))
+            return run_result
+
         # FOR EACH TEST CASE BEING RUN
         for testcase in self.full_test_case_list:
-            # Make a test case folder for results
+            final_result = self.run_test_case(testcase, list_of_tcs, nose_res_dir)
+
+            if final_result != "PASS" and final_result != "SKIPPED":
+                if not self.continue_on_fail or self.timeout_failure:
+                    break
+
+            if self.run_sanity and testcase in list_of_tcs:
+                if not self.post_test_sanity():
+                    self.overall_finish_time = time.time()
+                    return False
+
+        self.overall_finish_time = int(round(time.time() * 1000))
+
+        return True
+
+    def run_test_cases_parallel(self, list_of_tcs, nose_res_dir):
+        """
+        Run the test cases on a pool of workers, overlapping test cases
+        which have a parallel id unless they share a resource. Returns False
+        if a test case hit a fatal error, which exits a run of one worker
+        """
+        scheduler = TestScheduler(self.workers)
+        parallel_ids = {}
+        resources = {}
+        for testcase in self.full_test_case_list:
             splitname = testcase.split(":")
-            full_test_path = splitname[0]
-            testcase_name = splitname[1]
-            testfilename = full_test_path.split("/")[-1]
-            moduledirname = full_test_path.split("/")[-2]
-            res_dir = "{0}/{1}-{2}".format(self.results_dir, testfilename, testcase_name)
-            os.mkdir(res_dir)
-
-            # GET DOCUMENTATION FROM TEST CASE
-            cmd = "/bin/cat {0}".format(full_test_path)
-            stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-            if stderr != [] or exit_code != 0:
-                print "ERROR: stderr is {0} and exit code is {1}".format(stderr, exit_code)
-                exit(1)
-            if stdout == []:
-                print "ERROR: stderr is {0}".format(stdout)
-                exit(1)
-            # PARSE THE OUTPUT FOR TEST REPORT
-            # THIS SHOULD BE REPLACED WHEN ALL TEST CASES ARE USING THE
-            # TMS, UNTIL THEN THIS MUST REMAIN IN PLACE
-            document = []
-            testcopy = False
-            startcopy = False
-            desccopy = False
-            testdoc = []
-            for line in stdout:
-                if testcopy and startcopy:
-                    if "\"\"\"" in line or "'''" in line:
-                        startcopy = False
-                        testcopy = False
-                        desccopy = False
-                if startcopy:
-                    if ":" in line and "Action" in line or "Pre-Requisites" in line \
-                            or "Risks" in line or "Pre-Test Steps" in line \
-                            or "Test Steps" in line or "Restore Steps" in line \
-                                or "Expected Result" in line or "Steps" in line \
-                                or "Pre-requisite" in line:
-                        desccopy = False
-                    if "\"\"\"" not in line or "'''" not in line:
-                        document.append(line)
-                        if desccopy:
-                            addline = line.replace("Description:", "")
-                            testdoc.append(addline + "<br>")
-                if testcopy:
-                    if "\"\"\"" in line or "'''" in line:
-                        startcopy = True
-                        desccopy = True
-                if "def {0}(self):".format(testcase_name) in line:
-                    testcopy = True
-
-            document_str = '\n'.join(document)
-            document_desc = '\n'.join(testdoc)
-
-            tms_doc = self.tms.parse_tms(stdout, testcase_name)
-
-            if "tms_id" in tms_doc and "tms_requirements_id" in tms_doc and "tms_title" in tms_doc \
-                    and "tms_description" in tms_doc and "tms_test_steps" in tms_doc \
-                    and "tms_test_precondition" in tms_doc and "tms_execution_type" in tms_doc and self.run_regres:
-
-                self.tms.upload_to_tms(tms_doc)
-
-                # OVERWRITE ORIGINAL DOC STRINGS
-                write_data_desc = []
-                write_data_desc_only = []
-                write_data_desc_only.append("{0}".format(tms_doc["tms_description"]))
-                write_data_desc.append("Title: {0}".format(tms_doc["tms_title"]))
-                write_data_desc.append("")
-                write_data_desc.append("Description: {0}".format(tms_doc["tms_description"]))
-                write_data_desc.append("")
-                write_data_desc.append("Requirements: {0}".format(tms_doc["tms_requirements_id"]))
-                write_data_desc.append("")
-                write_data_desc.append("Pre-conditions: {0}".format(tms_doc["tms_test_precondition"]))
+            test = self.test_index.get_test(splitname[0], splitname[1])
+            if test:
+                parallel_ids[testcase] = test["attr_kwargs"].get("parallel")
+                resources[testcase] = TestScheduler.get_resources(test["attr_kwargs"].get("resources"))
+        scheduler.add_tests(self.full_test_case_list, parallel_ids, resources, self.ordered_chains)
+
+        def run_test(testcase):
+            """ Run a test case, returning False if no more should be started """
+            final_result = self.run_test_case(testcase, list_of_tcs, nose_res_dir)
+            if final_result != "PASS" and final_result != "SKIPPED":
+                if not self.continue_on_fail or self.timeout_failure:
+                    return False
+            return True
+
+        print "Running up to {0} test cases at a time".format(self.workers)
+        not_run = scheduler.run(run_test)
+
+        # LIST THE TEST CASES LEFT OUT WHEN THE RUN STOPPED EARLY
+        if not_run:
+            print "The following {0} test cases were not run:".format(len(not_run))
+            for testcase in not_run:
+                print "    {0}".format(testcase)
+
+        # REPORT TEST CASES IN LIST ORDER, AS WHEN RUN ONE AT A TIME
+        positions = {}
+        for testcase in self.full_test_case_list:
+            splitname = testcase.split(":")
+            positions.setdefault((splitname[0].split("/")[-1], splitname[1]), len(positions))
+        self.res_report.sort(key=lambda row: positions.get(tuple(row[0].rsplit(".", 1)), 0))
+        self.res_allure_report.sort(key=lambda row: positions.get((row[0], row[1]), 0))
+
+        # A FATAL ERROR FAILS THE RUN, AS exit(1) DOES WITH ONE WORKER
+        if scheduler.fatal:
+            print "ERROR: Run stopped by a fatal error in {0}".format(scheduler.fatal)
+            return False
+
+        return True
+
+    def run_test_case(self, testcase, list_of_tcs, nose_res_dir):
+        """
+        Run a test case, adding its result to the reports
+
+        Returns:
+        str. The result, PASS, FAIL, ERROR or SKIPPED. None if the result
+        could not be read.
+        """
+        time_test_start = 0
+        time_test_stop = 0
+        # Make a test case folder for results
+        splitname = testcase.split(":")
+        full_test_path = splitname[0]
+        testcase_name = splitname[1]
+        testfilename = full_test_path.split("/")[-1]
+        moduledirname = full_test_path.split("/")[-2]
+        res_dir = "{0}/{1}-{2}".format(self.results_dir, testfilename, testcase_name)
+        os.mkdir(res_dir)
+
+        # GET DOCUMENTATION FROM TEST CASE
+        test = self.test_index.get_test(full_test_path, testcase_name)
+        if not test:
+            print "ERROR: Test case {0} not found in {1}".format(testcase_name, full_test_path)
+            exit(1)
+        stdout = test["doc_lines"]
+        # PARSE THE OUTPUT FOR TEST REPORT
+        # THIS SHOULD BE REPLACED WHEN ALL TEST CASES ARE USING THE
+        # TMS, UNTIL THEN THIS MUST REMAIN IN PLACE
+        document = []
+        testcopy = False
+        startcopy = False
+        desccopy = False
+        testdoc = []
+        for line in stdout:
+            if testcopy and startcopy:
+                if "\"\"\"" in line or "'''" in line:
+                    startcopy = False
+                    testcopy = False
+                    desccopy = False
+            if startcopy:
+                if ":" in line and "Action" in line or "Pre-Requisites" in line \
+                        or "Risks" in line or "Pre-Test Steps" in line \
+                        or "Test Steps" in line or "Restore Steps" in line \
+                            or "Expected Result" in line or "Steps" in line \
+                            or "Pre-requisite" in line:
+                    desccopy = False
+                if "\"\"\"" not in line or "'''" not in line:
+                    document.append(line)
+                    if desccopy:
+                        addline = line.replace("Description:", "")
+                        testdoc.append(addline + "<br>")
+            if testcopy:
+                if "\"\"\"" in line or "'''" in line:
+                    startcopy = True
+                    desccopy = True
+            if "def {0}(self):".format(testcase_name) in line:
+                testcopy = True
+
+        document_str = '\n'.join(document)
+        document_desc = '\n'.join(testdoc)
+
+        tms_doc = self.tms.parse_tms(stdout, testcase_name)
+
+        if "tms_id" in tms_doc and "tms_requirements_id" in tms_doc and "tms_title" in tms_doc \
+                and "tms_description" in tms_doc and "tms_test_steps" in tms_doc \
+                and "tms_test_precondition" in tms_doc and "tms_execution_type" in tms_doc and self.run_regres:
+
+            self.tms.upload_to_tms(tms_doc)
+
+            # OVERWRITE ORIGINAL DOC STRINGS
+            write_data_desc = []
+            write_data_desc_only = []
+            write_data_desc_only.append("{0}".format(tms_doc["tms_description"]))
+            write_data_desc.append("Title: {0}".format(tms_doc["tms_title"]))
+            write_data_desc.append("")
+            write_data_desc.append("Description: {0}".format(tms_doc["tms_description"]))
+            write_data_desc.append("")
+            write_data_desc.append("Requirements: {0}".format(tms_doc["tms_requirements_id"]))
+            write_data_desc.append("")
+            write_data_desc.append("Pre-conditions: {0}".format(tms_doc["tms_test_precondition"]))
+            write_data_desc.append("")
+            write_data_desc.append("Steps:")
+            for line in tms_doc["tms_test_steps"]:
                 write_data_desc.append("")
-                write_data_desc.append("Steps:")
-                for line in tms_doc["tms_test_steps"]:
-                    write_data_desc.append("")
-                    write_data_desc.append("  Step -> {0}".format(line[0]))
-                    for resp in line[1]:
-                        write_data_desc.append("    Result -> {0}".format(resp))
-                document_str = '\n'.join(write_data_desc)
-                document_desc = '\n'.join(write_data_desc_only)
-
-            # Create test output file for test logs
-            result_file = res_dir + "/" + "test_output.txt"
-            test_failure_file = self.results_dir + "/" + "test_failure_file.txt"
-            result_file_report = "{0}-{1}".format(testfilename, testcase_name) + "/" + "test_output.txt"
-            doc_file = res_dir + "/" + "test_doc.txt"
-            doc_file_report = "{0}-{1}".format(testfilename, testcase_name) + "/" + "test_doc.txt"
-            sopen = open(doc_file, "w")
-            sopen.write(document_str)
-            sopen.close()
-            if self.run_sanity and testcase in list_of_tcs:
-                self.pre_test_sanity()
-            try:
-                fopen = open(result_file, "a+")
-                swrite = True
-                time_taken = None
-                final_result = None
-                if testcase in list_of_tcs:
+                write_data_desc.append("  Step -> {0}".format(line[0]))
+                for resp in line[1]:
+                    write_data_desc.append("    Result -> {0}".format(resp))
+            document_str = '\n'.join(write_data_desc)
+            document_desc = '\n'.join(write_data_desc_only)
+
+        # Create test output file for test logs
+        result_file = res_dir + "/" + "test_output.txt"
+        test_failure_file = self.results_dir + "/" + "test_failure_file.txt"
+        result_file_report = "{0}-{1}".format(testfilename, testcase_name) + "/" + "test_output.txt"
+        doc_file = res_dir + "/" + "test_doc.txt"
+        doc_file_report = "{0}-{1}".format(testfilename, testcase_name) + "/" + "test_doc.txt"
+        sopen = open(doc_file, "w")
+        sopen.write(document_str)
+        sopen.close()
+        if self.run_sanity and testcase in list_of_tcs:
+            self.pre_test_sanity()
+        try:
+            fopen = open(result_file, "a+")
+            swrite = True
+            time_taken = None
+            final_result = None
+            if testcase in list_of_tcs:
+                if self.executor:
+                    # Run the test case in this process, printing output to the file
+                    tc_result = self.executor.run_test(full_test_path, test["class"], testcase_name, fopen, xunit_file="{0}/{1}-{2}-nosetests.xml".format(nose_res_dir, testfilename, testcase_name))
+                    time_test_start = tc_result["start"]
+                    time_test_stop = tc_result["stop"]
+                    time_taken = tc_result["time_taken"]
+                    final_result = tc_result["result"]
+                    fopen.write("\nResult: {0}\n".format(final_result))
+                else:
                     # Run the test case using nosetests, printing outout to the file when data is available
                     time_test_start = int(round(time.time() * 1000))
                     cmd = 'nosetests --with-xunit --xunit-file={0}/{3}-{1}-nosetests.xml -s --testmatch={1} {2}'.format(nose_res_dir, testcase_name, full_test_path, testfilename)
@@ -732,22 +929,29 @@ class RunTestCases():
                             final_result = "FAIL"
 
                     time_test_stop = int(round(time.time() * 1000))
-                    print_res = "{0} {1}".format(testfilename, testcase_name)
-                    leng = len(print_res)
-                    lesso = 100 - leng
-
-                    n = 0
-                    while n < lesso:
-                        n += 1
-                        print_res += " "
-                    if final_result == "ERROR":
-                        print "{0} ... ERROR   ... {1}".format(print_res, time_taken)
-                    else:
-                        print "{0} ... {1}    ... {2}".format(print_res, final_result, time_taken)
 
+                print_res = "{0} {1}".format(testfilename, testcase_name)
+                leng = len(print_res)
+                lesso = 100 - leng
+
+                n = 0
+                while n < lesso:
+                    n += 1
+                    print_res += " "
+                if final_result == "ERROR":
+                    print "{0} ... ERROR   ... {1}".format(print_res, time_taken)
+                else:
+                    print "{0} ... {1}    ... {2}".format(print_res, final_result, time_taken)
+
+            else:
+                time_test_start = 0000000000000
+                time_test_stop = 0000000000000
+                if self.executor:
+                    time_taken = "0.000s"
+                    final_result = "SKIPPED"
+                    if not self.report_only_run:
+                        self.executor.write_skipped_xunit("{0}/{1}-{2}-nosetests.xml".format(nose_res_dir, testfilename, testcase_name))
                 else:
-                    time_test_start = 0000000000000
-                    time_test_stop = 0000000000000
                     if not self.report_only_run:
                         cmd = 'nosetests --with-xunit --xunit-file={0}/{3}-{1}-nosetests.xml -s --testmatch={1} --exclude={1} {2}'.format(nose_res_dir, testcase_name, full_test_path, testfilename)
                     else:
@@ -759,28 +963,34 @@ class RunTestCases():
                             final_result = "SKIPPED"
 
 
-                    print_res = "{0} {1}".format(testfilename, testcase_name)
-                    leng = len(print_res)
-                    lesso = 100 - leng
+                print_res = "{0} {1}".format(testfilename, testcase_name)
+                leng = len(print_res)
+                lesso = 100 - leng
 
-                    n = 0
-                    while n < lesso:
-                        n += 1
-                        print_res += " "
-                    if not self.report_only_run:
-                        print "{0} ... SKIPPED ... {1}".format(print_res, time_taken)
-                        cmd = 'sed -i s/skip=\\"0\\"/skip=\\"1\\"/g {0}/{1}-{2}-nosetests.xml'.format(nose_res_dir, testfilename, testcase_name)
-                        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-                        if stdout != []  or stderr != [] or exit_code != 0:
-                            print "ERROR: Running sed command failed"
-                            exit(1)
-                fopen.close()
-            except Exception:
-                print "ERROR: Print timeout value has been reached..."
-                self.timeout_failure = True
-
-
-            # Add results of test to dictionary for html report
+                n = 0
+                while n < lesso:
+                    n += 1
+                    print_res += " "
+                if not self.report_only_run:
+                    print "{0} ... SKIPPED ... {1}".format(print_res, time_taken)
+                if not self.report_only_run and not self.executor:
+                    cmd = 'sed -i s/skip=\\"0\\"/skip=\\"1\\"/g {0}/{1}-{2}-nosetests.xml'.format(nose_res_dir, testfilename, testcase_name)
+                    stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
+                    if stdout != []  or stderr != [] or exit_code != 0:
+                        print "ERROR: Running sed command failed"
+                        exit(1)
+            fopen.close()
+        except Exception:
+            print "ERROR: Print timeout value has been reached..."
+            self.timeout_failure = True
+
+
+        # Add results of test to dictionary for html report
+        with self.report_lock:
+            # RECORD THE DURATION OF TEST CASES WHICH RAN
+            if final_result in ["PASS", "FAIL", "ERROR"] and TestDurations.parse_time_taken(time_taken) is not None:
+                self.durations.record(TestDurations.get_test_key(full_test_path, testcase_name), TestDurations.parse_time_taken(time_taken))
+                self.durations.save()
             if self.report_only_run and final_result == "SKIPPED":
                 pass
             else:
@@ -790,6 +1000,8 @@ class RunTestCases():
                 else:
                     self.res_report.append(["{0}.{1}".format(testfilename, testcase_name), document_desc, doc_file_report, final_result, time_taken, result_file_report])
                     self.res_allure_report.append([testfilename, testcase_name, result_file_report, final_result, time_test_start, time_test_stop, tms_doc, doc_file_report])
+                # UPDATE THE REPORTS WITH THE RESULTS SO FAR
+                self.write_partial_reports()
 
             if final_result == "PASS" or final_result == "SKIPPED":
                 pass
@@ -802,17 +1014,7 @@ class RunTestCases():
                                                      testcase_name)
                     self.trigger_fail_email(test_email_id)
 
-                if not self.continue_on_fail or self.timeout_failure:
-                    break
-
-            if self.run_sanity and testcase in list_of_tcs:
-                if not self.post_test_sanity():
-                    self.overall_finish_time = time.time()
-                    return False
-
-        self.overall_finish_time = int(round(time.time() * 1000))
-
-        return True
+        return final_result
 
 
     def post_url(self, url, list_type=False):
@@ -880,138 +1082,40 @@ class RunTestCases():
         """
         os.mkdir(dir_make)
 
-    def replace_xml_chars(self, text):
-        """
-        Replace any xml characters with the escaped xml replresentation:
-        '&' = '&amp;', '<' = '&lt;', '>' = '&gt;'
-
-        Args:
-            text (str): String of text to be formatted.
-
-        Returns:
-            str: Reformatted string.
-
-        """
-        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
     def create_allure_report(self, tr_result):
         """
         Create an xml result file which can be used for allure test reporting
         Allure is not supported in python 2.6, until then the xml needs to be generated manually.
-        The report generation below is taken from a standard allure report, but also including TMS properties
+        The report generation is taken from a standard allure report, but also including TMS properties
         if given
         """
         print "Creating allure report..."
-        allure_report_dir = "{0}/allure_reporting/".format(self.results_dir)
-        os.mkdir(allure_report_dir)
-        allure_report_file = allure_report_dir + "allure_report-testsuite.xml"
-        fopen = open(allure_report_file, "a+")
-        fopen.write('<ns2:test-suite xmlns:ns2="urn:model.allure.qatools.yandex.ru" start="{0}" stop="{1}">\n'.format(self.overall_start_time, self.overall_finish_time))
-        if "JOB_NAME" in os.environ:
-            fopen.write('  <name>{0}</name>\n'.format(os.environ["JOB_NAME"]))
-        else:
-            fopen.write('  <name>JOB NAME</name>\n')
-        fopen.write('  <test-cases>\n')
-        for line in self.res_allure_report:
-            tms_doc = line[6]
-            testfilename = line[0].replace(".py", "").replace("testset_", "")
-            # COPY REPORT FILE
-            testcase_doc_file = "{0}_{1}_documentation-attachment.txt".format(testfilename, line[1])
-            testcase_doc_file_full = allure_report_dir + "/" + testcase_doc_file
-            testcase_report_file_full = allure_report_dir + "{0}_{1}-attachment.txt".format(testfilename, line[1])
-            testcase_report_file = "{0}_{1}-attachment.txt".format(testfilename, line[1])
-            self.run_command_local("cp {0} {1}".format(self.results_dir + "/" + line[2], testcase_report_file_full), logs=False)
-            self.run_command_local("cp {0} {1}".format(self.results_dir + "/" + line[7], testcase_doc_file_full), logs=False)
-            if line[3] == "PASS":
-                fopen.write('    <test-case start="{0}" status="passed" stop="{1}">\n'.format(line[4], line[5]))
-            if line[3] == "FAIL":
-                fopen.write('    <test-case start="{0}" status="failed" stop="{1}">\n'.format(line[4], line[5]))
-            if line[3] == "ERROR":
-                fopen.write('    <test-case start="{0}" status="broken" stop="{1}">\n'.format(line[4], line[5]))
-            if line[3] == "SKIPPED":
-                fopen.write('    <test-case start="{0}" status="skipped" stop="{1}">\n'.format(line[4], line[5]))
-            if "add_to_allure" in tms_doc:
-                fopen.write('     <name>{0} - {1} - {2}</name>\n'.format(testfilename, line[1], self.replace_xml_chars(tms_doc["tms_id"])))
-                fopen.write('     <title>{0}</title>\n'.format(self.replace_xml_chars(tms_doc["tms_title"])))
-                fopen.write('     <description>{0}</description>\n'.format(self.replace_xml_chars(tms_doc["tms_description"])))
-            else:
-                fopen.write('     <name>{0} - {1}</name>\n'.format(testfilename, line[1]))
-            fopen.write('     <attachments>\n')
-            fopen.write('       <attachment source="{0}" title="test_log.txt" type="text/plain"/>\n'.format(testcase_report_file))
-            fopen.write('       <attachment source="{0}" title="test_doc.txt" type="text/plain"/>\n'.format(testcase_doc_file))
-            fopen.write('     </attachments>\n')
-            fopen.write('     <labels>\n')
-            if self.include_module_report:
-                fopen.write('       <label name="feature" value="{0}"/>\n'.format(line[8]))
-            else:
-                if "JOB_NAME" in os.environ:
-                    fopen.write('       <label name="feature" value="{0}"/>\n'.format(os.environ["JOB_NAME"]))
-                else:
-                    fopen.write('       <label name="feature" value="LITP"/>\n')
-            if "add_to_allure" in tms_doc:
-                if 'tms_story_title' in tms_doc.keys():
-                    for stor in tms_doc["tms_story_title"]:
-                        fopen.write('       <label name="story" value="{0}"/>\n'.format(stor))
-                    fopen.write('       <label name="execution_type" value="{0}"/>\n'.format(tms_doc["tms_execution_type"]))
-                    fopen.write('       <label name="testId" value="{0}"/>\n'.format(tms_doc["tms_id"]))
-                    fopen.write('       <label name="severity" value="{0}"/>\n'.format(tms_doc["tms_priority"]["tms_priority_title"].lower()))
-            fopen.write('     </labels>\n')
-            fopen.write('     <steps/>\n')
-            fopen.write('    </test-case>\n')
-        fopen.write('  </test-cases>\n')
-        fopen.write('  <labels/>\n')
-        fopen.write('</ns2:test-suite>\n')
-        fopen.close()
+        self.reporter.write_allure_report(self.res_allure_report, self.overall_start_time, self.overall_finish_time)
+
+    def write_partial_reports(self):
+        """
+        Write the reports with the results of the test cases which have
+        finished, while the run goes on
+        """
+        try:
+            self.reporter.write_reports(self.res_report, complete=False)
+            if self.allure_report:
+                self.reporter.write_allure_report(self.res_allure_report, self.overall_start_time)
+        except (IOError, OSError) as except_err:
+            print "WARNING: Cannot write partial reports: {0}".format(except_err)
 
     def create_report(self, tr_result):
         """
         Create a html test report of all test cases and results
         """
 
-        passed = 0
-        failed = 0
-        errors = 0
-        skipped = 0
-        module_res_dict = dict()
+        # COUNT THE RESULTS NOT ADDED AS THEIR TEST CASES FINISHED, E.G. OF OTHER SHARDS
         for line in self.res_report:
-            if self.include_module_report:
-                if line[6] not in module_res_dict:
-                    module_res_dict[line[6]] = [0, 0, 0, 0, 0, 0, 0]
-            if "PASS" in line:
-                passed += 1
-                if self.include_module_report:
-                    module_res_dict[line[6]][2] += 1
-            if "FAIL" in line:
-                failed += 1
-                if self.include_module_report:
-                    module_res_dict[line[6]][3] += 1
-            if "ERROR" in line:
-                errors += 1
-                if self.include_module_report:
-                    module_res_dict[line[6]][4] += 1
-            if "SKIPPED" in line:
-                skipped += 1
-                if self.include_module_report:
-                    module_res_dict[line[6]][5] += 1
-
-        total = passed + failed + errors
-        total_skip = passed + failed + errors + skipped
-        if failed == 0 and errors == 0:
-            passrate = 100.00
-        else:
-            passrate = float(passed) / float(total)
+            self.reporter.add_result(line)
+        total_skip, total, passed, failed, errors, skipped = TestReporter.get_summary(self.reporter.counts)[:6]
         # Create json with test name, test type, passed, failed, %
         self.output_to_json(passed, failed)
 
-        if self.include_module_report:
-            for line in module_res_dict:
-                module_res_dict[line][0] = module_res_dict[line][2] + module_res_dict[line][3] + module_res_dict[line][4] + module_res_dict[line][5]
-                module_res_dict[line][1] = module_res_dict[line][2] + module_res_dict[line][3] + module_res_dict[line][4]
-                if module_res_dict[line][3] == 0 and  module_res_dict[line][4] == 0:
-                    module_res_dict[line][6] = 100.00
-                else:
-                    module_res_dict[line][6] = float(module_res_dict[line][2]) / float(module_res_dict[line][1])
-
         print "{0} out of {1} test cases were run".format(total, total_skip)
         print "{0} test cases passed".format(passed)
         print "{0} test cases failed".format(failed)
@@ -1022,98 +1126,9 @@ class RunTestCases():
         for entry in self.tms.logger:
             print entry
 
-        report_file = self.results_dir + "/" + "test_report.html"
-        fopen = open(report_file, "a+")
-
-        fopen.write("<!DOCTYPE html>\n")
-        fopen.write('<style type="text/css">\n')
-        fopen.write(".myTable { background-color:#FFFFE0;border-collapse:collapse; }\n")
-        fopen.write(".myTable td, .myTable th { padding:5px;border:1px solid #BDB76B; }\n")
-        fopen.write("</style>\n")
-        fopen.write("\n")
-        fopen.write("<html>\n")
-        fopen.write("<body>\n")
-        fopen.write('<table class="myTable" border="8" width="1500" align="center"\n')
-        fopen.write("<tr>\n")
-        if self.include_module_report:
-            fopen.write("<th><big>Module</big></th>\n")
-        fopen.write("<th><big>Test Case Name</big></th>\n")
-        fopen.write("<th><big>Test Case Description</big></th>\n")
-        fopen.write("<th><big>Docs Link</big></th>\n")
-        fopen.write("<th><big>Test Result</big></th>\n")
-        fopen.write("<th><big>Test Time</big></th>\n")
-        fopen.write("<th><big>Logs</big></th>\n")
-        fopen.write("</tr>\n")
-
-        for line in self.res_report:
-            fopen.write("<tr>\n")
-            if self.include_module_report:
-                fopen.write("<td>{0}</td>\n".format(line[6]))
-            fopen.write("<td>{0}</td>\n".format(line[0]))
-            fopen.write("<td>{0}</td>\n".format(line[1]))
-            fopen.write('<td><pre><a href="{0}">Doc Link</a><br></pre></td>'.format(line[2]))
-            if line[3] == "PASS":
-                fopen.write('<td bgcolor="#80FF00">\n'.format(line[3]))
-            if line[3] == "FAIL" or line[3] == "ERROR":
-                fopen.write('<td bgcolor="#FF0000">\n'.format(line[3]))
-            if line[3] == "SKIPPED":
-                fopen.write('<td bgcolor="#FACC2E">\n'.format(line[3]))
-            fopen.write("{0}</td>\n".format(line[3]))
-            fopen.write("<td>{0}</td>\n".format(line[4]))
-            if line[3] == "SKIPPED":
-                fopen.write('<td></td>'.format(line[5]))
-            else:
-                fopen.write('<td><pre><a href="{0}">Logs</a><br></pre></td>'.format(line[5]))
-            fopen.write("</tr>\n")
-
-        fopen.write("</tr>\n")
-        fopen.write("</table>\n")
-        fopen.write("<br>\n")
-        fopen.write("<br>\n")
-        fopen.write("<br>\n")
-        fopen.write('<table class="myTable" border="8" width="1300" align="center">\n')
-        fopen.write("<tr>\n")
-        fopen.write('<th colspan="7"><big>OVERALL SUMMARY REPORT</big></th>\n')
-        fopen.write("</tr>\n")
-        fopen.write("<th><big>TOTAL TESTS FOUND</big></th>\n")
-        fopen.write("<th><big>TOTAL TESTS RUN</big></th>\n")
-        fopen.write("<th><big>PASSED</big></th>\n")
-        fopen.write("<th><big>FAILED</big></th>\n")
-        fopen.write("<th><big>ERRORS</big></th>\n")
-        fopen.write("<th><big>SKIPPED</big></th>\n")
-        fopen.write("<th><big>PASS PERCENTAGE RATE(OF TESTS RUN)</big></th>\n")
-        fopen.write("</tr>\n")
-        fopen.write("<tr><td><big>{0}</big></td><td><big>{1}</big></td><td><big>{2}</big></td><td><big>{3}</big></td><td><big>{4}</big></td><td><big>{5}</big></td><td><big>{6}</big></td></tr>\n".format(total_skip, total, passed, failed, errors, skipped, passrate))
-        fopen.write("</table>\n")
-        if self.include_module_report:
-            fopen.write("</tr>\n")
-            fopen.write("</table>\n")
-            fopen.write("<br>\n")
-            fopen.write("<br>\n")
-            fopen.write("<br>\n")
-            fopen.write('<table class="myTable" border="8" width="1300" align="center">\n')
-            fopen.write("<tr>\n")
-            fopen.write('<th colspan="8"><big>MODULE SUMMARY REPORT</big></th>\n')
-            fopen.write("</tr>\n")
-            fopen.write("<th><big>MODULE</big></th>\n")
-            fopen.write("<th><big>TESTS FOUND</big></th>\n")
-            fopen.write("<th><big>TESTS RUN</big></th>\n")
-            fopen.write("<th><big>PASSED</big></th>\n")
-            fopen.write("<th><big>FAILED</big></th>\n")
-            fopen.write("<th><big>ERRORS</big></th>\n")
-            fopen.write("<th><big>SKIPPED</big></th>\n")
-            fopen.write("<th><big>PASS PERCENTAGE RATE(OF TESTS RUN)</big></th>\n")
-            fopen.write("</tr>\n")
-            for line in module_res_dict:
-                fopen.write("<tr>\n")
-                fopen.write("<tr><td><big>{7}</big></td><td><big>{0}</big></td><td><big>{1}</big></td><td><big>{2}</big></td><td><big>{3}</big></td><td><big>{4}</big></td><td><big>{5}</big></td><td><big>{6}</big></td></tr>\n".format(module_res_dict[line][0], module_res_dict[line][1], module_res_dict[line][2], module_res_dict[line][3], module_res_dict[line][4], module_res_dict[line][5], module_res_dict[line][6], line))
-                fopen.write("</tr>\n")
-            fopen.write("</table>\n")
-        fopen.write("</body>\n")
-        fopen.write("</html>\n")
-        fopen.close()
+        self.reporter.write_reports(self.res_report)
 
-        if not self.test_ai_option:
+        if not self.test_ai_option and not self.merge_shards:
             self.collect_logs()
 
         if self.timeout_failure:
@@ -2042,6 +2057,9 @@ def main():
     connection_file = None
     utils_dir = None
     image_path = None
+    workers = 1
+    shard = None
+    durations_file = None
     for line in sys.argv:
         if "--test-dir=" in line:
             target_dir = line.split("=")[-1]
@@ -2055,10 +2073,21 @@ def main():
             utils_dir = line.split("=")[-1]
         if "--copy-vm-image=" in line:
             image_path = line.split("=")[-1]
+        if "--workers=" in line:
+            workers = int(line.split("=")[-1])
+        if "--shard=" in line:
+            shard = line.split("=")[-1]
+        if "--durations-file=" in line:
+            durations_file = line.split("=")[-1]
 
     if target_dir == None or results_loc == None or selected_tc_file == None or connection_file == None or utils_dir == None:
         print USAGE
         exit(1)
+    # SHARDS ARE ONLY COMPLEMENTARY IF ALL ARE SPLIT FROM THE SAME DURATIONS
+    if shard and (durations_file == None or not os.path.isfile(durations_file)):
+        print "ERROR: --shard requires an existing --durations-file, the same file given to every shard"
+        print USAGE
+        exit(1)
     continue_fail = False
     run_sanity = False
     run_regr = True
@@ -2080,6 +2109,8 @@ def main():
     ignore_va = False
     ignore_sfs = False
     verbose_logging=False
+    run_in_process = False
+    merge_shards = False
 
     if "--exclude_db" in sys.argv:
         exclude_db = True
@@ -2125,6 +2156,10 @@ def main():
         nasserver = True
     if "--verbose" in sys.argv:
         verbose_logging=True
+    if "--run-in-process" in sys.argv:
+        run_in_process = True
+    if "--merge-shard-results" in sys.argv:
+        merge_shards = True
     print ""
     print "----------------------------"
     print "Test runner Option: ", test_runner_option
@@ -2144,6 +2179,11 @@ def main():
     print "Option to copy image selected. Image:", image_path
     print "Option to create an allure test framework report:", report_allure
     print "Option to exclude db not ready tcs:", exclude_db
+    print "Option to run test cases in the test runner process:", run_in_process
+    print "Number of test cases run at a time:", workers
+    print "Shard of the test cases to run:", shard
+    print "Test case durations file:", durations_file
+    print "Option to create the reports from the results of all shards:", merge_shards
     print "----------------------------"
     print ""
     if "PYTHONPATH" in os.environ:
@@ -2156,7 +2196,7 @@ def main():
         if os.environ["CREATE_SNAPSHOT"] == 'true':
             is_snapshot = True
 
-    run_tests = RunTestCases(test_runner_option, target_dir, results_loc, connection_file, is_snapshot, test_type=selected_tc_file, continue_on_fail=continue_fail, run_sanity_check=run_sanity, run_regres=run_regr, report_only_run=report_only, test_ai_option=testoption, include_physical=physical, include_expansion=expansion, include_cdb=cdb_tests, include_kgb_other=kgb_only_tests, include_kgb_physical=kgb_physical_only, include_module_report=report_module, allure_report=report_allure, cdb_regression=cdb_regression_run, include_prepare_restore_other=bur_run, add_to_tms=add_tms_det, exclude_db=exclude_db,ignore_sfs=ignore_sfs,ignore_va=ignore_va,verbose_logging=verbose_logging)
+    run_tests = RunTestCases(test_runner_option, target_dir, results_loc, connection_file, is_snapshot, test_type=selected_tc_file, continue_on_fail=continue_fail, run_sanity_check=run_sanity, run_regres=run_regr, report_only_run=report_only, test_ai_option=testoption, include_physical=physical, include_expansion=expansion, include_cdb=cdb_tests, include_kgb_other=kgb_only_tests, include_kgb_physical=kgb_physical_only, include_module_report=report_module, allure_report=report_allure, cdb_regression=cdb_regression_run, include_prepare_restore_other=bur_run, add_to_tms=add_tms_det, exclude_db=exclude_db,ignore_sfs=ignore_sfs,ignore_va=ignore_va,verbose_logging=verbose_logging, run_in_process=run_in_process, workers=workers, shard=shard, merge_shards=merge_shards, durations_file=durations_file)
     if nasserver:
         cmd = "hostname -i"
         stdout, _, _ = run_tests.run_command_local(cmd, logs=False)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+'''
+COPYRIGHT Ericsson 2019
+The copyright to the computer program(s) herein is the property of
+Ericsson Inc. The programs may be used and/or copied only with written
+permission from Ericsson Inc. or in accordance with the terms and
+conditions stipulated in the agreement/contract under which the
+program(s) have been supplied.
+
+@since:     October 2026
+@summary:   Runs independent test cases concurrently on a pool of workers
+'''
+
+import threading
+import traceback
+
+
+class TestScheduler(object):
+    """
+    Runs test cases on a pool of worker threads, in an order allowed by a
+    dependency DAG built from the test list.
+
+    A test case without a parallel id, which is the default, runs alone:
+    it starts once every test before it in the list finished and every
+    test after it waits for it. Test cases with a parallel id may overlap
+    with each other, unless they hold a resource in common, e.g. 'ms_plan'
+    for test cases running a plan on the MS or a peer node hostname. Test
+    cases of an ordered_tcs.txt file also keep their order among
+    themselves.
+    """
+
+    def __init__(self, workers):
+        """
+        Initialise the scheduler.
+
+        Args:
+            workers (int): Maximum number of test cases run at a time.
+        """
+        self.workers = max(workers, 1)
+        # Test ids in list order
+        self.tests = []
+        # test id -> set of test ids which must finish first
+        self.deps = dict()
+        # test id -> set of resource names held while the test runs
+        self.resources = dict()
+        # Id of the first test case which raised, e.g. SystemExit on a
+        # fatal error, after which no more test cases are started
+        self.fatal = None
+
+    @staticmethod
+    def is_parallel(parallel_id):
+        """
+        Checks if a parallel id allows a test to overlap with others.
+
+        Args:
+            parallel_id (str): The parallel id of the test, if any.
+
+        Returns:
+            bool. True if the test may run concurrently.
+        """
+        return str(parallel_id).strip().lower() not in ["", "none", "false"]
+
+    @staticmethod
+    def get_resources(resources):
+        """
+        Parses the resources attribute of a test.
+
+        Args:
+            resources (str): Comma separated resource names, or None.
+
+        Returns:
+            set. The resource names.
+        """
+        if not resources:
+            return set()
+
+        return set([resource.strip() for resource in str(resources).split(",")
+                    if resource.strip()])
+
+    def add_tests(self, test_ids, parallel_ids, resources, ordered_chains):
+        """
+        Adds test cases to the DAG.
+
+        Args:
+            test_ids (list): Test ids, in the order the tests are listed.
+
+            parallel_ids (dict): Test id mapped to its parallel id.
+
+            resources (dict): Test id mapped to the set of resources it
+                holds.
+
+            ordered_chains (list): Lists of test ids which must run in the
+                order given, one per ordered_tcs.txt file.
+        """
+        chain_prev = dict()
+        for chain in ordered_chains:
+            for prev_id, test_id in zip(chain, chain[1:]):
+                chain_prev[test_id] = prev_id
+
+        # Last test which runs alone and tests added since
+        barrier = None
+        since_barrier = []
+
+        for test_id in test_ids:
+            if test_id in self.deps:
+                continue
+            deps = set()
+            if barrier:
+                deps.add(barrier)
+
+            if self.is_parallel(parallel_ids.get(test_id)):
+                # Only tests already added, so the DAG has no cycle
+                if chain_prev.get(test_id) in self.deps:
+                    deps.add(chain_prev[test_id])
+                since_barrier.append(test_id)
+            else:
+                deps.update(since_barrier)
+                barrier = test_id
+                since_barrier = []
+
+            self.tests.append(test_id)
+            self.deps[test_id] = deps
+            self.resources[test_id] = set(resources.get(test_id, set()))
+
+    def run(self, run_test):
+        """
+        Runs the test cases.
+
+        Args:
+            run_test (function): Called with a test id to run the test.
+                Returns False if no more tests should be started. If it
+                raises, no more tests are started and the test id is kept
+                in self.fatal.
+
+        Returns:
+            list. Ids of test cases which were not run.
+        """
+        pending = list(self.tests)
+        done = set()
+        running = set()
+        held = set()
+        stopped = []
+        cond = threading.Condition()
+
+        def run_on_worker(test_id):
+            """Runs one test and releases its resources"""
+            carry_on = False
+            try:
+                carry_on = run_test(test_id)
+            except (Exception, SystemExit):
+                print "ERROR: Running {0} failed: {1}".format(
+                    test_id, traceback.format_exc())
+                with cond:
+                    if self.fatal is None:
+                        self.fatal = test_id
+
+            with cond:
+                done.add(test_id)
+                running.discard(test_id)
+                held.difference_update(self.resources[test_id])
+                if not carry_on:
+                    stopped.append(test_id)
+                cond.notify_all()
+
+        with cond:
+            while pending or running:
+                for test_id in list(pending):
+                    if stopped or len(running) >= self.workers:
+                        break
+                    if not self.deps[test_id].issubset(done) or \
+                            self.resources[test_id] & held:
+                        continue
+                    pending.remove(test_id)
+                    running.add(test_id)
+                    held.update(self.resources[test_id])
+                    worker = threading.Thread(target=run_on_worker,
+                                              args=(test_id,))
+                    worker.daemon = True
+                    worker.start()
+
+                if not running:
+                    break
+                cond.wait()
+
+        return pending
@@ -17,6 +17,11 @@ import sys
 import os
 import subprocess
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "runner"))
+from test_index import TestIndex
+from test_durations import TestDurations
+
 
 class getPythonTestTags():
     """
@@ -27,6 +32,11 @@ class getPythonTestTags():
         """ Initialise variables for class """
 
         self.find_args = find_args
+        self.test_index = TestIndex()
+        # SHARDS ARE SPLIT FROM THE SAME FROZEN DURATIONS FILE
+        self.durations = TestDurations(find_args["DURATIONS_FILE"], frozen=True)
+        # TEST CASES OF ORDERED FILES, WHICH MUST STAY IN THE SAME SHARD
+        self.ordered_chain = []
 
     def run_command_local(self, cmd, logs=True):
         """
@@ -54,22 +64,11 @@ class getPythonTestTags():
     def get_testcase_tags(self, testfile, testcase):
         """ Get Test tags for test case """
 
-        cmd = 'grep -B6 "def {0}" {1}'.format(testcase, testfile)
-        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-        if exit_code != 0:
+        test = self.test_index.get_test(testfile, testcase)
+        if not test:
             return None
 
-        start = False
-        tags = ""
-        for line1 in stdout:
-            line = line1.replace("\"", "'")
-            if '@attr' in line:
-                start = True
-            if 'def test' in line:
-                break
-            if start:
-                tags += line.strip('/n')
-
+        tags = TestIndex.get_attr_str(test)
         tags = tags.replace("@attr", "").replace("'", "").replace("(", "").replace(")", "").replace(" ", "")
 
         return tags.strip()
@@ -77,29 +76,20 @@ class getPythonTestTags():
     def get_testcase_tms_id(self, testfile, testcase):
         """ Get TMS ID for test case """
 
-        cmd = 'grep -B6 "def {0}" {1}'.format(testcase, testfile)
-        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-        if exit_code != 0:
+        test = self.test_index.get_test(testfile, testcase)
+        if not test:
             return None
-        start = False
-        tags = ""
-        for line1 in stdout:
-            line = line1.replace("\"", "'")
-            if '@tmsid' in line:
-                start = True
-            if start and '@attr' in line or 'def test' in line:
-                break
-            if start:
-                tags += line.strip('/n')
-
-        tags = tags.replace("@tmsid", "").replace("'", "").replace("(", "").replace(")", "").replace(" ", "")
 
-        return tags.strip()
+        return ",".join(test["tms_ids"])
 
     def get_testcase_parallel_id(self, testfile, testcase):
         """ Get Parallel Param for test case """
 
-        return "False"
+        test = self.test_index.get_test(testfile, testcase)
+        if not test or test["attr_kwargs"].get("parallel") is None:
+            return "False"
+
+        return str(test["attr_kwargs"]["parallel"])
 
     def check_test_tag(self, test_case_tags):
         """ Check test tags against job actions """
@@ -221,6 +211,7 @@ class getPythonTestTags():
             if tcdec not in ordered_test_case_list:
                 new_ordered_test_case_list.append(tcdec)
         new_ordered_test_case_list.extend(ordered_test_case_list)
+        self.ordered_chain = ordered_test_case_list
         #print "--------------------------------"
         #for line in new_ordered_test_case_list:
         #    print line
@@ -232,10 +223,10 @@ class getPythonTestTags():
     
         # FIND ALL TEST CASE FILE, NAMES, TAGS, PARALLEL AND TMS ID
         # FIND TEST CASES IN FILES
-        cmd = 'grep -R "def test_" {0} | grep "testset" | grep ".py"'.format(self.find_args["TEST_LOCATION"])
-        stdout, stderr, exit_code = self.run_command_local(cmd, logs=False)
-        if stderr != [] or exit_code != 0:
-            print "ERROR: stderr is {0} and exit code is {1}".format(stderr, exit_code)
+        stdout = ["{0}:{1}".format(test["file"], test["name"]) for test
+                  in self.test_index.find_tests(self.find_args["TEST_LOCATION"])]
+        if stdout == []:
+            print "ERROR: No test cases found in {0}".format(self.find_args["TEST_LOCATION"])
             exit(1)
         unordered_test_case_list = []
         ordered_test_case_list = []
@@ -258,12 +249,26 @@ class getPythonTestTags():
         # PRESERVE ORDERING MECHANISM IF ANY
         ordered_test_case_list = self.get_ordered_tc_list(unordered_test_case_list)
         # PARALLEL v ORDERED
+        # IF SHARDED, KEEP THE TEST CASES OF THIS SHARD ONLY
+        if self.find_args["SHARD"]:
+            ordered_test_case_list = self.select_shard(ordered_test_case_list)
 
         for line in ordered_test_case_list:
             print line
 
         sys.exit(0)
 
+    def select_shard(self, test_case_list):
+        """
+        Keep the test cases of this shard, shards having about the same
+        duration in past runs
+        """
+        index, count = TestDurations.parse_shard(self.find_args["SHARD"])
+        # SKIPPED TEST CASES TAKE NO TIME
+        weights = dict((line, 0) for line in test_case_list if line.split(",")[2] == "SKIP_TEST")
+        shards = self.durations.split(test_case_list, count, lambda line: TestDurations.get_test_key(*line.split(",")[0:2]), chains=[self.ordered_chain], weights=weights)
+        return shards[index]
+
 def main():
     """
     main function
@@ -275,7 +280,7 @@ def main():
 
     helper = "Not enough arguments supplied, format should be:" \
     + " python create_python_test_csv.py --test_case_dir=<path> --test_case_tags=<test tags to run> --install_type=<cloud|physical> OPTIONAL: " \
-    + "--report_only_run --cdb_tests --kgb_only --kgb_other --run_pre_reg --run_reg_and_pre_reg --expansion --kgb_physical"
+    + "--report_only_run --cdb_tests --kgb_only --kgb_other --run_pre_reg --run_reg_and_pre_reg --expansion --kgb_physical --shard=<shard>/<number of shards> --durations_file=<test case durations to split shards from, the same file for every shard, required with --shard>"
     if len(sys.argv) < 2:
         print helper
         sys.exit(1)
@@ -293,6 +298,8 @@ def main():
     find_args["KGB_PHYSICAL"] = False
     find_args["EXPANSION"] = False
     find_args["RUN_MULTIPLE_MODULES"] = False
+    find_args["SHARD"] = None
+    find_args["DURATIONS_FILE"] = None
 
     for line in sys.argv:
         if "--install_type=" in line:
@@ -319,10 +326,18 @@ def main():
             find_args["RUN_MULTIPLE_MODULES"] = True
         if "--expansion" in line:
             find_args["EXPANSION"] = True
+        if "--shard=" in line:
+            find_args["SHARD"] = line.split("=")[-1]
+        if "--durations_file=" in line:
+            find_args["DURATIONS_FILE"] = line.split("=")[-1]
     if find_args["INSTALL_TYPE"] is None or find_args["TEST_TAGS"] is None or find_args["TEST_LOCATION"] is None:
         print "ERROR Mandatory properties not given:"
         print helper
         sys.exit(1)
+    if find_args["SHARD"] and (find_args["DURATIONS_FILE"] is None or not os.path.isfile(find_args["DURATIONS_FILE"])):
+        print "ERROR --shard requires an existing --durations_file:"
+        print helper
+        sys.exit(1)
 
     getPythonTestTags(find_args).find_python_tests()
 
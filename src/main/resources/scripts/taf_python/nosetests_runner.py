@@ -17,6 +17,12 @@ import sys
 import os
 import pexpect
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "runner"))
+from test_index import TestIndex
+from test_executor import TestExecutor
+from test_durations import TestDurations
+
 
 class RunPythonTestCase():
     """
@@ -47,6 +53,20 @@ class RunPythonTestCase():
             fopen = open(tc_output_file, "a+")
             if self.tc_args["test_action"] == "SKIP_TEST":
                 fopen.write("SKIPPED TEST CASE, NO LOGS\n")
+            elif self.tc_args["run_in_process"]:
+                # RUN THE TEST CASE IN THIS PROCESS, AS NOSETESTS IS CALLED
+                test_path = self.tc_args["test_case"]
+                test_name = self.tc_args["test_file"]
+                test = TestIndex().get_test(test_path, test_name)
+                if test:
+                    tc_result = TestExecutor().run_test(
+                        test_path, test["class"], test_name, fopen)
+                    final_result = tc_result["result"]
+                    time_taken = tc_result["time_taken"]
+                    fopen.write("\nResult: {0}\n".format(final_result))
+                else:
+                    fopen.write("Test case {0} not found in {1}\n".format(
+                        test_name, test_path))
             else:
                 for line in pexpect.spawn(cmd, timeout=20000):
                     if get_logs and "Ran 1 test in" not in line.strip():
@@ -73,6 +93,17 @@ class RunPythonTestCase():
             print "ERROR: Print timeout value has been reached..."
             self.timeout_failure = True
 
+        # RECORD THE DURATION TO SPLIT LATER RUNS INTO SHARDS, NOT DURING
+        # A SHARDED RUN AS THE SHARDS ARE SPLIT FROM THE DURATIONS FILE
+        if final_result in ["PASS", "FAIL", "ERROR"] and \
+                not self.tc_args["sharded_run"] and \
+                TestDurations.parse_time_taken(time_taken) is not None:
+            durations = TestDurations()
+            durations.record(TestDurations.get_test_key(
+                self.tc_args["test_case"], self.tc_args["test_file"]),
+                TestDurations.parse_time_taken(time_taken))
+            durations.save()
+
         if final_result == "PASS":
             sys.exit(0)
         if final_result == "ERROR" or final_result == "FAIL":
@@ -92,8 +123,8 @@ def main():
     helper = "Not enough arguments supplied, format should be:" \
     + " python nosetests_runner.py --test-file=<test_file> --test-case=<test_case_name>" \
     + " --test-action=<run|skip> --test-id=<tms_id> --test-utils=<test utils dir> --connection-file=<connection data>" \
-    + " --test-output-dir=<test result log file directory>"
-    if len(sys.argv) != 8:
+    + " --test-output-dir=<test result log file directory> OPTIONAL: --run-in-process --sharded-run"
+    if len(sys.argv) not in [8, 9, 10]:
         print helper
         sys.exit(1)
 
@@ -105,6 +136,8 @@ def main():
     tc_args["test_utils"] = None
     tc_args["connection_file"] = None
     tc_args["test_output_dir"] = None
+    tc_args["run_in_process"] = False
+    tc_args["sharded_run"] = False
     for line in sys.argv:
         if "--test-file=" in line:
             tc_args["test_file"] = line.split("=")[-1]
@@ -120,6 +153,10 @@ def main():
             tc_args["connection_file"] = line.split("=")[-1]
         if "--test-output-dir=" in line:
             tc_args["test_output_dir"] = line.split("=")[-1]
+        if "--run-in-process" in line:
+            tc_args["run_in_process"] = True
+        if "--sharded-run" in line:
+            tc_args["sharded_run"] = True
     if tc_args["test_file"] is None or tc_args["test_case"] is None or tc_args["test_action"] is None or tc_args["test_id"] is None or tc_args["test_utils"] is None or tc_args["connection_file"] is None or tc_args["test_output_dir"] is None:
         print helper
         sys.exit(1)
@@ -0,0 +1,171 @@
+"""
+Deadline Scheduler
+
+Process wide scheduler which runs a callback if a deadline registered
+for it is reached before it is cancelled.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import heapq
+import itertools
+import os
+import select
+import threading
+import time
+from litp_generic_utils import GenericUtils
+
+
+class DeadlineScheduler(object):
+    """Single timer thread enforcing any number of deadlines.
+
+    Deadlines are held in a heap ordered by expiry time. The timer thread
+    sleeps until the earliest deadline is due, or until a new earlier
+    deadline is registered, so it does not wake up while nothing is due.
+    """
+
+    def __init__(self):
+        """Initialise the scheduler. The timer thread is started when
+        the first deadline is registered.
+        """
+        self.g_util = GenericUtils()
+        # Number of deadlines which expired before being cancelled
+        self.expired_count = 0
+        # Heap of (expiry epoch time, token)
+        self.__heap = list()
+        # token -> (callback, description) of deadlines not yet cancelled
+        self.__active = dict()
+        self.__tokens = itertools.count()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        # Pipe used to wake the timer thread when an earlier deadline is
+        # added. On python 2, Condition.wait(timeout) polls every 50ms
+        # whereas select with a timeout blocks until woken. Created with
+        # the timer thread, so importing the module opens no descriptors.
+        self.__wake_read = None
+        self.__wake_write = None
+
+    def register(self, callback, timeout_secs, description=""):
+        """
+        Registers a deadline.
+
+        Args:
+            callback (function): Called from the timer thread if the deadline
+                is reached before being cancelled.
+
+            timeout_secs (int): Seconds from now until the deadline.
+
+        Kwargs:
+            description (str): Description logged if the deadline expires.
+
+        Returns:
+            int. Token used to cancel the deadline.
+        """
+        expiry = time.time() + timeout_secs
+
+        with self.__lock:
+            token = self.__tokens.next()
+            self.__active[token] = (callback, description)
+            earliest = not self.__heap or expiry < self.__heap[0][0]
+            heapq.heappush(self.__heap, (expiry, token))
+            self.__compact()
+
+            if not self.__thread:
+                self.__wake_read, self.__wake_write = os.pipe()
+                self.__thread = threading.Thread(target=self.__run)
+                self.__thread.daemon = True
+                self.__thread.start()
+
+        # Only wake the timer thread if it is sleeping for too long
+        if earliest:
+            os.write(self.__wake_write, "x")
+
+        return token
+
+    def cancel(self, token):
+        """
+        Cancels a deadline. Has no effect if the deadline has already
+        expired.
+
+        Args:
+            token (int): Token returned by register.
+        """
+        with self.__lock:
+            self.__active.pop(token, None)
+
+    def __compact(self):
+        """
+        Rebuilds the heap without cancelled deadlines once they
+        outnumber the active ones. Must be called holding the lock.
+        """
+        if len(self.__heap) > 2 * len(self.__active) + 64:
+            self.__heap = [item for item in self.__heap
+                           if item[1] in self.__active]
+            heapq.heapify(self.__heap)
+
+    def __next_expired(self):
+        """
+        Pops the next expired deadline from the heap.
+
+        Returns:
+            float, tuple. Seconds to sleep until the next deadline is due
+                (None if there is no deadline) and the (callback,
+                description) of an expired deadline, or None.
+        """
+        with self.__lock:
+            while self.__heap:
+                expiry, token = self.__heap[0]
+
+                if token not in self.__active:
+                    heapq.heappop(self.__heap)
+                    continue
+
+                sleep_secs = expiry - time.time()
+                if sleep_secs > 0:
+                    return sleep_secs, None
+
+                heapq.heappop(self.__heap)
+                self.expired_count += 1
+
+                return 0, self.__active.pop(token)
+
+        return None, None
+
+    def __run(self):
+        """
+        Timer thread. Runs the callbacks of expired deadlines and otherwise
+        sleeps until the next deadline is due.
+        """
+        while True:
+            sleep_secs, expired = self.__next_expired()
+
+            if expired:
+                callback, description = expired
+                self.g_util.log("error", "Deadline reached: {0} ({1} "
+                                "expired so far)".format(description,
+                                                         self.expired_count))
+                try:
+                    callback()
+                except Exception as except_err:
+                    self.g_util.log("error", "Deadline callback failed: {0}"
+                                    .format(except_err))
+                continue
+
+            readable, _, _ = select.select([self.__wake_read], [], [],
+                                           sleep_secs)
+            if readable:
+                os.read(self.__wake_read, 4096)
+
+    def get_stats(self):
+        """
+        Returns the scheduler counters.
+
+        Returns:
+            dict. Number of active deadlines and deadlines which expired.
+        """
+        with self.__lock:
+            return {"active": len(self.__active),
+                    "expired": self.expired_count}
+
+
+DEADLINE_SCHEDULER = DeadlineScheduler()
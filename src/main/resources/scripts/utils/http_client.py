@@ -0,0 +1,214 @@
+"""
+HTTP Client
+
+In-process HTTP(S) client keeping connections alive between requests.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import errno
+import httplib
+import socket
+import ssl
+import threading
+import time
+import urlparse
+
+
+class HTTPClient(object):
+    """Pool of keep-alive HTTP(S) connections keyed by (scheme, host, port).
+
+    Connections are checked out for the duration of a request so the
+    client can be shared between threads. Certificates are not verified,
+    in line with the curl -k option previously used for REST requests.
+    """
+
+    def __init__(self, timeout=60, max_idle=8):
+        """Initialise the client.
+
+        Kwargs:
+            timeout (int): Socket timeout in seconds. Default is 60.
+
+            max_idle (int): Maximum number of idle connections kept
+                per server. Default is 8.
+        """
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.requests = 0
+        self.connections_opened = 0
+        # (scheme, host, port) -> list of idle connections
+        self.__idle = dict()
+        self.__lock = threading.Lock()
+
+    def __new_connection(self, scheme, host, port):
+        """
+        Opens a new connection.
+
+        Args:
+            scheme (str): http or https.
+
+            host (str): Server IP address or hostname.
+
+            port (int): Server port.
+
+        Returns:
+            HTTPConnection. The new connection.
+        """
+        with self.__lock:
+            self.connections_opened += 1
+
+        if scheme == "https":
+            # Only available from python 2.7.9, before that certificates
+            # are not verified anyway
+            unverified = getattr(ssl, "_create_unverified_context", None)
+            if unverified:
+                return httplib.HTTPSConnection(host, port,
+                                               timeout=self.timeout,
+                                               context=unverified())
+
+            return httplib.HTTPSConnection(host, port, timeout=self.timeout)
+
+        return httplib.HTTPConnection(host, port, timeout=self.timeout)
+
+    def __acquire(self, key):
+        """
+        Checks an idle connection out of the pool or opens a new one.
+
+        Args:
+            key (tuple): (scheme, host, port) of the server.
+
+        Returns:
+            HTTPConnection, bool. The connection and True if it is a
+                reused keep-alive connection.
+        """
+        with self.__lock:
+            idle = self.__idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        return self.__new_connection(*key), False
+
+    def __release(self, key, conn):
+        """
+        Hands a connection back to the pool.
+
+        Args:
+            key (tuple): (scheme, host, port) of the server.
+
+            conn (HTTPConnection): The connection to hand back.
+        """
+        with self.__lock:
+            idle = self.__idle.setdefault(key, list())
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    @staticmethod
+    def is_stale_connection_error(except_err):
+        """
+        Checks if a request failed because the server had closed the idle
+        keep-alive connection it was sent on, so it never received or never
+        answered the request and it is safe to send it again. A timeout is
+        never such an error, the server may still be processing the request.
+
+        Args:
+            except_err (Exception): The error raised by the request.
+
+        Returns:
+            bool. True if the request can be sent again.
+        """
+        if isinstance(except_err, socket.timeout):
+            return False
+
+        if isinstance(except_err, httplib.BadStatusLine):
+            return True
+
+        return isinstance(except_err, socket.error) and \
+            except_err.errno in (errno.ECONNRESET, errno.EPIPE)
+
+    def request(self, method, url, headers=None, body=None):
+        """
+        Sends a request, reusing a keep-alive connection to the server if
+        one is available.
+
+        Args:
+            method (str): Request type, e.g. GET, POST, PUT, DELETE.
+
+            url (str): Full URL of the resource.
+
+        Kwargs:
+            headers (dict): Request headers.
+
+            body (str): Request body.
+
+        Returns:
+            int, str, float. HTTP response status, response body and the
+                request latency in seconds.
+
+        Raises:
+            HTTPException, socket.error if the request cannot be sent.
+        """
+        parsed = urlparse.urlsplit(url)
+        default_port = 443 if parsed.scheme == "https" else 80
+        key = (parsed.scheme, parsed.hostname, parsed.port or default_port)
+
+        path = parsed.path or "/"
+        if parsed.query:
+            path = "{0}?{1}".format(path, parsed.query)
+
+        start_time = time.time()
+
+        with self.__lock:
+            self.requests += 1
+
+        while True:
+            conn, reused = self.__acquire(key)
+
+            try:
+                conn.request(method, path, body, headers or dict())
+                response = conn.getresponse()
+                content = response.read()
+            except (httplib.HTTPException, socket.error) as except_err:
+                conn.close()
+                # The server may have closed an idle keep-alive connection
+                # before getting the request, retry on another one. Any other
+                # failure may come after the request was processed, so it is
+                # not retried as requests such as POST are not idempotent.
+                if reused and self.is_stale_connection_error(except_err):
+                    continue
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self.__release(key, conn)
+
+            return response.status, content, time.time() - start_time
+
+    def close_all(self):
+        """
+        Closes all idle connections.
+        """
+        with self.__lock:
+            idle = self.__idle
+            self.__idle = dict()
+
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def get_stats(self):
+        """
+        Returns the client counters.
+
+        Returns:
+            dict. Number of requests sent and connections opened.
+        """
+        with self.__lock:
+            return {"requests": self.requests,
+                    "connections_opened": self.connections_opened}
+
+
+HTTP_CLIENT = HTTPClient()
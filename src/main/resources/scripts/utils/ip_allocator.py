@@ -0,0 +1,133 @@
+"""
+IP Allocator
+
+Finds free addresses in an IPv4 or IPv6 range without expanding the
+range into a list of address strings.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+from netaddr import IPAddress, AddrFormatError
+
+
+class IPAllocator(object):
+    """Free addresses of an IP range, held as integers.
+
+    The range is an integer interval and used addresses are a set of
+    integers, so marking an address used and checking it are O(1) and
+    free addresses are only turned into strings as they are yielded.
+    """
+
+    def __init__(self, start_ip, end_ip):
+        """Initialise the allocator with no used addresses.
+
+        Args:
+            start_ip (str): The first IP in the range.
+
+            end_ip (str): The last IP in the range.
+        """
+        start = IPAddress(start_ip)
+        end = IPAddress(end_ip)
+
+        if start.version != end.version:
+            raise ValueError("IP range {0} - {1} mixes IP versions"
+                             .format(start_ip, end_ip))
+
+        self.version = start.version
+        self.start = int(start)
+        self.end = int(end)
+        self.__used = set()
+
+    def __to_int(self, ip_addr):
+        """
+        Converts an address of the range's IP version to an integer.
+
+        Args:
+            ip_addr (str): The IP address, optionally with a /prefix.
+
+        Returns:
+            int. The address or None if it is not a valid address of the
+                range's IP version.
+        """
+        try:
+            address = IPAddress(str(ip_addr).strip().split("/")[0])
+        except (AddrFormatError, ValueError, TypeError):
+            return None
+
+        if address.version != self.version:
+            return None
+
+        return int(address)
+
+    def mark_used(self, ip_addrs):
+        """
+        Marks addresses as used. Invalid addresses, addresses of the other
+        IP version and addresses outside the range are ignored.
+
+        Args:
+            ip_addrs (list): The used IP addresses.
+        """
+        for ip_addr in ip_addrs:
+            value = self.__to_int(ip_addr)
+
+            if value is not None and self.start <= value <= self.end:
+                self.__used.add(value)
+
+    def is_free(self, ip_addr):
+        """
+        Checks if an address is in the range and not used.
+
+        Args:
+            ip_addr (str): The IP address.
+
+        Returns:
+            bool. True if the address is free.
+        """
+        value = self.__to_int(ip_addr)
+
+        return value is not None and self.start <= value <= self.end and \
+            value not in self.__used
+
+    def count_free(self):
+        """
+        Returns the number of free addresses.
+
+        Returns:
+            int. The number of addresses in the range not used.
+        """
+        return self.end - self.start + 1 - len(self.__used)
+
+    def iter_free(self):
+        """
+        Yields the free addresses in ascending order.
+
+        Returns:
+            generator. The free addresses as strings.
+        """
+        value = self.start
+
+        # Used addresses split the range into free intervals
+        for used in sorted(self.__used) + [self.end + 1]:
+            while value < used:
+                yield str(IPAddress(value, self.version))
+                value += 1
+            value = used + 1
+
+    def get_free(self, count=1):
+        """
+        Returns the first free addresses.
+
+        Kwargs:
+            count (int): The number of addresses to return.
+
+        Returns:
+            list. Up to count free addresses.
+        """
+        free_ips = list()
+
+        for ip_addr in self.iter_free():
+            if len(free_ips) >= count:
+                break
+            free_ips.append(ip_addr)
+
+        return free_ips
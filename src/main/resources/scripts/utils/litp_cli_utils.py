@@ -14,6 +14,21 @@ class CLIUtils(object):
     CLI related utilities.
     """
 
+    # Matches the LITP command run, skipping any credential arguments
+    LITP_CMD_REGEX = re.compile(r'\blitp(?:\s+-[uP]\s+\S+)*\s+([a-z_]+)')
+    # LITP commands which run a plan
+    PLAN_CMDS = ["run_plan", "prepare_restore", "create_snapshot",
+                 "remove_snapshot", "restore_snapshot"]
+    # Requests to the LITP REST API made with curl which change the model
+    # and, for plans, snapshots and prepare restore, may run a plan
+    REST_CURL_REGEX = re.compile(r'\bcurl\b.*/litp/rest/')
+    REST_CHANGE_REGEX = re.compile(r'(-X\s*|--request\s+)["\']?'
+                                   r'(PUT|POST|DELETE)|\s(-d|--data)')
+    REST_PLAN_REGEX = re.compile(r'/litp/rest/\S*(plans|snapshots|'
+                                 r'prepare-restore)')
+    # Separates the output of each show run by get_bulk_show_cmd
+    BULK_SHOW_MARKER = "#LITP_BULK_SHOW#"
+
     def __init__(self):
         """Initialise LITP path variables.
         """
@@ -482,6 +497,58 @@ class CLIUtils(object):
 
         return show_command
 
+    def get_bulk_show_cmd(self, urls, args=''):
+        """Generate one command running a LITP show on each passed URL.
+        The output of each show is preceded by a line holding the marker
+        in BULK_SHOW_MARKER and the URL, and followed by a line holding the
+        marker and the show return code. Errors are written to stdout.
+
+        Args:
+            urls (list): The URLs to show.
+
+        Kwargs:
+            args (str): Optional arguments to use in each show command.
+
+        Returns:
+            str. The command running all shows.
+        """
+        quoted_urls = " ".join(["'{0}'".format(url) for url in urls])
+
+        return "for url in {0}; do echo \"{1} $url\"; " \
+            "{2} show -p \"$url\" {3} 2>&1; echo \"{1} $?\"; done"\
+            .format(quoted_urls, self.BULK_SHOW_MARKER, self.litp_path, args)
+
+    def get_bulk_show_output(self, stdout):
+        """Splits the output of a command generated by get_bulk_show_cmd
+        into the output of each show.
+
+        Args:
+            stdout (list): The output of the command.
+
+        Returns:
+            dict. Each URL mapped to the output lines and return code of its
+                show.
+        """
+        shows = dict()
+        url = None
+        lines = list()
+
+        for line in stdout:
+            if not line.startswith(self.BULK_SHOW_MARKER):
+                lines.append(line)
+                continue
+
+            value = line[len(self.BULK_SHOW_MARKER):].strip()
+
+            if url is None:
+                url = value
+                lines = list()
+            else:
+                shows[url] = (lines, int(value) if value.isdigit() else 1)
+                url = None
+
+        return shows
+
     def get_path_state_cmd(self, url):
         """A show command with greps included to strip out
         the state of the passed path.
@@ -747,10 +814,92 @@ class CLIUtils(object):
         Returns:
             bool. True if command is a run_plan command.
         """
-        if "{0} run_plan".format(self.litp_path) in cmd:
-            return True
+        return "run_plan" in [match.group(1) for match
+                              in self.LITP_CMD_REGEX.finditer(cmd)]
 
-        return False
+    def is_rest_change_cmd(self, cmd):
+        """Returns True if the passed command changes the LITP model with a
+        curl request to the REST API.
+
+        Args:
+            cmd (str): The command to test.
+
+        Returns:
+            bool. True if the command makes a PUT, POST or DELETE request.
+        """
+        return bool(self.REST_CURL_REGEX.search(cmd) and
+                    self.REST_CHANGE_REGEX.search(cmd))
+
+    def is_plan_starting_cmd(self, cmd):
+        """Returns True if the passed command may start a plan, in any form
+        of the litp command or with a curl request to the REST API.
+
+        Args:
+            cmd (str): The command to test.
+
+        Returns:
+            bool. True if the command may run a plan.
+        """
+        if '--help' in cmd or re.search(r'\s-h\b', cmd):
+            return False
+
+        for match in self.LITP_CMD_REGEX.finditer(cmd):
+            if match.group(1) in self.PLAN_CMDS:
+                return True
+
+        return self.is_rest_change_cmd(cmd) and \
+            bool(self.REST_PLAN_REGEX.search(cmd))
+
+    def get_mutated_paths(self, cmd):
+        """Returns the paths of the parts of the LITP model which the passed
+        command may change. Only show, show_plan, export and version are
+        known not to change the model. Commands changing an item change the
+        subtree under its path, any other command, or a change made with a
+        curl request to the REST API, may change the whole model.
+
+        Args:
+            cmd (str): The command to test.
+
+        Returns:
+            list. The changed paths, '/' for the whole model, or an empty
+                list if the command does not change the model.
+        """
+        read_only_cmds = ["show", "show_plan", "export", "version"]
+        subtree_cmds = ["create", "update", "remove", "inherit", "link",
+                        "load", "upgrade"]
+        paths = list()
+
+        for match in self.LITP_CMD_REGEX.finditer(cmd):
+            litp_cmd = match.group(1)
+
+            if litp_cmd in read_only_cmds:
+                continue
+
+            path_match = None
+            if litp_cmd in subtree_cmds:
+                path_match = re.search(r'\s-p\s+(\S+)', cmd[match.end():])
+
+            if path_match:
+                paths.append(path_match.group(1).strip("'\""))
+            else:
+                paths.append("/")
+
+        if self.is_rest_change_cmd(cmd):
+            paths.append("/")
+
+        return paths
+
+    def is_model_mutating_cmd(self, cmd):
+        """Returns True if the passed command runs any LITP command which
+        may change the model.
+
+        Args:
+            cmd (str): The command to test.
+
+        Returns:
+            bool. True if the command may change the LITP model.
+        """
+        return bool(self.get_mutated_paths(cmd))
 
     def get_remove_plan_cmd(self, args=''):
         """Generate a LITP remove_plan command.
@@ -2,10 +2,110 @@
 LITP Generic Cluster
 """
 
-from os import listdir, path, environ
+import threading
+from os import listdir, path, environ, stat
 from litp_generic_node import GenericNode
 
 
+# Connection data path -> (signature of the files, list of dicts holding the
+# attributes of each node), shared by every GenericCluster so the files are
+# only parsed again when they change
+PARSED_CON_DATA = dict()
+PARSED_CON_DATA_LOCK = threading.Lock()
+
+
+def get_files_signature(filepaths):
+    """
+    Returns a value which changes whenever one of the files changes.
+
+    Args:
+        filepaths (list): Paths of the files.
+
+    Returns:
+        tuple. Path, modification time and size of each file.
+    """
+    signature = list()
+
+    for filepath in filepaths:
+        file_stat = stat(filepath)
+        signature.append((filepath, file_stat.st_mtime, file_stat.st_size))
+
+    return tuple(signature)
+
+
+def get_parsed_con_data(key, filepaths, parse):
+    """
+    Returns the parsed connection data, parsing the files only if they
+    changed since they were last parsed.
+
+    Args:
+        key (str): Identifies the connection data, e.g. its path.
+
+        filepaths (list): Paths of the connection data files.
+
+        parse (function): Called with no arguments to parse the files.
+            Returns a list of dicts holding the attributes of each node.
+
+    Returns:
+        list. Dicts holding the attributes of each node.
+    """
+    signature = get_files_signature(filepaths)
+
+    with PARSED_CON_DATA_LOCK:
+        cached = PARSED_CON_DATA.get(key)
+
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    node_atts = parse()
+
+    with PARSED_CON_DATA_LOCK:
+        PARSED_CON_DATA[key] = (signature, node_atts)
+
+    return node_atts
+
+
+class NodeList(list):
+    """List of nodes which counts its changes, so indexes of the nodes know
+    when they must be rebuilt.
+    """
+
+    def __init__(self, *args):
+        """Initialise the list.
+        """
+        super(NodeList, self).__init__(*args)
+        self.version = 0
+
+    def __changed(method):
+        """Wraps a list method so it counts a change.
+        """
+        def wrapper(self, *args, **kwargs):
+            """Runs the list method and counts a change"""
+            self.version += 1
+            return method(self, *args, **kwargs)
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+
+        return wrapper
+
+    append = __changed(list.append)
+    extend = __changed(list.extend)
+    insert = __changed(list.insert)
+    remove = __changed(list.remove)
+    pop = __changed(list.pop)
+    sort = __changed(list.sort)
+    reverse = __changed(list.reverse)
+    __setitem__ = __changed(list.__setitem__)
+    __delitem__ = __changed(list.__delitem__)
+    __setslice__ = __changed(list.__setslice__)
+    __delslice__ = __changed(list.__delslice__)
+    __iadd__ = __changed(list.__iadd__)
+    __imul__ = __changed(list.__imul__)
+
+    del __changed
+
+
 class GenericCluster(object):
     """Abstraction of a cluster of nodes.
 
@@ -17,7 +117,11 @@ class GenericCluster(object):
         """Initialization of properties plus instantiation
            of multiple classes :class:`GenericNode` forming a cluster.
         """
-        self.nodes = []
+        self.nodes = NodeList()
+        # Attribute -> {value: list of (position, node)}, rebuilt when the
+        # node list or an indexed node attribute changes
+        self.__index = dict()
+        self.__index_version = None
 
         new_format = False
         # This is where the new style taf file format is found
@@ -52,52 +156,97 @@ class GenericCluster(object):
             # to this file
             self.path = path.join(filepath, self.con_data_path)
 
-            for item in listdir(path.join(self.path, self.slave)):
-                with open(path.join(self.path, self.slave, item), 'r') \
-                        as nodefile:
-                    for line in nodefile:
-                        if not line.startswith('#'):
-                            line = line.strip().strip('\n').split(',')
-                            if line and len(line) == self.fields:
-                                try:
-                                    #line = line.split(',')
-                                    node = GenericNode()
-                                    ##This will soon be set by the connection
-                                    #data files. Hardcoded temp
-                                    node.rootpw = "@dm1nS3rv3r"
-
-                                    node.ipv4 = line[0]
-                                    node.username = line[1]
-                                    node.password = line[2]
-                                    node.mac = line[3]
-                                    node.ipv6 = line[4]
-                                    node.hostname = line[5]
-                                    # node.nodetype = line[6].lower()
-                                    node.nodetype = line[6].lower()
-                                    node.filename = item.lower()
-                                    # If not set in the file, set based
-                                    # on filename
-                                    if not node.nodetype or \
-                                            "end" in node.nodetype:
-                                        node.nodetype = \
-                                            self.set_type_by_filename(
-                                            node.filename)
-
-                                    self.nodes.append(node)
-                                except Exception:
-                                    raise ValueError(
-                                        """
-                                        Processing: {fname}
-
-                                        Please check your data conn files!
-                                        """.format(fname=item))
+            self.parse_legacy_con_files()
+
+    def __add_nodes(self, node_atts):
+        """
+        Creates a node for each set of parsed attributes. New nodes are
+        created for every cluster as nodes hold connections and tests change
+        their attributes.
+
+        Args:
+           node_atts (list): Dicts holding the attributes of each node.
+        """
+        for atts in node_atts:
+            node = GenericNode()
+            for att, value in atts.iteritems():
+                if isinstance(value, dict):
+                    value = dict(value)
+                setattr(node, att, value)
+
+            self.nodes.append(node)
+
+    def parse_legacy_con_files(self):
+        """
+        Read data from the legacy connection data files, one file per node.
+        The files are only parsed again if they changed since they were
+        last parsed.
+        """
+        slave_path = path.join(self.path, self.slave)
+        filepaths = [slave_path] + [path.join(slave_path, item)
+                                    for item in sorted(listdir(slave_path))]
+
+        self.__add_nodes(get_parsed_con_data(
+            slave_path, filepaths, self.load_legacy_data_fields))
+
+    def load_legacy_data_fields(self):
+        """
+        Loads the legacy connection data files.
+
+        Returns:
+            list. Dicts holding the attributes of each node.
+        """
+        node_atts = list()
+
+        for item in listdir(path.join(self.path, self.slave)):
+            with open(path.join(self.path, self.slave, item), 'r') \
+                    as nodefile:
+                for line in nodefile:
+                    if not line.startswith('#'):
+                        line = line.strip().strip('\n').split(',')
+                        if line and len(line) == self.fields:
+                            try:
+                                ##This will soon be set by the connection
+                                #data files. Hardcoded temp
+                                atts = {'rootpw': "@dm1nS3rv3r",
+                                        'ipv4': line[0],
+                                        'username': line[1],
+                                        'password': line[2],
+                                        'mac': line[3],
+                                        'ipv6': line[4],
+                                        'hostname': line[5],
+                                        'nodetype': line[6].lower(),
+                                        'filename': item.lower()}
+                                # If not set in the file, set based
+                                # on filename
+                                if not atts['nodetype'] or \
+                                        "end" in atts['nodetype']:
+                                    atts['nodetype'] = \
+                                        self.set_type_by_filename(
+                                        atts['filename'])
+
+                                node_atts.append(atts)
+                            except Exception:
+                                raise ValueError(
+                                    """
+                                    Processing: {fname}
+
+                                    Please check your data conn files!
+                                    """.format(fname=item))
+
+        return node_atts
 
     def load_taf_data_fields(self):
         """
         Loads the TAF config file into a dict.
+
+        Returns:
+            list, list. Single entry dicts mapping each variable name to its
+            value and the hostnames found, in the order they appear.
         """
         variable_list = list()
         created_nodes = list()
+        seen_nodes = set()
 
         # Load all variables into a dictionary list
         with open(self.con_data_path, 'r') as nodefile:
@@ -118,7 +267,8 @@ class GenericCluster(object):
                     # Get hostname from variable name
                     hostname = variable_name.split(".")[1]
 
-                    if not hostname in created_nodes:
+                    if hostname not in seen_nodes:
+                        seen_nodes.add(hostname)
                         created_nodes.append(hostname)
 
                     variable_dict[variable_name] = variable_value
@@ -128,49 +278,56 @@ class GenericCluster(object):
 
     def parse_taf_con_file(self):
         """
-        Read data from TAF format connection data files.
+        Read data from TAF format connection data files. The file is only
+        parsed again if it changed since it was last parsed.
+        """
+        self.__add_nodes(get_parsed_con_data(
+            self.con_data_path, [self.con_data_path],
+            self.load_taf_node_atts))
+
+    def load_taf_node_atts(self):
         """
+        Parses the TAF connection data file in a single pass over its
+        variables.
 
+        Returns:
+            list. Dicts holding the attributes of each node.
+        """
         variable_list, created_nodes \
             = self.load_taf_data_fields()
 
+        node_atts = dict()
         for hostname in created_nodes:
-            node = GenericNode()
-            node.hostname = hostname
-            node.filename = hostname
-            node.mac = None
-            node.ipv6 = None
-
-            for variable in variable_list:
-                for key, value in variable.iteritems():
-                    #print "KEY", key
-                    #print "VALUE", value
-                    if hostname in key:
-                        #print "--------------------------"
-                        if ".ipv6" in key:
-                            node.ipv6 = value.strip()
-                        if ".ip" in key and ".ipv6" not in key:
-                            node.ipv4 = value.strip()
-                            #print "ipv4: ", node.ipv4
-                        if ".vip" in key:
-                            splitted = key.split(".vip")
-                            if len(splitted) < 2:
-                                vip_name = "vip1"
-                            else:
-                                vip_name = splitted[-1]
-                            node.vips[vip_name] = value.strip()
-                        elif "user.root.pass" in key:
-                            node.rootpw = value.strip()
-                            #print "root passwd: ", node.rootpw
-                        elif "user." in key and ".type" not in key:
-                            node.password = value.strip()
-                            node.username = key.split(".")[3]
-                            #print "user: ", node.username
-                            #print "passwd: ", node.password
-                        elif ".type" in key and "user.root" not in key:
-                            node.nodetype = self.__get_nodetype(value)
-
-            self.nodes.append(node)
+            node_atts[hostname] = {'hostname': hostname,
+                                   'filename': hostname,
+                                   'mac': None,
+                                   'ipv6': None,
+                                   'vips': dict()}
+
+        for variable in variable_list:
+            for key, value in variable.iteritems():
+                # Variables are named host.<hostname>.<attribute>
+                atts = node_atts[key.split(".")[1]]
+                if ".ipv6" in key:
+                    atts['ipv6'] = value.strip()
+                if ".ip" in key and ".ipv6" not in key:
+                    atts['ipv4'] = value.strip()
+                if ".vip" in key:
+                    splitted = key.split(".vip")
+                    if len(splitted) < 2:
+                        vip_name = "vip1"
+                    else:
+                        vip_name = splitted[-1]
+                    atts['vips'][vip_name] = value.strip()
+                elif "user.root.pass" in key:
+                    atts['rootpw'] = value.strip()
+                elif "user." in key and ".type" not in key:
+                    atts['password'] = value.strip()
+                    atts['username'] = key.split(".")[3]
+                elif ".type" in key and "user.root" not in key:
+                    atts['nodetype'] = self.__get_nodetype(value)
+
+        return [node_atts[hostname] for hostname in created_nodes]
 
     @staticmethod
     def __get_nodetype(value):
@@ -221,3 +378,68 @@ class GenericCluster(object):
         else:
             n_type = "managed"
         return n_type
+
+    def __get_index(self, att):
+        """
+        Returns the index of the nodes by an attribute, rebuilding all
+        indexes if the nodes changed since they were built.
+
+        Args:
+           att (str): One of GenericNode.INDEXED_ATTS.
+
+        Returns:
+            dict. Attribute value mapped to a list of (position, node).
+        """
+        version = (self.nodes.version, GenericNode.index_generation)
+
+        if version != self.__index_version:
+            self.__index = dict((index_att, dict())
+                                for index_att in GenericNode.INDEXED_ATTS)
+            for position, node in enumerate(self.nodes):
+                for index_att in GenericNode.INDEXED_ATTS:
+                    self.__index[index_att].setdefault(
+                        getattr(node, index_att), list()).append(
+                        (position, node))
+            self.__index_version = version
+
+        return self.__index[att]
+
+    def get_nodes_by_att(self, att, values):
+        """
+        Returns the nodes with an attribute matching any of the given
+        values.
+
+        Args:
+           att (str): The node attribute, e.g. 'hostname'.
+
+           values (list): The attribute values to match.
+
+        Returns:
+            list. The matching nodes, in the order of the node list.
+        """
+        # Strings match by substring, so only lists can use the index
+        if att not in GenericNode.INDEXED_ATTS or \
+                isinstance(values, basestring):
+            return [node for node in self.nodes
+                    if getattr(node, att) in values]
+
+        index = self.__get_index(att)
+        matches = list()
+        for value in set(values):
+            matches.extend(index.get(value, list()))
+
+        return [node for _, node in sorted(matches)]
+
+    def get_node_by_filename(self, filename):
+        """
+        Returns the first node with a filename.
+
+        Args:
+           filename (str): The node filename.
+
+        Returns:
+            GenericNode. The node or None if there is no such node.
+        """
+        matches = self.__get_index('filename').get(filename)
+
+        return matches[0][1] if matches else None
@@ -3,12 +3,89 @@ LITP Generic Node
 """
 
 import paramiko
+import functools
+import os
 import time
 import socket
+import select
+import threading
 import StringIO
 from litp_generic_utils import GenericUtils
+from ssh_connection_pool import SSH_POOL
+from deadline_scheduler import DEADLINE_SCHEDULER
+from sftp_transfer import SftpTransfer
+from tar_stream import TarStream
+from sync_manifest import SyncManifest, get_sync_manifest
 import logging
-import threading
+
+
+class ExpectsMatcher(object):
+    """Matches expects prompts against output as it is received from a
+    channel.
+
+    Only newly received data plus the unfinished last line is scanned on
+    each call, rather than the whole output received so far.
+    """
+
+    def __init__(self, username, tail_window=4096):
+        """Initialise the matcher.
+
+        Args:
+            username (str): Username the command is run as, used to strip
+                the sudo password prompt.
+
+        Kwargs:
+            tail_window (int): Maximum number of characters of an
+                unfinished line kept for rescanning. Default is 4096.
+        """
+        self.sudo_prompt = "[sudo] password for {0}:".format(username)
+        self.tail_window = tail_window
+        self.__pending = ""
+
+    def __clean_line(self, line):
+        """Strips a line in the same way as GenericNode processes results.
+
+        Args:
+            line (str): A single line of output.
+
+        Returns:
+            str. The stripped line.
+        """
+        line = line.replace(self.sudo_prompt, "")
+        line = line.replace(" \r", "")
+        line = line.replace(" \t", "")
+
+        return line.strip()
+
+    def feed(self, data, prompt):
+        """Adds received data and looks for the prompt in it.
+
+        Lines are considered in reverse order so the most recently returned
+        output is matched first. Once a prompt has matched, output up to
+        and including the matched line is not scanned again.
+
+        Args:
+            data (str): Data just received from the channel.
+
+            prompt (str): The prompt to look for.
+
+        Returns:
+            str. The line containing the prompt, or None if not found.
+        """
+        lines = (self.__pending + data).split('\n')
+
+        for pos in reversed(range(len(lines))):
+            line = self.__clean_line(lines[pos])
+            if line and prompt in line:
+                self.__pending = \
+                    '\n'.join(lines[pos + 1:])[-self.tail_window:]
+                return line
+
+        # All complete lines have now been scanned for this prompt, only the
+        # unfinished last line needs to be scanned again
+        self.__pending = lines[-1][-self.tail_window:]
+
+        return None
 
 
 class GenericNode(object):
@@ -18,6 +95,11 @@ class GenericNode(object):
        This will be instantiated from :class:`GenericCluster`
     """
 
+    # Attributes GenericCluster indexes nodes by
+    INDEXED_ATTS = ('filename', 'hostname', 'ipv4', 'ipv6', 'nodetype')
+    # Counts changes to indexed attributes of any node
+    index_generation = 0
+
     def __init__(self):
         """Initialization of properties only.
         """
@@ -29,6 +111,10 @@ class GenericNode(object):
         self.hostname = None
         self.host = None
         self.ssh = None
+        # Key the current connection is held under in the SSH_POOL
+        self.pool_key = None
+        # SFTP session reused by file copies while the connection is open
+        self.sftp = None
         self.nodetype = None
         self.filename = None
         self.rootpw = None
@@ -47,12 +133,39 @@ class GenericNode(object):
         self.session_timeout = 60
         # Timeout to wait for output after execution of a cmd
         self.execute_timeout = 0.25
+        # If True, execute waits on the channel for data to arrive rather
+        # than sleeping for execute_timeout. Set to False to fall back to
+        # the original sleep-and-poll behaviour.
+        self.event_driven_read = True
+        # The channel only becomes readable for stdout data and EOF, not
+        # for stderr data, so waits on it are cut to this many seconds to
+        # pick up stderr as well
+        self.stderr_poll_secs = 0.1
+        # Calls which registered a connection deadline and have not
+        # returned yet, a deadline only kills the connection of its own call
+        self.deadline_calls = set()
+        self.deadline_lock = threading.Lock()
         ##Keeps track if active connection is root
         self.root_connected = True
         self.refresh_epoch_time = self.__get_current_epoch()
         self.last_connect_time = self.__get_current_epoch()
         self.g_util = GenericUtils()
-        self.kill_connection_time = 600
+
+    def __setattr__(self, name, value):
+        """Sets an attribute, counting changes to indexed attributes.
+        """
+        if name in GenericNode.INDEXED_ATTS:
+            GenericNode.index_generation += 1
+
+        # Pooled connections authenticated with the old password are stale
+        if name in ('password', 'rootpw') and \
+                getattr(self, name, None) not in (None, value):
+            username = 'root' if name == 'rootpw' else self.username
+            for host in (self.ipv4, self.ipv6):
+                if host:
+                    SSH_POOL.discard_user(host, username)
+
+        object.__setattr__(self, name, value)
 
     @staticmethod
     def __get_current_epoch():
@@ -115,8 +228,6 @@ class GenericNode(object):
         """
         self.retry += 1
 
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         if ipv4:
             self.host = self.ipv4
         else:
@@ -125,6 +236,20 @@ class GenericNode(object):
             username = self.username
         if not password:
             password = self.password
+
+        # Reuse an already authenticated connection if one is pooled
+        pool_key = SSH_POOL.get_key(self.host, username, password, ipv4)
+        ssh = SSH_POOL.acquire(pool_key)
+        if ssh:
+            self.ssh = ssh
+            self.pool_key = pool_key
+            self.retry = 0
+            self.root_connected = username == "root"
+
+            return True
+
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         try:
             ssh.connect(self.host,
                         port=self.port,
@@ -132,6 +257,7 @@ class GenericNode(object):
                         password=password,
                         timeout=self.timeout)
             self.ssh = ssh
+            self.pool_key = pool_key
             self.retry = 0
 
             if username == "root":
@@ -141,22 +267,22 @@ class GenericNode(object):
 
             return True
         except paramiko.BadHostKeyException, except_err:
-            self.__disconnect()
+            self.__disconnect(discard=True)
             self.g_util.log('error', 'Host key could not be ' +
                                   'verified: %s' % str(except_err))
             raise
         except paramiko.AuthenticationException, except_err:
-            self.__disconnect()
+            self.__disconnect(discard=True)
             self.g_util.log('error', 'Unable to authenticate: %s' %
                                   str(except_err))
             raise
         except (paramiko.SSHException, socket.error), except_err:
             if self.retry < 2:
                 time.sleep(5)
-                self.__disconnect()
+                self.__disconnect(discard=True)
                 return self.__connect(username, password, ipv4)
             else:
-                self.__disconnect()
+                self.__disconnect(discard=True)
                 self.g_util.log('error', 'Too many times to connect: %s'
                                       % str(except_err))
                 raise
@@ -166,18 +292,32 @@ class GenericNode(object):
 
             raise
 
-    def disconnect(self):
+    def disconnect(self, discard=False):
         """
         Globally visible disconnect method.
+
+        Kwargs:
+            discard (bool): Set to True to close the connection rather than
+                hand it back to the SSH connection pool.
         """
-        self.__disconnect()
+        self.__disconnect(discard)
 
-    def __disconnect(self):
-        """Close the paramiko SSHClient.
+    def __disconnect(self, discard=False):
+        """Hands the paramiko SSHClient back to the SSH connection pool,
+        or closes it if discard is set.
+
+        Kwargs:
+            discard (bool): Set to True to close the connection, used when
+                the connection is known or suspected to be broken.
         """
+        self.__close_sftp()
+
         if self.ssh:
             try:
-                self.ssh.close()
+                if discard:
+                    self.ssh.close()
+                else:
+                    SSH_POOL.release(self.pool_key, self.ssh)
                 self.ssh = None
             except Exception as except_err:
                 print "Error disconnecting: {1}".\
@@ -185,6 +325,7 @@ class GenericNode(object):
                 self.ssh = None
         else:
             self.ssh = None
+        self.pool_key = None
 
     @staticmethod
     def __process_results(result, username):
@@ -364,8 +505,49 @@ class GenericNode(object):
 
         return username, password
 
-    def __receive_expects_data(self, channel, contents, items_to_send,
-                               expects_list, expects_index, username):
+    @staticmethod
+    def __send_expects_response(channel, matcher, data, expects_list,
+                                expects_index):
+        """
+        Looks for the next expected prompt in received data and, if found,
+        sends the matched response back down the channel.
+
+        Args:
+            channel (channel): The data channel in question.
+
+            matcher (ExpectsMatcher): The matcher for the stream the data
+                was received on.
+
+            data (str): Data just received from the channel.
+
+            expects_list (list): A list of prompt-response dictionary pairs.
+
+            expects_index (int): The current position in the expects_list.
+
+        Returns:
+            bool, int. Flag set to True if data has been sent down the
+                channel and the current index in the expects list.
+        """
+        expects_item = expects_list[expects_index]
+        output_line = matcher.feed(data, expects_item['prompt'])
+
+        if output_line is None:
+            return False, expects_index
+
+        channel.send(expects_item['response'] + "\n")
+
+        if "assword" in output_line:
+            response = "*" * len(expects_item['response'])
+        else:
+            response = expects_item['response']
+
+        if not "exit" in response:
+            print "{0} {1}".format(output_line, response)
+
+        return True, expects_index + 1
+
+    def __receive_expects_data(self, channel, contents, matcher,
+                               items_to_send, expects_list, expects_index):
         """
         Receives data from the channel and if a matching prompt is found, sends
         the matched response back down the channel.
@@ -375,6 +557,8 @@ class GenericNode(object):
 
             contents (StringIO): The IO stream to append data to.
 
+            matcher (ExpectsMatcher): The matcher for the stdout stream.
+
             items_to_send (bool): False if there is no more data to send down
                 the channel or True otherwise.
 
@@ -382,64 +566,28 @@ class GenericNode(object):
 
             expects_index (int): The current position in the expects_list.
 
-            username (str): Current username.
-
         Returns:
-            bool, int, StringIO. Flag set to True if data has been sent down
-                the channel, the current index in the expects list and
-                    the contents of data received from the channel.
+            bool, int. Flag set to True if data has been sent down
+                the channel and the current index in the expects list.
         """
-          #5. If stdout reports data ready
-        data = None
-        #contents = StringIO.StringIO()
-        send_data = False
+        data = ""
 
-        if channel.recv_ready():
-                        #5a. Receive data from channel
-            data = channel.recv(self.out_bufsize)
+        while channel.recv_ready():
+            data += channel.recv(self.out_bufsize)
 
-            contents.write(data)
-
-            processed_output = \
-                self.__process_results(contents.getvalue(),
-                                       username)
-
-            if items_to_send:
-                            #5b. Convert stdout to list
-                processed_output = \
-                    self.__process_results(contents.getvalue(),
-                                                       username)
-                            #5c. Loop through stdout in reverse order
-                            # This means we consider response to most recently
-                            # returned output first
-                for output_line in reversed(processed_output):
-                                #5d. If an output line is found matching the
-                                #next prompt key in our expect list send the
-                                #response key
-                    expects_item = expects_list[expects_index]
-
-                    if expects_item['prompt'] \
-                                in output_line:
-                        channel.send(expects_item['response']
-                                                     + "\n")
-
-                        if "assword" in output_line:
-                            response = "*" * len(expects_item['response'])
-                        else:
-                            response = expects_item['response']
+        if not data:
+            return False, expects_index
 
-                        if not "exit" in response:
-                            print "{0} {1}".format(output_line,
-                                                   response)
+        contents.write(data)
 
-                        send_data = True
-                        expects_index += 1
-                        break
+        if not items_to_send:
+            return False, expects_index
 
-        return send_data, expects_index, contents
+        return self.__send_expects_response(channel, matcher, data,
+                                            expects_list, expects_index)
 
-    def __receive_expects_stderr(self, channel, errors, items_to_send,
-                                 expects_list, expects_index, username):
+    def __receive_expects_stderr(self, channel, errors, matcher,
+                                 items_to_send, expects_list, expects_index):
         """
         Receives data from the stderr channel and if a matching prompt is
         found, sends the matched response back down the channel.
@@ -449,6 +597,8 @@ class GenericNode(object):
 
             errors (StringIO): The string IO stream to append to.
 
+            matcher (ExpectsMatcher): The matcher for the stderr stream.
+
             items_to_send (bool): False if there is no more data to send down
                 the channel or True otherwise.
 
@@ -456,68 +606,33 @@ class GenericNode(object):
 
             expects_index (int): The current position in the expects_list.
 
-            username (str): Current username.
-
         Returns:
-            bool, int, StringIO. Flag set to True if data has been sent down
-                the channel, the current index in the expects list and the
-                    contents of data received from the stderr channel.
+            bool, int. Flag set to True if data has been sent down
+                the channel and the current index in the expects list.
         """
-        error = None
-        #errors = StringIO.StringIO()
-        send_data = False
+        error = ""
 
-          #6. If stderr has received data
-        if channel.recv_stderr_ready():
+        while channel.recv_stderr_ready():
+            error += channel.recv_stderr(self.err_bufsize)
 
-                        #6a. Receive data from channel
-            error = channel.recv_stderr(self.err_bufsize)
-            errors.write(error)
-                        #errors.write("\n")
-
-            if items_to_send:
-                            #6b. Convert stdout to list
-                processed_output = \
-                    self.__process_results(errors.getvalue(),
-                                           username)
-
-                            #6c. Loop through stdout in reverse order
-                            # This means we consider response to most recently
-                            # returned output first
-                for output_line in reversed(processed_output):
-                    #6d. If an output line is found matching the
-                    #next prompt key in our expect list send the
-                    #response key
-                    expects_item = expects_list[expects_index]
-                    if expects_item['prompt'] \
-                            in output_line:
-                        channel.send(expects_item['response']
-                                                     + "\n")
-
-                        if "assword" in output_line:
-                            response = "*" * len(\
-                                expects_item['response'])
-                        else:
-                            response = expects_item['response']
+        if not error:
+            return False, expects_index
 
-                        if not "exit" in response:
-                            print "{0} {1}".format(output_line,
-                                                   response)
+        errors.write(error)
 
-                        send_data = True
-                        expects_index += 1
-                        break
+        if not items_to_send:
+            return False, expects_index
 
-        return send_data, expects_index, errors
+        return self.__send_expects_response(channel, matcher, error,
+                                            expects_list, expects_index)
 
-    def __is_timeout_reached(self, timeout_loop, send_data, timeout_param):
+    def __is_timeout_reached(self, start_time, send_data, timeout_param):
         """
         If no data has been sent down the channel and the timeout is reached,
         return True, otherwise return False.
 
         Args:
-            timeout_loop (int): How many times have we
-                looped through to get data.
+            start_time (float): Epoch time the command was started.
 
             send_data (bool): Have we sent data to the
                 channel on the most recent loop.
@@ -530,14 +645,38 @@ class GenericNode(object):
 
         if not send_data:
             # We break only when expects timeout is reached
-            current_wait_time = timeout_loop * \
-                self.execute_timeout
+            current_wait_time = self.__get_current_epoch() - start_time
 
             if current_wait_time > timeout_param:
                 return True
 
         return False
 
+    def __wait_for_expects_data(self, channel, start_time, timeout_param):
+        """
+        Blocks until the channel has data to read, has received EOF or the
+        expects timeout is reached. Waits are cut short to pick up stderr
+        data, e.g. prompts written to stderr.
+
+        Args:
+            channel (channel): The data channel in question.
+
+            start_time (float): Epoch time the command was started.
+
+            timeout_param (int): Time to wait for command in seconds.
+        """
+        if channel.recv_ready() or channel.recv_stderr_ready():
+            return
+
+        if channel.eof_received or channel.closed:
+            # Nothing more will be read, the channel stays readable so
+            # wait on the exit status instead
+            channel.status_event.wait(self.execute_timeout)
+            return
+
+        time_left = start_time + timeout_param - self.__get_current_epoch()
+        self.__wait_readable([channel], max(time_left, self.execute_timeout))
+
     @staticmethod
     def __get_exit_status(channel):
         """
@@ -614,75 +753,159 @@ class GenericNode(object):
 
         return has_error, errors
 
-    def __track_connection(self):
-        """Kills the connection if a hung condition is detected.
+    def __wait_readable(self, channels, timeout):
+        """
+        Blocks until one of the channels has stdout data or EOF, or for at
+        most stderr_poll_secs so stderr data, which does not make a channel
+        readable, is also picked up promptly.
 
-        Some paramiko operations are liable to hang forever during
-        the execute method if there is a connection loss.
-
-        This method will automatically disconnect the channel if a timestamp
-        environment variable is not updated after a timeout period.
-        This timeout period should be updated at the start and end of
-        each execute method so if it has not been updated, it indicates the
-        connection has hung.
-        """
-        ##Gets the current epoch time
-        time_started = self.__get_current_epoch()
-        #Time to sleep between polling.
-        #This should be kept relativly low or you could have threads hanging
-        #left around.
-        sleep_time = self.execute_timeout
-        time_passed = 0
-        ##Currently set at 10 minutes
+        Args:
+            channels (list): The channels to wait on.
+
+            timeout (float): Maximum time to wait in seconds.
+        """
+        select.select(channels, [], [], min(timeout, self.stderr_poll_secs))
+
+    def __receive_until_eof(self, channel, contents, errors):
+        """
+        Drains the stdout and stderr streams of the channel as data arrives
+        and returns as soon as EOF and the exit status have both been seen.
+
+        Rather than sleeping for a fixed execute timeout, the method blocks
+        in select on the channel until it becomes readable, polling for
+        stderr data in between.
+
+        Args:
+            channel (channel): The channel the command was executed on.
+
+            contents (StringIO): The IO stream to append stdout data to.
+                Any object with a write method may be passed.
+
+            errors (StringIO): The IO stream to append stderr data to.
+
+        Returns:
+            int. The exit status of the command.
+        """
         while True:
-            ##Keep track of current time passed
-            time.sleep(sleep_time)
-            time_passed += sleep_time
-
-            #The instance variable is updated at the end of the execute method
-            ##with the current time.
-            ##If the current time is greater than the time this thread was
-            ##started we know execute method has finished.
-            ##Also if SSH connection has been closed due to end of test
-            #disconnect we exit
-            if self.refresh_epoch_time > time_started or not self.ssh:
-                ##Leaving the loop will cause the Thread to exit
+            if channel.recv_ready():
+                contents.write(channel.recv(self.out_bufsize))
+                continue
+
+            if channel.recv_stderr_ready():
+                errors.write(channel.recv_stderr(self.err_bufsize))
+                continue
+
+            # Once EOF is received no more data will arrive. The exit status
+            # is normally sent before EOF, if not recv_exit_status will
+            # block until it arrives (or the channel is closed).
+            if channel.eof_received or channel.closed:
                 break
 
-            ##If time passed is greater than session tiemout
-            ##it indicates the execute method has taken more than the session
-            #timeout to complete.
-            ##In this case it is assumed to have locked so a reconnection will
-            ##be performed.
-            if time_passed > self.kill_connection_time:
-                self.g_util.log('error',
-                                "Connection interruption detected.")
-                ##Calling disconnect clears the main thread if it has hung
-                self.__disconnect()
-                self.__connect()
+            # The channel is readable when stdout data or EOF is received,
+            # stderr data is picked up by the next pass of the loop
+            self.__wait_readable([channel], self.session_timeout)
+
+        return channel.recv_exit_status()
+
+    def __receive_with_sleep(self, channel, contents, errors):
+        """
+        Original sleep-and-poll method of reading the channel. Waits for the
+        exit status and then polls the channel, waiting execute_timeout
+        seconds before doing a final check for data.
+
+        Args:
+            channel (channel): The channel the command was executed on.
+
+            contents (StringIO): The IO stream to append stdout data to.
+
+            errors (StringIO): The IO stream to append stderr data to.
+
+        Returns:
+            int. The exit status of the command.
+        """
+        timed_out = False
+
+        # There are rare cases when recv_exit_status returns while
+        # recv_ready is not yet ready.
+        # The below structure is designed so
+        # that if recv_ready does not return the loop
+        # will wait a defined execution timeout period
+        # before doing a final check and then leaving the loop.
+        returnc = channel.recv_exit_status()
+
+        while True:
+
+            data, contents = self.__receive_data(channel, contents)
+
+            error, errors = self.__receive_stderr(channel, errors)
+
+            # After timeout we do one more loop to check
+            # if output buffers are ready and then we exit
+            if data or error or timed_out:
                 break
 
-    def __start_connection_check_thread(self):
+            if not timed_out:
+                time.sleep(self.execute_timeout)
+                timed_out = True
+
+        return returnc
+
+    def __register_deadline(self, timeout_secs, description):
+        """Registers a connection deadline for a call, which kills the
+        connection if the call has not returned in time.
+
+        Args:
+            timeout_secs (int): Time the call has to return.
+
+            description (str): Description logged if the deadline expires.
+
+        Returns:
+            tuple. The deadline, to pass to __cancel_deadline.
         """
-        Starts a thread which will perform a
-        disconnect if the execute method hangs.
+        call = object()
+        with self.deadline_lock:
+            self.deadline_calls.add(call)
+
+        token = DEADLINE_SCHEDULER.register(
+            functools.partial(self.__kill_hung_connection, call),
+            timeout_secs, description)
+
+        return call, token
+
+    def __cancel_deadline(self, deadline):
+        """Cancels the connection deadline of a call which has returned.
+
+        Args:
+            deadline (tuple): The deadline returned by __register_deadline.
         """
-        #As channel may not have fully closed since last command
-        #we may potenially have up to 3 threads already
-        #(main + 2 paramiko channels)
-        #Therefore allow up to 4 threads
-        allowed_threads = 4
+        call, token = deadline
+        DEADLINE_SCHEDULER.cancel(token)
+
+        with self.deadline_lock:
+            self.deadline_calls.discard(call)
 
-        #If we are retrying a connection add an extra thread
-        if self.execute_retry > 1:
-            allowed_threads += 1
+    def __kill_hung_connection(self, call):
+        """Closes the connection when a hung condition is detected.
 
-        if threading.active_count() < allowed_threads:
+        Some paramiko operations are liable to hang forever during
+        the execute method if there is a connection loss. Closing the
+        transport unblocks any paramiko call the execute method is waiting
+        in. The next command will reconnect.
+
+        Does nothing if the call has returned in the meantime, so the
+        connection of a later command is never killed.
 
-            thread_test = \
-                threading.Thread(target=self.__track_connection,
-                                 args=())
-            thread_test.start()
+        Args:
+            call (object): Identifies the call which registered the
+                deadline.
+        """
+        with self.deadline_lock:
+            if call not in self.deadline_calls:
+                return
+
+            self.g_util.log('error', "Connection interruption detected.")
+            ##Calling disconnect clears the main thread if it has hung
+            self.__disconnect(discard=True)
 
     def execute(self, cmd, username=None, password=None, ipv4=True, sudo=False,
                 su_root=False, su_timeout=60, execute_timeout_secs=0.25,
@@ -710,7 +933,8 @@ class GenericNode(object):
             execute_timeout_secs (float): If set, changes the execute timeout
                 from the default. That is, the time the channel waits in
                     seconds after executing a command before polling for
-                        data. Default is 0.25 seconds.
+                        data. Default is 0.25 seconds. Only used when
+                            event_driven_read is set to False.
 
             connection_timeout_secs (int): Time to wait for command to finish
                 before exiting with an error. Default is 600 seconds (10 mins).
@@ -721,21 +945,40 @@ class GenericNode(object):
                                      to return. Only works when su_root is
                                      not set.
 
+        Returns:
+            list, list, int. std_out, std_err, and return code of the command.
+        """
+        ##Kill the connection if the command has not returned before the
+        ##connection timeout
+        deadline = self.__register_deadline(
+            connection_timeout_secs, "[{0}]# {1}".format(self.ipv4, cmd))
+
+        try:
+            return self.__execute_cmd(cmd, username, password, ipv4, sudo,
+                                      su_root, su_timeout,
+                                      execute_timeout_secs,
+                                      return_immediate)
+        finally:
+            self.__cancel_deadline(deadline)
+
+    def __execute_cmd(self, cmd, username, password, ipv4, sudo, su_root,
+                      su_timeout, execute_timeout_secs, return_immediate):
+        """Executes one command in channel. Called from execute once the
+        connection timeout has been registered, see execute for the
+        description of the arguments.
+
         Returns:
             list, list, int. std_out, std_err, and return code of the command.
         """
         channel = None
 
-        ##Create a thread to check connection
-        self.kill_connection_time = connection_timeout_secs
         now_time = self.__get_current_epoch()
         before_time = now_time - 600
 
         if before_time > self.refresh_epoch_time:
-            self.__disconnect()
+            self.__disconnect(discard=True)
 
         self.refresh_epoch_time = self.__get_current_epoch()
-        self.__start_connection_check_thread()
 
         self.execute_timeout = execute_timeout_secs
         username, password = self.__setup_connection(username,
@@ -761,9 +1004,6 @@ class GenericNode(object):
                         cmd = '/bin/echo %s | /usr/bin/sudo -S %s' % \
                           (password, cmd)
 
-                    data = False
-                    error = False
-
                     channel.exec_command(cmd)
 
                     #if requested to return stright after running command
@@ -773,33 +1013,14 @@ class GenericNode(object):
                     contents = StringIO.StringIO()
                     errors = StringIO.StringIO()
 
-                    timed_out = False
-
-                    # There are rare cases when recv_exit_status returns while
-                    returnc = channel.recv_exit_status()
-                    #self.__wait_for_channel(channel)
-
-                    #returnc = channel.recv_exit_status()
-                    # recv_ready is not yet ready.
-                    # The below structure is designed so
-                    # that if recv_ready does not return the loop
-                    # will wait a defined execution timeout period
-                    # before doing a final check and then leaving the loop.
-
-                    while True:
-
-                        data, contents = self.__receive_data(channel, contents)
-
-                        error, errors = self.__receive_stderr(channel, errors)
-
-                        # After timeout we do one more loop to check
-                        # if output buffers are ready and then we exit
-                        if data or error or timed_out:
-                            break
-
-                        if not timed_out:
-                            time.sleep(self.execute_timeout)
-                            timed_out = True
+                    if self.event_driven_read:
+                        returnc = self.__receive_until_eof(channel,
+                                                           contents,
+                                                           errors)
+                    else:
+                        returnc = self.__receive_with_sleep(channel,
+                                                            contents,
+                                                            errors)
 
                 except Exception, except_err:
                     self.g_util.log('error', 'Connection error: {0}'
@@ -808,7 +1029,7 @@ class GenericNode(object):
                     ##Retry the execution if we get a failure
                     if self.execute_retry < 1:
                         self.g_util.log('info', 'Retrying command')
-                        self.__disconnect()
+                        self.__disconnect(discard=True)
                         self.execute_retry += 1
                         return self.execute(cmd, username, password,
                                             ipv4, sudo, su_root,
@@ -831,6 +1052,210 @@ class GenericNode(object):
 
             return out, err, returnc
 
+    def execute_stream(self, cmd, out_stream, username=None, password=None,
+                       ipv4=True, connection_timeout_secs=600):
+        """Executes one command and writes its stdout to out_stream as it
+        arrives off the channel, without any processing of the output.
+
+        Args:
+            cmd (str): Command to execute.
+
+            out_stream (file): Any object with a write method, e.g. an open
+                file or StringIO, stdout data is written to.
+
+        Kwargs:
+            username (str): username used to execute the command.
+
+            password (str): password used to execute the command.
+
+            ipv4 (bool): Set to True to use ipv4.
+
+            connection_timeout_secs (int): Time to wait for command to finish
+                before exiting with an error. Default is 600 seconds (10 mins).
+
+        Returns:
+            list, int. std_err and return code of the command.
+        """
+        channel = None
+        errors = StringIO.StringIO()
+
+        deadline = self.__register_deadline(
+            connection_timeout_secs, "[{0}]# {1}".format(self.ipv4, cmd))
+
+        try:
+            username, password = self.__setup_connection(username,
+                                                         password,
+                                                         ipv4)
+            channel = self.ssh.get_transport().open_session()
+            channel.settimeout(self.session_timeout)
+            channel.exec_command(cmd)
+
+            returnc = self.__receive_until_eof(channel, out_stream, errors)
+
+        except Exception, except_err:
+            self.g_util.log('error', 'Connection error: {0}'
+                            .format(except_err))
+            raise
+
+        finally:
+            self.__cancel_deadline(deadline)
+            self.refresh_epoch_time = self.__get_current_epoch()
+
+            if channel:
+                channel.close()
+
+        return self.__process_results(errors.getvalue(), username), returnc
+
+    def execute_multiplexed(self, cmds, username=None, password=None,
+                            ipv4=True, sudo=False, max_channels=10,
+                            connection_timeout_secs=600):
+        """Executes several commands concurrently, each on its own channel
+        multiplexed over the single transport of the current connection.
+
+        As with execute, commands are retried once on a new connection if
+        the connection fails. A command which has not returned within the
+        connection timeout has its channel closed, and the connection is
+        closed if the commands have not all returned within the timeout
+        of each wave of max_channels commands.
+
+        Args:
+            cmds (list): Commands to execute.
+
+        Kwargs:
+            username (str): username used to execute the commands.
+
+            password (str): password used to execute the commands.
+
+            ipv4 (bool): Set to True to use ipv4.
+
+            sudo (bool): Running privileged commands.
+
+            max_channels (int): Maximum number of channels open at once.
+                Should not exceed MaxSessions on the node. Default is 10.
+
+            connection_timeout_secs (int): Time to wait for each command to
+                finish before closing its channel, its return code is then
+                -1. Default is 600 seconds (10 mins).
+
+        Returns:
+            list. A (std_out, std_err, return code) tuple for each command,
+                in the same order as cmds.
+        """
+        results = [None] * len(cmds)
+
+        for attempt in range(2):
+            pending = [(index, cmd) for index, cmd in enumerate(cmds)
+                       if results[index] is None]
+            try:
+                self.__execute_multiplexed_cmds(pending, results, username,
+                                                password, ipv4, sudo,
+                                                max_channels,
+                                                connection_timeout_secs)
+                break
+            except Exception, except_err:
+                self.g_util.log('error', 'Connection error: {0}'
+                                .format(except_err))
+
+                ##Retry the commands which have not returned on a new
+                ##connection
+                if attempt == 0:
+                    self.g_util.log('info', 'Retrying commands')
+                    self.__disconnect(discard=True)
+                    continue
+                raise
+
+        return results
+
+    def __execute_multiplexed_cmds(self, pending, results, username,
+                                   password, ipv4, sudo, max_channels,
+                                   connection_timeout_secs):
+        """Executes commands concurrently over the current connection,
+        see execute_multiplexed for the description of the arguments.
+
+        Args:
+            pending (list): (index in results, command) of the commands to
+                execute.
+
+            results (list): Results, each command's (std_out, std_err,
+                return code) tuple is stored at its index as it returns.
+        """
+        if self.__get_current_epoch() - 600 > self.refresh_epoch_time:
+            self.__disconnect(discard=True)
+
+        username, password = self.__setup_connection(username,
+                                                     password,
+                                                     ipv4)
+        transport = self.ssh.get_transport()
+
+        # channel -> (index in results, stdout buffer, stderr buffer,
+        # epoch time the command must return by)
+        active = dict()
+
+        waves = (len(pending) + max_channels - 1) / max_channels
+        deadline = self.__register_deadline(
+            connection_timeout_secs * max(waves, 1),
+            "[{0}]# {1} commands".format(self.ipv4, len(pending)))
+
+        try:
+            while pending or active:
+                # Keep up to max_channels commands running at once
+                while pending and len(active) < max_channels:
+                    index, cmd = pending.pop(0)
+                    channel = transport.open_session()
+                    channel.settimeout(self.session_timeout)
+                    active[channel] = (index, StringIO.StringIO(),
+                                       StringIO.StringIO(),
+                                       self.__get_current_epoch() +
+                                       connection_timeout_secs)
+
+                    if sudo:
+                        channel.get_pty()
+                        cmd = '/bin/echo %s | /usr/bin/sudo -S %s' % \
+                          (password, cmd)
+
+                    channel.exec_command(cmd)
+
+                self.__wait_readable(active.keys(), self.session_timeout)
+
+                for channel in active.keys():
+                    index, contents, errors, expiry = active[channel]
+
+                    while channel.recv_ready():
+                        contents.write(channel.recv(self.out_bufsize))
+
+                    while channel.recv_stderr_ready():
+                        errors.write(channel.recv_stderr(self.err_bufsize))
+
+                    if not channel.eof_received and not channel.closed and \
+                            self.__get_current_epoch() > expiry:
+                        self.g_util.log('error', "Command did not return "
+                                        "before the connection timeout")
+                        channel.close()
+
+                    if channel.eof_received or channel.closed:
+                        if channel.eof_received:
+                            returnc = channel.recv_exit_status()
+                        else:
+                            # Closed before EOF, the exit status may never
+                            # arrive
+                            returnc = self.__get_exit_status(channel)
+                        channel.close()
+                        del active[channel]
+
+                        results[index] = (
+                            self.__process_results(contents.getvalue(),
+                                                   username),
+                            self.__process_results(errors.getvalue(),
+                                                   username),
+                            returnc)
+
+        finally:
+            self.__cancel_deadline(deadline)
+            self.refresh_epoch_time = self.__get_current_epoch()
+
+            for channel in active:
+                channel.close()
+
     def __return_immediate_processing(self, channel):
         """
         Processing related to returning immedietly after a command has been
@@ -925,51 +1350,52 @@ class GenericNode(object):
                 #We loop through the expects dict list in order
                 expects_index = 0
                 items_to_send = True
-                timeout_loop = 0
+                start_time = self.__get_current_epoch()
+                out_matcher = ExpectsMatcher(username)
+                err_matcher = ExpectsMatcher(username)
 
                 while True:
-                    #To avoid exiting to early sleep to allow time to receive
-                    #data into channel
-                    time.sleep(self.execute_timeout)
+                    #Wait for data to be received into the channel rather
+                    #than sleeping for a fixed period
+                    self.__wait_for_expects_data(channel, start_time,
+                                                 timeout_param)
 
                     #If we have been through all items in the expects list
                     #  don't send any more items
                     if expects_index >= len(expects_list):
                         items_to_send = False
 
-                    timeout_loop += 1
-
                     #4. Reset send_data flag to false
                     #If it is still False at the end of the loop we know no
                     #data has been sent so will leave the loop.
                     #(if no data is sent we should not wait for a response)
-                    send_data_stdout = False
-                    send_data_stderr = False
-
-                    send_data_stdout, expects_index, contents = \
+                    send_data_stdout, expects_index = \
                         self.__receive_expects_data(channel,
                                                     contents,
+                                                    out_matcher,
                                                     items_to_send,
                                                     expects_list,
-                                                    expects_index,
-                                                    username)
+                                                    expects_index)
 
-                    if self.__is_timeout_reached(timeout_loop,
+                    if self.__is_timeout_reached(start_time,
                                                  send_data_stdout,
                                                  timeout_param):
                         break
 
-                    send_data_stderr, expects_index, errors = \
+                    if expects_index >= len(expects_list):
+                        items_to_send = False
+
+                    send_data_stderr, expects_index = \
                         self.__receive_expects_stderr(channel,
                                                       errors,
+                                                      err_matcher,
                                                       items_to_send,
                                                       expects_list,
-                                                      expects_index,
-                                                      username)
+                                                      expects_index)
 
                     #6e. If no data has been sent break as we expect no more
                     #responses from channel
-                    if self.__is_timeout_reached(timeout_loop,
+                    if self.__is_timeout_reached(start_time,
                                                  send_data_stderr,
                                                  timeout_param):
                         break
@@ -1016,6 +1442,90 @@ class GenericNode(object):
 
         return out, err, returnc
 
+    def __close_sftp(self):
+        """Closes the SFTP session of the current connection, if open.
+        """
+        if self.sftp:
+            try:
+                self.sftp.close()
+            except Exception as except_err:
+                print "Error closing SFTP session: {0}".\
+                    format(str(except_err))
+            self.sftp = None
+
+    def __setup_copy_connection(self, root_copy):
+        """
+        Connects as the user required by a file copy, if not connected.
+
+        Args:
+            root_copy (bool): If set to True, connects as root user.
+        """
+        if root_copy:
+            self.__setup_connection("root", self.rootpw, True)
+        else:
+            self.__setup_connection(None, None, True)
+
+        ###If we already have connection
+        if self.ssh:
+            ##if current connection is not root and we require root connection
+            ##disconnect and reconnect as root
+            if root_copy and not self.root_connected:
+                self.__disconnect()
+                self.__connect("root", self.rootpw)
+        ##If we don't have a connection
+        else:
+            if root_copy:
+                self.__connect("root", self.rootpw)
+            else:
+                self.__connect()
+
+    def __get_sftp(self, root_copy):
+        """
+        Returns an SFTP session on a connection as the required user,
+        reusing the open session if the connection did not change.
+
+        Args:
+            root_copy (bool): If set to True, connects as root user.
+
+        Returns:
+            SFTPClient. The SFTP session.
+        """
+        self.__setup_copy_connection(root_copy)
+
+        if self.sftp and (self.sftp.get_channel().closed or
+                          self.sftp.get_channel().get_transport() is not
+                          self.ssh.get_transport()):
+            self.__close_sftp()
+
+        if not self.sftp:
+            self.sftp = self.ssh.open_sftp()
+
+        return self.sftp
+
+    def __run_on_connection(self, cmd):
+        """
+        Runs a command on the current connection as the connected user,
+        without any of the processing done by execute.
+
+        Args:
+            cmd (str): Command to execute.
+
+        Returns:
+            list, int. std_out lines and return code of the command.
+        """
+        contents = StringIO.StringIO()
+        errors = StringIO.StringIO()
+        channel = self.ssh.get_transport().open_session()
+
+        try:
+            channel.settimeout(self.session_timeout)
+            channel.exec_command(cmd)
+            returnc = self.__receive_until_eof(channel, contents, errors)
+        finally:
+            channel.close()
+
+        return contents.getvalue().splitlines(), returnc
+
     def copy_file(self, local_filepath, remote_filepath, root_copy,
                   file_permissions=0777):
         """
@@ -1040,37 +1550,239 @@ class GenericNode(object):
         #Permissions to give to files by default
         default_file_permissions = file_permissions
 
-        if root_copy:
-            self.__setup_connection("root", self.rootpw, True)
+        sftp_session = self.__get_sftp(root_copy)
+
+        try:
+            sftp_session.put(local_filepath, remote_filepath)
+            sftp_session.chmod(remote_filepath, default_file_permissions)
+
+        except IOError, except_err:
+            self.g_util.log('error', 'File copy error: %s' %
+                                  str(except_err))
+            raise
+
+    def copy_files(self, file_pairs, root_copy, file_permissions=0777,
+                   skip_unchanged=True):
+        """
+        Copies many files to the node over one SFTP session, writing each
+        file without waiting for every block to be acknowledged.
+        Permissions of all files are set by a single command.
+
+        Content already on the node is not sent again. The sync manifest
+        of the node records the checksum of every file copied for the
+        session, so an unchanged file is found by a stat, and content at
+        another path on the node is copied there on the node. Large files
+        which changed are updated by sending only their changed blocks.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs. Remote paths
+                must be full file paths.
+
+            root_copy (bool): If set to True, copies as root user.
+
+        Kwargs:
+            file_permissions (int): Permissions to set for copied files
+                using chmod notation. Defaults to 0777.
+
+            skip_unchanged (bool): If set, content already on the node is
+                not sent again. Otherwise every file is sent in full.
+
+        Returns:
+            list. The remote paths of files copied. Files skipped as
+                unchanged are not included.
+
+        Raises:
+            IOError if filepaths are invalid or a copy failed.
+        """
+        if not file_pairs:
+            return list()
+
+        sftp_session = self.__get_sftp(root_copy)
+        manifest = get_sync_manifest(self.host)
+
+        if skip_unchanged:
+            stdout, _ = self.__run_on_connection(
+                manifest.get_check_cmd(file_pairs))
+            actions = manifest.plan(file_pairs, stdout)
         else:
-            self.__setup_connection(None, None, True)
+            actions = [('put', local_path, remote_path, None)
+                       for local_path, remote_path in file_pairs]
 
-        ###If we already have connection
-        if self.ssh:
-            ##if current connection is not root and we require root connection
-            ##disconnect and reconnect as root
-            if root_copy and not self.root_connected:
-                self.__disconnect()
-                self.__connect("root", self.rootpw)
-        ##If we don't have a connection
+        copied = list()
+        node_cmds = list()
+        try:
+            for action, local_path, remote_path, source in actions:
+                if action == 'copy':
+                    node_cmds.append("cp -f {0} {1}".format(
+                        SftpTransfer.quote(source),
+                        SftpTransfer.quote(remote_path)))
+                elif action == 'delta':
+                    self.__put_delta(sftp_session, local_path, remote_path)
+                elif action == 'put':
+                    SftpTransfer.put(sftp_session, local_path, remote_path)
+
+                if action != 'skip':
+                    copied.append(remote_path)
+
+        except IOError, except_err:
+            self.g_util.log('error', 'File copy error: %s' %
+                                  str(except_err))
+            raise
+
+        # Unchanged files may have other permissions
+        remote_paths = [remote_path for _, remote_path in file_pairs]
+        node_cmds.append("chmod {0:o} {1}".format(
+            file_permissions,
+            " ".join([SftpTransfer.quote(remote_path)
+                      for remote_path in remote_paths])))
+        stdout, returnc = self.__run_on_connection("{0} && {1}".format(
+            " && ".join(node_cmds), manifest.get_stat_cmd(remote_paths)))
+        if returnc != 0:
+            for remote_path in remote_paths:
+                manifest.forget(remote_path)
+            raise IOError("Failed to set permissions: {0}"
+                          .format(node_cmds[-1]))
+
+        manifest.record_copied(file_pairs, stdout)
+
+        return copied
+
+    def __put_delta(self, sftp_session, local_path, remote_path):
+        """
+        Updates a file on the node by sending only its changed blocks, or
+        the whole file if the blocks on the node cannot be checksummed.
+
+        Args:
+            sftp_session (SFTPClient): An open SFTP session.
+
+            local_path (str): Path of the local file.
+
+            remote_path (str): Path of the remote file.
+        """
+        stdout, returnc = self.__run_on_connection(
+            SyncManifest.get_block_checksums_cmd(remote_path))
+
+        if returnc != 0:
+            SftpTransfer.put(sftp_session, local_path, remote_path)
+            return
+
+        sent = SftpTransfer.put_delta(sftp_session, local_path, remote_path,
+                                      [line.strip() for line in stdout],
+                                      SyncManifest.DELTA_BLOCK_SIZE)
+        self.g_util.log('info', 'Sent {0} of {1} bytes of {2}'.format(
+            sent, os.path.getsize(local_path), remote_path))
+
+    def open_stream_channel(self, cmd, su_root=False, prompt_timeout=30):
+        """
+        Runs a long-lived command on a connection of its own, so it is not
+        affected by the connection used for other commands. The channel has
+        a pty so the command is stopped when the channel is closed.
+
+        Args:
+            cmd (str): Command to execute.
+
+        Kwargs:
+            su_root (bool): Run the command as root. The MS is logged into
+                as root, other nodes su to root.
+
+            prompt_timeout (int): Time to wait for the su password prompt.
+
+        Returns:
+            Channel. The channel the command runs in. Closing its transport
+                closes the connection.
+        """
+        if su_root and self.nodetype == 'management':
+            username, password = "root", self.rootpw
         else:
-            if root_copy:
-                self.__connect("root", self.rootpw)
-            else:
-                self.__connect()
+            username, password = self.username, self.password
 
-        if self.ssh:
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(self.ipv4, port=self.port, username=username,
+                    password=password, timeout=self.timeout)
 
-            try:
-                sftp_session = self.ssh.open_sftp()
+        try:
+            channel = ssh.get_transport().open_session()
+            channel.get_pty()
 
-                sftp_session.put(local_filepath, remote_filepath)
-                sftp_session.chmod(remote_filepath, default_file_permissions)
+            if username == "root" or not su_root:
+                channel.exec_command(cmd)
+                return channel
+
+            channel.settimeout(prompt_timeout)
+            channel.exec_command("su -c {0}".format(SftpTransfer.quote(cmd)))
+            output = ""
+            while "Password:" not in output:
+                data = channel.recv(1024)
+                if not data:
+                    raise IOError("su closed the channel: {0}"
+                                  .format(output))
+                output += data
+            channel.send(self.rootpw + "\n")
+            channel.settimeout(None)
+
+            return channel
+        except Exception:
+            ssh.close()
+            raise
 
-            except IOError, except_err:
-                self.g_util.log('error', 'File copy error: %s' %
-                                      str(except_err))
-                raise
+    def upload_dir(self, local_dir, remote_dir, root_copy):
+        """
+        Copies the contents of a local directory to the node as one
+        compressed tar stream, extracted on the node as it arrives.
+
+        Args:
+            local_dir (str): The local directory.
+
+            remote_dir (str): The remote directory, created if needed.
+
+            root_copy (bool): If set to True, copies as root user.
+
+        Returns:
+            int. The number of bytes sent over the link.
+
+        Raises:
+            IOError if the transfer failed.
+        """
+        self.__setup_copy_connection(root_copy)
+
+        try:
+            return TarStream(self.ssh.get_transport(), self.host,
+                             self.session_timeout).upload(local_dir,
+                                                          remote_dir)
+        except IOError, except_err:
+            self.g_util.log('error', 'Directory copy error: %s' %
+                                  str(except_err))
+            raise
+
+    def download_dir(self, local_dir, remote_dir, root_copy):
+        """
+        Copies the contents of a directory on the node to gateway as one
+        compressed tar stream, extracted locally as it arrives.
+
+        Args:
+            local_dir (str): The local directory, created if needed.
+
+            remote_dir (str): The remote directory.
+
+            root_copy (bool): If set to True, copies as root user.
+
+        Returns:
+            int. The number of bytes received over the link.
+
+        Raises:
+            IOError if the transfer failed.
+        """
+        self.__setup_copy_connection(root_copy)
+
+        try:
+            return TarStream(self.ssh.get_transport(), self.host,
+                             self.session_timeout).download(remote_dir,
+                                                            local_dir)
+        except IOError, except_err:
+            self.g_util.log('error', 'Directory copy error: %s' %
+                                  str(except_err))
+            raise
 
     def create_dir(self, filepath):
         """Creates a directory at the given filepath.
@@ -1104,28 +1816,26 @@ class GenericNode(object):
         Raises:
             IOError if filepaths are invalid.
         """
-        if root_copy:
-            self.__setup_connection("root", self.rootpw, True)
-        else:
-            self.__setup_connection(None, None, True)
+        self.download_files([(local_path, remote_path)], root_copy)
 
-        ###If we already have connection
-        if self.ssh:
-            ##if current connection is not root and we require root connection
-            ##disconnect and reconnect as root
-            if root_copy and not self.root_connected:
-                self.__disconnect()
-                self.__connect("root", self.rootpw)
-        ##If we don't have a connection
-        else:
-            if root_copy:
-                self.__connect("root", self.rootpw)
-            else:
-                self.__connect()
+    def download_files(self, file_pairs, root_copy):
+        """
+        Copies many files from the node to gateway over one SFTP session,
+        requesting the blocks of each file before reading them.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs.
+
+            root_copy (bool): If set to True, copies as root user.
+
+        Raises:
+            IOError if filepaths are invalid or a copy failed.
+        """
+        sftp_session = self.__get_sftp(root_copy)
 
         try:
-            sftp_session = self.ssh.open_sftp()
-            sftp_session.get(remote_path, local_path, callback=None)
+            for local_path, remote_path in file_pairs:
+                SftpTransfer.get(sftp_session, remote_path, local_path)
 
         except IOError, except_err:
             self.g_util.log('error', 'File copy error: %s' %
@@ -14,6 +14,14 @@ from json_utils import JSONUtils
 from vcs_utils import VCSUtils
 from storage_utils import StorageUtils
 from networking_utils import NetworkingUtils
+from plan_watcher import get_plan_watcher
+from plan_task_index import PlanTaskIndex
+from litp_model_mirror import get_model_mirror, invalidate_model_mirror
+from show_cache import get_show_cache, SHOW_CACHES
+from ip_allocator import IPAllocator
+from liveness_prober import LivenessProber
+from sftp_transfer import SftpTransfer
+from log_follower import get_log_follower
 from nose.plugins.attrib import attr  # pylint: disable=unused-import
 from os import environ
 from collections import defaultdict  # pylint: disable=unused-import
@@ -23,6 +31,8 @@ import redfish
 import math
 import os
 import time
+import threading
+import StringIO
 import test_constants
 import re
 import netaddr
@@ -86,6 +96,9 @@ class GenericTest(unittest.TestCase):
         self.json_u = JSONUtils()
         self.net = NetworkingUtils()
         self.sto = StorageUtils()
+        # Show cache counters at the start of the test, per MS
+        self.show_cache_stats = dict((key, cache.get_stats())
+                                     for key, cache in SHOW_CACHES.items())
         # Log the start of the test
         self.log('info', 'START ' + self.id())
         print '\n'
@@ -219,6 +232,7 @@ class GenericTest(unittest.TestCase):
         self.run_cleanup()
         print '\n'
         self.log('info', 'END ' + self.id())
+        self.log_show_cache_stats()
         self.disconnect_all_nodes()
         #print "###END MODEL SNAPSHOT"
         #show_cmd = self.cli.get_show_cmd("/", "-r")
@@ -775,14 +789,28 @@ class GenericTest(unittest.TestCase):
         """
         changed_props = list()
         delete_props = list()
+        # Props of the paths to restore, fetched in bulk and fetched again
+        # after any path is restored as restoring a path changes the
+        # props of items inheriting from it
+        current_props = dict()
 
         for path in list(self.path_restore_list):
             if filter_path:
                 if filter_path != path["PATH"]:
                     continue
 
-            new_props = self.get_props_from_url(path["MS_NODE"],
-                                                path["PATH"])
+            if (path["MS_NODE"], path["PATH"]) not in current_props:
+                restore_paths = [item["PATH"] for item in
+                                 self.path_restore_list
+                                 if item["MS_NODE"] == path["MS_NODE"] and
+                                 (not filter_path or
+                                  filter_path == item["PATH"])]
+
+                for url, url_props in self.get_props_bulk(
+                        path["MS_NODE"], restore_paths).iteritems():
+                    current_props[(path["MS_NODE"], url)] = url_props
+
+            new_props = current_props[(path["MS_NODE"], path["PATH"])]
 
             changed_props, delete_props = self.get_changed_props(new_props,
                                                                  path["PROPS"])
@@ -832,6 +860,9 @@ class GenericTest(unittest.TestCase):
 
                 self.run_command(path["MS_NODE"], update_cmd)
 
+            if delete_props or changed_props or deleted_props:
+                current_props = dict()
+
             self.path_restore_list.remove(path)
 
     def is_all_applied(self, ms_node, ignored_paths=None):
@@ -943,10 +974,8 @@ class GenericTest(unittest.TestCase):
                 if path in excl_child_paths or path == '/' or path == '/litp':
                     continue
 
-                get_state_cmd = self.cli.get_grep_all_state_cmd(path)
-
-                std_out, std_err, returnc = self.run_command(ms_node,
-                                                     get_state_cmd)
+                std_out, std_err, returnc = self.__get_all_states(ms_node,
+                                                                  path)
 
                 if returnc != 0 or std_err != []:
                     return False
@@ -968,10 +997,7 @@ class GenericTest(unittest.TestCase):
 
         else:
 
-            get_state_cmd = self.cli.get_grep_all_state_cmd(path)
-
-            std_out, std_err, returnc = self.run_command(ms_node,
-                                                     get_state_cmd)
+            std_out, std_err, returnc = self.__get_all_states(ms_node, path)
 
             if returnc != 0 or std_err != []:
                 return False
@@ -991,6 +1017,29 @@ class GenericTest(unittest.TestCase):
 
             return True
 
+    def __get_all_states(self, ms_node, path):
+        """
+        Returns the state lines of all items under a path, as output by
+        running get_grep_all_state_cmd.
+
+        Args:
+           ms_node (str): The MS node to check.
+
+           path (str): The path to look under.
+
+        Returns:
+           list, list, int. The state lines, std_err and rc of the show.
+        """
+        # Item states change while a plan runs, never read them from cache
+        show_out, std_err, returnc = self.__run_show_cmd(ms_node, path, "-r",
+                                                         logging=False,
+                                                         use_cache=False)
+
+        std_out = [line for line in show_out if line.startswith('    state:')]
+        print '\n'.join(std_out)
+
+        return std_out, std_err, returnc
+
     @staticmethod
     def is_inherited_prop(prop_value):
         """
@@ -1614,6 +1663,10 @@ class GenericTest(unittest.TestCase):
             self.log("Error", "Passed attributes are None")
             return nodelist
 
+        # The cluster indexes its nodes, unless the test replaced the list
+        if self.nodes is self.cluster.nodes:
+            return self.cluster.get_nodes_by_att(att, atts)
+
         for node in self.nodes:
             if getattr(node, att) in atts:
                 nodelist.append(node)
@@ -1639,6 +1692,10 @@ class GenericTest(unittest.TestCase):
             self.log("Error", "Passed attribute is None")
             return None
 
+        if self.nodes is self.cluster.nodes:
+            item = self.cluster.get_node_by_filename(node)
+            return getattr(item, att) if item else None
+
         for item in self.nodes:
             if getattr(item, 'filename') == node:
                 return getattr(item, att)
@@ -2148,6 +2205,8 @@ class GenericTest(unittest.TestCase):
             sudo, su_root, su_timeout_secs, execute_timeout,
             connection_timeout_secs, return_immediate)
 
+        self.__invalidate_model_caches(real_node, cmd)
+
         if logging:
             print '\n'.join(stdout)
             print '\n'.join(stderr)
@@ -2346,9 +2405,88 @@ class GenericTest(unittest.TestCase):
 
         return False
 
+    @staticmethod
+    def __execute_on_nodes_concurrently(nodes, cmdlist, username, password,
+                                        ipv4, sudo, break_on_error, su_root,
+                                        su_timeout_secs):
+        """Runs a list of commands on a list of nodes, with all nodes running
+        in parallel. On each node the commands are multiplexed over the
+        existing connection unless they must run one after another
+        (su_root or break_on_error).
+
+        Args:
+           nodes          (list): GenericNode objects to run commands on.
+
+           cmdlist        (list): List of commands to be executed.
+
+           username        (str): Username to use to run the commands.
+
+           password        (str): Password to use to run the commands.
+
+           ipv4            (bool): Switch between ipv4 and ipv6.
+
+           sudo            (bool): If True, use sudo to run commands.
+
+           break_on_error  (bool): If True, stop running commands on a node
+                                   once a command fails.
+
+           su_root         (bool): Set to True to run commands as root.
+
+           su_timeout_secs (int): Timeout for root commands to finish.
+
+        Returns:
+           list. For each entry of nodes, a list of (stdout, stderr, rc)
+           tuples in cmdlist order.
+        """
+        node_results = [None] * len(nodes)
+        node_errors = list()
+
+        # A node listed more than once runs its entries one after another,
+        # as they share one connection
+        positions = dict()
+        for position, node in enumerate(nodes):
+            positions.setdefault(id(node), list()).append(position)
+
+        def run_on_node(node, node_positions):
+            """Runs all commands on one node, storing any exception"""
+            try:
+                for position in node_positions:
+                    if su_root or break_on_error:
+                        results = list()
+                        for cmd in cmdlist:
+                            results.append(node.execute(
+                                cmd, username, password, ipv4, sudo,
+                                su_root, su_timeout_secs))
+                            if break_on_error and results[-1][2] != 0:
+                                break
+                    else:
+                        results = node.execute_multiplexed(
+                            cmdlist, username, password, ipv4, sudo)
+
+                    node_results[position] = results
+            except Exception as except_err:
+                node_errors.append(except_err)
+
+        threads = [threading.Thread(target=run_on_node,
+                                    args=(nodes[node_positions[0]],
+                                          node_positions))
+                   for node_positions in positions.values()]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if node_errors:
+            raise node_errors[0]
+
+        return node_results
+
     def run_commands(self, nodes, cmdlist, username=None, password=None,
                      ipv4=True, sudo=False, break_on_error=False,
-                     add_to_cleanup=True, su_root=False, su_timeout_secs=60):
+                     add_to_cleanup=True, su_root=False, su_timeout_secs=60,
+                     concurrent=False):
         """Run a list of commands on a list of nodes.
 
         Args:
@@ -2379,6 +2517,12 @@ class GenericTest(unittest.TestCase):
            su_timeout_secs (bool): Default timeout for root commands to
                                    finish running.
 
+           concurrent      (bool): If True, run the commands on all nodes
+                                   in parallel, with the commands for each
+                                   node running at the same time over one
+                                   connection. Output is printed once all
+                                   nodes have finished.
+
         Returns:
            dict.      {'node_filename':
                        {cmd_number_index:
@@ -2397,10 +2541,20 @@ class GenericTest(unittest.TestCase):
 
         real_nodelist = self.get_node_list_by_name(nodelist)
 
-        for node in real_nodelist:
+        node_results = list()
+        if concurrent:
+            node_results = self.__execute_on_nodes_concurrently(
+                real_nodelist, cmdlist, username, password, ipv4, sudo,
+                break_on_error, su_root, su_timeout_secs)
+
+        for position, node in enumerate(real_nodelist):
             nodeindex = node.filename
             result[nodeindex] = {}
-            for cmd in cmdlist:
+            for cmd_num, cmd in enumerate(cmdlist):
+                # Commands after a failure are not run if break_on_error
+                if concurrent and cmd_num >= len(node_results[position]):
+                    break
+
                 self.g_util.log_now()
                 if username:
                     print "[{0}@{1}]# {2}".format(username,
@@ -2409,9 +2563,16 @@ class GenericTest(unittest.TestCase):
                     print "[{0}@{1}]# {2}".format(node.username,
                                                   node.ipv4, cmd)
 
-                stdout, stderr, exit_code = node.execute(
-                    cmd, username, password, ipv4, sudo, su_root,
-                    su_timeout_secs)
+                if concurrent:
+                    stdout, stderr, exit_code = \
+                        node_results[position][cmd_num]
+                else:
+                    stdout, stderr, exit_code = node.execute(
+                        cmd, username, password, ipv4, sudo, su_root,
+                        su_timeout_secs)
+
+                self.__invalidate_model_caches(node, cmd)
+
                 print '\n'.join(stdout)
                 print '\n'.join(stderr)
                 print exit_code
@@ -2435,7 +2596,7 @@ class GenericTest(unittest.TestCase):
                                               password, ipv4, su_root,
                                               inherit_cleanup=True)
 
-                cmdindex = cmdlist.index(cmd)
+                cmdindex = cmd_num
                 result[nodeindex][cmdindex] = {}
                 result[nodeindex][cmdindex]['stdout'] = stdout
                 result[nodeindex][cmdindex]['stderr'] = stderr
@@ -2516,6 +2677,10 @@ class GenericTest(unittest.TestCase):
         Contains logic to detect and handle log rotation while waiting for
         expected message.
 
+        Lines are matched as they are written by a follower of the log
+        shared by all waiters on the node. The log is polled instead if it
+        cannot be followed or LITP_LOG_FOLLOWER is not 'true'.
+
         Args:
            node (str): The node whose log you wish to check.
 
@@ -2545,10 +2710,6 @@ class GenericTest(unittest.TestCase):
             str/list; If return_log_msgs kwarg is set to True, a list of all
                       matching log messages found is returned.
         """
-        elapsed_sec = 0
-        check_interval_secs = 10
-        matching_logs = []
-
         if isinstance(msg_str, str):
             msg_strs = [msg_str]
         else:
@@ -2556,12 +2717,140 @@ class GenericTest(unittest.TestCase):
 
         # 1. Get current log length
         log_path = log_file
+        log_len_passed = bool(log_len)
 
         if not log_len:
             log_len = self.get_file_len(node, log_path)
 
         self.assertTrue(log_len, "Log file not found")
 
+        real_node = self.get_node_list_by_name([node])[0]
+        follower = get_log_follower(real_node.ipv4, log_path)
+
+        all_messages_found = None
+        start_time = time.time()
+
+        if follower:
+            all_messages_found, matching_logs = self.__follow_log_msgs(
+                node, follower, msg_strs, log_path, log_len, log_len_passed,
+                rotated_log, timeout_sec)
+
+        if all_messages_found is None:
+            all_messages_found, matching_logs = self.__poll_for_log_msgs(
+                node, msg_strs, log_path,
+                max(timeout_sec - int(time.time() - start_time), 0),
+                log_len, rotated_log)
+
+        if return_log_msgs:
+            if all_messages_found:
+                return matching_logs
+            else:
+                return []
+
+        return all_messages_found
+
+    def __follow_log_msgs(self, node, follower, msg_strs, log_path, log_len,
+                          log_len_passed, rotated_log, timeout_sec):
+        """
+        Waits for messages to appear in a log, matching lines as they are
+        written using the streaming log follower.
+
+        Args:
+           node (str): The node whose log you wish to check.
+
+           follower (LogFollower): The follower of the log on the node.
+
+           msg_strs (list): Message strings to search for in the log file.
+
+           log_path (str): Path to the log file.
+
+           log_len (int): Line of the log to start looking from.
+
+           log_len_passed (bool): True if log_len was passed by the caller,
+                                  the log may then have rotated since.
+
+           rotated_log (str): Path to the rotated log.
+
+           timeout_sec (int): Timeout in seconds.
+
+        Returns:
+            bool, list. True if all messages were found and the matching
+            log lines. None instead of a bool if the follower stopped before
+            all messages were found.
+        """
+        matching_logs = list()
+        start_line = log_len
+        pending_msgs = list(msg_strs)
+
+        # The log rotated since log_len was read, check the rotated log
+        if log_len_passed and self.get_file_len(node, log_path) < log_len:
+            unzip_cmd = "gunzip {0}.gz".format(rotated_log)
+            self.run_command(node, unzip_cmd, su_root=True)
+
+            for msg_str in msg_strs:
+                matching_log_str = self.check_for_log(node, msg_str,
+                                                      rotated_log, log_len,
+                                                      return_log_msg=True)
+                if matching_log_str:
+                    matching_logs.extend(matching_log_str)
+                    pending_msgs.remove(msg_str)
+
+            start_line = 1
+
+        if not pending_msgs:
+            return True, matching_logs
+
+        real_node = self.get_node_list_by_name([node])[0]
+        subscription = follower.subscribe(
+            pending_msgs, start_line,
+            lambda cmd: real_node.open_stream_channel(cmd, su_root=True))
+        try:
+            subscription.wait(timeout_sec)
+        finally:
+            follower.unsubscribe(subscription)
+
+        if subscription.failed and not subscription.all_found():
+            self.log("info", "Log follower of {0} stopped, polling the log "
+                     "instead".format(log_path))
+            return None, list()
+
+        all_messages_found = True
+        for msg_str in pending_msgs:
+            if subscription.matches[msg_str]:
+                matching_logs.extend(subscription.matches[msg_str])
+            else:
+                self.log('error', 'Message {0} not found'.format(msg_str))
+                all_messages_found = False
+
+        return all_messages_found, matching_logs
+
+    def __poll_for_log_msgs(self, node, msg_strs, log_path, timeout_sec,
+                            log_len, rotated_log):
+        """
+        Waits for messages to appear in a log, checking the log every 10
+        seconds.
+
+        Args:
+           node (str): The node whose log you wish to check.
+
+           msg_strs (list): Message strings to search for in the log file.
+
+           log_path (str): Path to the log file.
+
+           timeout_sec (int): Timeout in seconds.
+
+           log_len (int): Line of the log to start looking from.
+
+           rotated_log (str): Path to the rotated log.
+
+        Returns:
+            bool, list. True if all messages were found and the matching
+            log lines.
+        """
+        elapsed_sec = 0
+        check_interval_secs = 10
+        matching_logs = []
+
         all_messages_found = True
         for msg_str in msg_strs:
             msg_found = False
@@ -2625,13 +2914,7 @@ class GenericTest(unittest.TestCase):
             #if not msg_found:
             #    all_messages_found = False
 
-        if return_log_msgs:
-            if all_messages_found:
-                return matching_logs
-            else:
-                return []
-
-        return all_messages_found
+        return all_messages_found, matching_logs
 
     def wait_for_cmd(self, node, cmd, expected_rc, expected_stdout=None,
                      timeout_mins=1, su_root=False, default_time=10,
@@ -2800,6 +3083,8 @@ class GenericTest(unittest.TestCase):
                                                             su_root,
                                                             timeout_secs)
 
+        self.__invalidate_model_caches(real_node, cmd)
+
         if suppress_output:
             self.log("info", "Surpressing large output ({0} lines)"\
                          .format(len(stdout)))
@@ -2917,6 +3202,198 @@ class GenericTest(unittest.TestCase):
 
         return std_out
 
+    def get_model_mirror(self, node):
+        """
+        Returns the local mirror of the LITP model on an MS, loading it with
+        a recursive show of the root path if it is not loaded.
+
+        The mirror is shared by all tests. The parts of the model changed by
+        LITP commands, including REST requests made with RestUtils, are
+        reloaded when next queried and the whole model whenever a plan is
+        polled or the mirror is older than LITP_MODEL_MIRROR_TTL seconds
+        (default 60). Plans and item states are never read from the mirror.
+
+        Args:
+            node (str): The MS with the model.
+
+        Returns:
+            LitpModelMirror. The loaded mirror or None if mirroring is
+                disabled by setting LITP_MODEL_MIRROR to false, a plan may be
+                running or the model cannot be fetched.
+        """
+        real_node_ls = self.get_node_list_by_name([node])
+        if not real_node_ls:
+            return None
+
+        # Items may change at any time while a plan runs
+        if get_show_cache(real_node_ls[0].ipv4).plan_running:
+            return None
+
+        real_node = real_node_ls[0]
+        show_cli = self.cli
+
+        def fetch_show_output(path):
+            """Fetches part of the model with one show command. The output
+            is read off the channel unprocessed to keep its indentation and
+            only the connection of the MS node object is used as the mirror
+            is shared by, and may outlive, this test."""
+            show_stream = StringIO.StringIO()
+            stderr, returnc = real_node.execute_stream(
+                show_cli.get_show_cmd(path, "-r"), show_stream)
+            if returnc != 0 or stderr:
+                return None
+
+            return show_stream.getvalue().splitlines()
+
+        mirror = get_model_mirror(real_node.ipv4, fetch_show_output)
+        if not mirror:
+            return None
+
+        loads = mirror.loads
+        if not mirror.refresh():
+            return None
+
+        if mirror.loads != loads:
+            self.log("info", "Reloaded model mirror ({0} items)"
+                     .format(len(mirror.get_paths())))
+
+        return mirror
+
+    def invalidate_model_mirror(self, node):
+        """
+        Invalidates the local mirror of the LITP model on an MS. Only needed
+        if the model is changed other than by LITP commands run by a test.
+
+        Args:
+            node (str): The MS with the model.
+        """
+        real_node_ls = self.get_node_list_by_name([node])
+        if real_node_ls:
+            invalidate_model_mirror(real_node_ls[0].ipv4)
+            get_show_cache(real_node_ls[0].ipv4).invalidate_all()
+
+    def __invalidate_model_caches(self, real_node, cmd):
+        """
+        Invalidates the model mirror and the shows cached for the parts of
+        the model a command may have changed.
+
+        Args:
+            real_node (GenericNode): The node the command was run on.
+
+            cmd (str): The command run.
+        """
+        paths = self.cli.get_mutated_paths(cmd)
+        if not paths:
+            return
+
+        show_cache = get_show_cache(real_node.ipv4)
+
+        if self.cli.is_plan_starting_cmd(cmd):
+            show_cache.set_plan_running(True)
+
+        for path in paths:
+            invalidate_model_mirror(real_node.ipv4, path)
+            show_cache.invalidate(path)
+
+    def __get_checked_show_cache(self, node, real_node):
+        """
+        Returns the show cache of an MS, first polling the plan state if no
+        recent poll confirmed no plan is running, as a plan may have been
+        started in a way the cache has not seen.
+
+        Args:
+            node (str): The MS.
+
+            real_node (GenericNode): The MS node object.
+
+        Returns:
+            ShowCache. The show cache of the MS.
+        """
+        show_cache = get_show_cache(real_node.ipv4)
+
+        if show_cache.needs_plan_check():
+            stdout, _, returnc = self.run_command(
+                node, self.cli.get_show_cmd("/plans/plan"), logging=False)
+            # No plan exists if the show fails
+            plan_states = [self._translate_plan_state(line.split(":", 1)[1])
+                           for line in stdout if line.startswith("state:")]
+            show_cache.set_plan_running(
+                returnc == 0 and bool(
+                    [state for state in plan_states
+                     if state in [test_constants.PLAN_IN_PROGRESS,
+                                  test_constants.PLAN_STOPPING]]),
+                polled=True)
+
+        return show_cache
+
+    def __run_show_cmd(self, node, url, args='', username=None,
+                       password=None, logging=True, use_cache=True):
+        """
+        Runs a LITP show command, reading the output from the show cache of
+        the MS if it is cached. Successful shows are cached until a command
+        changes the part of the model shown, for at most the cache TTL.
+
+        Args:
+            node (str): The MS to run the show on.
+
+            url (str): The path to show.
+
+        Kwargs:
+            args (str): Show arguments, e.g. '-j' or '-r'.
+
+            username (str): User to run the show as if not default.
+
+            password (str): Password of the user.
+
+            logging (bool): If False, turn off logging of the show.
+
+            use_cache (bool): Set to False to always run the show, e.g. to
+                read item states.
+
+        Returns:
+            list, list, int. std_out, std_err, rc from running the show.
+        """
+        show_cmd = self.cli.get_show_cmd(url, args)
+        real_node_ls = self.get_node_list_by_name([node])
+
+        if not real_node_ls or not use_cache or \
+                not get_show_cache(real_node_ls[0].ipv4).is_cacheable(url):
+            return self.run_command(node, show_cmd, username, password,
+                                    logging=logging)
+
+        show_cache = self.__get_checked_show_cache(node, real_node_ls[0])
+        user = username or real_node_ls[0].username
+        stdout = show_cache.get(url, args, user)
+
+        if stdout is not None:
+            if logging:
+                print "[show cache]# {0}".format(show_cmd)
+                print '\n'.join(stdout)
+
+            return stdout, [], 0
+
+        stdout, stderr, returnc = self.run_command(node, show_cmd, username,
+                                                   password, logging=logging)
+
+        if returnc == 0 and not stderr:
+            show_cache.put(url, args, stdout, user)
+
+        return stdout, stderr, returnc
+
+    def log_show_cache_stats(self):
+        """
+        Logs the show cache counters of each MS for the current test. Each
+        hit is an SSH round trip saved.
+        """
+        for key, show_cache in SHOW_CACHES.items():
+            stats = show_cache.get_stats()
+            start_stats = self.show_cache_stats.get(key, dict())
+
+            for counter in ["hits", "misses", "invalidations", "evictions"]:
+                stats[counter] -= start_stats.get(counter, 0)
+
+            self.log("info", "Show cache {0}: {1}".format(key, stats))
+
     def find_children_of_collect(self, node, path, collect_type,
                                  include_collect=False,
                                  find_all_collect=False):
@@ -2959,9 +3436,14 @@ class GenericTest(unittest.TestCase):
         else:
             collections.extend(collection_paths)
 
+        mirror = self.get_model_mirror(node)
+
         for collect_item in collections:
-            stdout, _, _ = self.execute_cli_show_cmd(node,
-                                                     collect_item, "-l")
+            if mirror and mirror.covers(collect_item):
+                stdout = [collect_item] + mirror.get_children(collect_item)
+            else:
+                stdout, _, _ = self.execute_cli_show_cmd(node,
+                                                         collect_item, "-l")
             if include_collect:
                 all_collects.extend(stdout)
             else:
@@ -3028,6 +3510,18 @@ class GenericTest(unittest.TestCase):
         if url.count("/") == 1:
             return "/"
 
+        mirror = self.get_model_mirror(node)
+        if mirror and mirror.covers(url, item_type):
+            item_types = [item_type, "reference-to-{0}".format(item_type)]
+
+            while url.count("/") > 1:
+                item = mirror.get_item(url)
+                if item and item['type'] in item_types:
+                    return url
+                url = mirror.get_parent_path(url)
+
+            return None
+
         while url.count("/") > 1:
             show_cmd = self.cli.get_show_cmd(url)
             resource_filter = \
@@ -3084,6 +3578,23 @@ class GenericTest(unittest.TestCase):
         Returns:
             list. List of all paths matched by find.
         """
+        mirror = self.get_model_mirror(node)
+        if mirror and mirror.covers(path, resource):
+            std_out = mirror.find(path, resource, rtn_type_children,
+                                  exact_match, find_refs)
+            self.log("info", "Find of {0} under {1} in model mirror: {2}"
+                     .format(resource, path, std_out))
+
+            if exclude_services:
+                std_out = [item_path for item_path in std_out
+                           if 'services' not in item_path]
+
+            if assert_not_empty:
+                self.assertNotEqual([], std_out,
+                                    "Find command did not return any paths")
+
+            return std_out
+
         # 0. Construct recursive show command on path
         show_cmd = CLIUtils().get_show_cmd(path, "-r")
 
@@ -4018,9 +4529,8 @@ class GenericTest(unittest.TestCase):
         ]
 
         # copy across the rpms
-        for flist in rpm_sftp_dict:
-            if not self.copy_filelist_to(node, [flist], True, False):
-                return False
+        if not self.copy_filelist_to(node, rpm_sftp_dict, True, False):
+            return False
 
         # createrepo is only available on the MS.
         if self.get_node_att(node, 'nodetype') == 'management':
@@ -4247,25 +4757,152 @@ class GenericTest(unittest.TestCase):
            bool. If all copies succeed returns True, otherwise returns False.
         """
         all_success = True
+        file_pairs = list()
 
         for file_item in filelist:
-            successful_copy = self.copy_file_to(node, file_item['local_path'],
-                                                file_item['remote_path'],
-                                                root_copy,
-                                                add_to_cleanup,
-                                                file_permissions)
+            if os.path.exists(file_item['local_path']):
+                file_pairs.append((file_item['local_path'],
+                                   file_item['remote_path']))
+                continue
 
-            if not successful_copy:
-                self.log("error",
-                         "Failed to copy local path {0} to remote path {1}"\
-                             .format(file_item['local_path'],
-                                     file_item['remote_path']))
+            self.log("error", "Cannot copy {0}, local path does not exist"
+                     .format(file_item['local_path']))
+            self.log("error",
+                     "Failed to copy local path {0} to remote path {1}"\
+                         .format(file_item['local_path'],
+                                 file_item['remote_path']))
+            all_success = False
+
+        if not file_pairs:
+            return all_success
+
+        real_node = self.get_node_list_by_name(node)[0]
 
-                if all_success:
-                    all_success = False
+        #If filename is not provied for remote path use the filename
+        #of the local file
+        stdout, _, _ = self.run_command(
+            node,
+            SftpTransfer.get_remote_dirs_cmd([remote_path for _, remote_path
+                                              in file_pairs]),
+            su_root=root_copy)
+        for index in [int(line) for line in stdout if line.isdigit()]:
+            local_path, remote_path = file_pairs[index]
+            file_pairs[index] = (local_path, self.g_util.join_paths(
+                remote_path, os.path.basename(local_path)))
+
+        for local_path, remote_path in file_pairs:
+            self.log(
+                "info",
+                "Copying: {0} to remote path {1} (root_copy={2})"\
+                    .format(local_path, remote_path, root_copy))
+
+        ##if peer node cannot connect directly as root
+        #so copy as non-root to tmp and then move files
+        if self.get_node_att(node, 'nodetype') != 'management' \
+                and root_copy:
+            copied = self.__copy_files_via_tmp(node, real_node, file_pairs,
+                                               file_permissions)
+        else:
+            copied = real_node.copy_files(file_pairs, root_copy,
+                                          file_permissions)
+
+        skipped = len(file_pairs) - len(copied)
+        if skipped:
+            self.log("info", "Skipped {0} file(s) already on {1}"
+                     .format(skipped, node))
+
+        if add_to_cleanup:
+            for _, remote_path in file_pairs:
+                self.__add_to_filepath_cleanup(node, remote_path,
+                                               su_root=root_copy)
 
         return all_success
 
+    def __copy_files_via_tmp(self, node, real_node, file_pairs,
+                             file_permissions):
+        """Copies files as the default user to /tmp and then moves them to
+        their remote paths as root, for nodes which do not allow root
+        logins. Files already on the node are not copied.
+
+        Args:
+           node (str): The node to copy the files to.
+
+           real_node (GenericNode): The node object.
+
+           file_pairs (list): (local path, remote path) pairs.
+
+           file_permissions (int): Permissions to set for copied files.
+
+        Returns:
+           list. The remote paths of files copied.
+        """
+        remote_sizes = dict((remote_path, os.path.getsize(local_path))
+                            for local_path, remote_path in file_pairs)
+        stdout, _, _ = self.run_command(
+            node, SftpTransfer.get_remote_checksums_cmd(remote_sizes),
+            su_root=True)
+        unchanged = SftpTransfer.get_unchanged(
+            file_pairs, SftpTransfer.get_remote_checksums(stdout))
+
+        tmp_pairs = list()
+        cmds = list()
+        copied = list()
+        for local_path, remote_path in file_pairs:
+            if remote_path in unchanged:
+                cmds.append("chmod {0:o} {1}".format(
+                    file_permissions, SftpTransfer.quote(remote_path)))
+                continue
+
+            tmp_path = "/tmp/tmp_file_{0}".format(len(tmp_pairs))
+            tmp_pairs.append((local_path, tmp_path))
+            cmds.append("mv -f {0} {1}".format(
+                tmp_path, SftpTransfer.quote(remote_path)))
+            copied.append(remote_path)
+
+        real_node.copy_files(tmp_pairs, False, file_permissions,
+                             skip_unchanged=False)
+
+        _, stderr, returnc = self.run_command(node, " && ".join(cmds),
+                                              su_root=True)
+        if returnc != 0:
+            raise IOError("Failed to move files into place: {0}"
+                          .format(stderr))
+
+        return copied
+
+    def copy_filelist_to_nodes(self, nodes, filelist, root_copy=False,
+                               add_to_cleanup=True, file_permissions=0777):
+        """Copies a list of files to several nodes, with all nodes copying
+        in parallel.
+
+        Args:
+           nodes (list): The nodes to copy the files to.
+
+           filelist (list): A list of dictionary pairs. Created by\
+              get_filelist_dict which contains the local and remote paths to\
+              copy to.
+
+        Kwargs:
+           root_copy (bool): If set to True, copies all files with root\
+              privileges.
+
+           add_to_cleanup (bool): If set to True (default), adds files to\
+              cleanup list for deletion later.
+
+           file_permissions (int): Permissions to set for copied file using\
+              chmod notation. Defaults to 0777.
+
+        Returns:
+           bool. If all copies succeed returns True, otherwise returns False.
+        """
+        results = SftpTransfer.run_per_node(
+            lambda node: self.copy_filelist_to(node, filelist, root_copy,
+                                               add_to_cleanup,
+                                               file_permissions),
+            nodes)
+
+        return all(results.values())
+
     def copy_file_to(self, node, local_filepath, remote_filepath,
                      root_copy=False, add_to_cleanup=True,
                      file_permissions=0777):
@@ -4293,55 +4930,9 @@ class GenericTest(unittest.TestCase):
         Returns:
            bool. True if copy is successful or False otherwise.
         """
-        if os.path.exists(local_filepath):
-
-            real_node = self.get_node_list_by_name(node)[0]
-
-            if real_node:
-                ####
-                self.log(
-                    "info",
-                    "Copying: {0} to remote path {1} (root_copy={2})"\
-                        .format(local_filepath, remote_filepath, root_copy))
-
-                #If filename is not provied for remote path use the filename
-                #of the local file
-                if self.remote_path_exists(node, remote_filepath, False,
-                                           su_root=root_copy):
-                    local_fileparts = local_filepath.split("/")
-                    local_filename = local_fileparts[len(local_fileparts) - 1]
-
-                    remote_filepath = \
-                        self.g_util.join_paths(remote_filepath,
-                                               local_filename)
-
-                ##if peer node cannot connect directly as root
-                #so copy as non-root to tmp and then move file
-                if self.get_node_att(node, 'nodetype') != 'management' \
-                        and root_copy:
-                    real_node.copy_file(local_filepath, '/tmp/tmp_file',
-                                        False, file_permissions)
-                    self.mv_file_on_node(node, '/tmp/tmp_file',
-                                         remote_filepath,
-                                         su_root=True,
-                                         add_to_cleanup=False)
-
-                ####
-                else:
-                    real_node.copy_file(local_filepath, remote_filepath,
-                                        root_copy, file_permissions)
-
-                if add_to_cleanup:
-                    self.__add_to_filepath_cleanup(node,
-                                                   remote_filepath,
-                                                   su_root=root_copy)
-                return True
-
-        else:
-            self.log("error", "Cannot copy {0}, local path does not exist"
-                     .format(local_filepath))
-
-        return False
+        return self.copy_filelist_to(
+            node, [self.get_filelist_dict(local_filepath, remote_filepath)],
+            root_copy, add_to_cleanup, file_permissions)
 
     def download_file_from_node(self, node, remote_filepath, local_filepath,
                                 root_copy=False):
@@ -4397,6 +4988,145 @@ class GenericTest(unittest.TestCase):
                          .format(remote_filepath))
                 return False
 
+    def copy_dir_to_node(self, node, local_dir, remote_dir, root_copy=False,
+                         add_to_cleanup=True):
+        """Copies the contents of a local directory to a node as a single
+        compressed tar stream, rather than file by file. Use for trees of
+        many small files.
+
+        Args:
+           node       (str): Node to copy the directory to.
+
+           local_dir  (str): Path of the local directory to copy.
+
+           remote_dir (str): Path on node to copy the contents to, created\
+              if it does not exist.
+
+        Kwargs:
+           root_copy      (bool): Set to True to copy as the root user.
+
+           add_to_cleanup (bool): By default, deletes the remote directory\
+              after test if it did not exist before, otherwise deletes the\
+              copied files and directories which did not exist before. Set\
+              to False to prevent auto-deletion.
+
+        Returns:
+           bool. True if copy is successful or False otherwise.
+        """
+        if not os.path.isdir(local_dir):
+            self.log("error", "Cannot copy {0}, local directory does not "
+                     "exist".format(local_dir))
+            return False
+
+        real_node = self.get_node_list_by_name(node)[0]
+
+        # Only what the copy creates may be deleted after the test
+        existing_entries = None
+        if add_to_cleanup:
+            stdout, _, returnc = self.run_command(
+                node, "ls -A1 {0}".format(SftpTransfer.quote(remote_dir)),
+                su_root=root_copy)
+            if returnc == 0:
+                existing_entries = set(stdout)
+
+        self.log("info",
+                 "Copying: {0} to remote path {1} as tar stream "
+                 "(root_copy={2})".format(local_dir, remote_dir, root_copy))
+
+        try:
+            ##if peer node cannot connect directly as root
+            #so copy as non-root to tmp and then move contents
+            if self.get_node_att(node, 'nodetype') != 'management' \
+                    and root_copy:
+                tmp_dir = "/tmp/tmp_tar_stream_dir"
+                # Clear anything left by an earlier copy
+                _, stderr, returnc = self.run_command(
+                    node, "rm -rf {0}".format(tmp_dir), su_root=True)
+                if returnc != 0:
+                    self.log("error", "Failed to clear {0}: {1}"
+                             .format(tmp_dir, stderr))
+                    return False
+                real_node.upload_dir(local_dir, tmp_dir, False)
+                _, stderr, returnc = self.run_command(
+                    node, "mkdir -p {1} && cp -r {0}/. {1} && rm -rf {0}"
+                    .format(tmp_dir, SftpTransfer.quote(remote_dir)),
+                    su_root=True)
+                if returnc != 0:
+                    self.log("error", "Failed to move {0} into place: {1}"
+                             .format(remote_dir, stderr))
+                    return False
+            else:
+                real_node.upload_dir(local_dir, remote_dir, root_copy)
+        except IOError:
+            return False
+
+        if add_to_cleanup and existing_entries is None:
+            self.__add_to_filepath_cleanup(node, remote_dir,
+                                           su_root=root_copy)
+        elif add_to_cleanup:
+            for entry in sorted(os.listdir(local_dir)):
+                if entry not in existing_entries:
+                    self.__add_to_filepath_cleanup(
+                        node, os.path.join(remote_dir, entry),
+                        su_root=root_copy)
+
+        return True
+
+    def download_dir_from_node(self, node, remote_dir, local_dir,
+                               root_copy=False):
+        """Downloads the contents of a directory on a node to gateway as a
+        single compressed tar stream, rather than file by file.
+
+        Args:
+           node       (str): Node to download the directory from.
+
+           remote_dir (str): Path of the directory on node.
+
+           local_dir  (str): Path on gateway to copy the contents to,\
+              created if it does not exist.
+
+        Kwargs:
+           root_copy (bool): Set to True to copy as the root user.
+
+        Returns:
+           bool. True if download is successful or False otherwise.
+        """
+        real_node = self.get_node_list_by_name(node)[0]
+
+        self.log("info",
+                 "Copying: {0} to local path {1} as tar stream "
+                 "(root_copy={2})".format(remote_dir, local_dir, root_copy))
+
+        if not self.remote_path_exists(node, remote_dir, False,
+                                       su_root=root_copy):
+            self.log("error", "Cannot download {0}, remote directory does "
+                     "not exist".format(remote_dir))
+            return False
+
+        try:
+            ##if peer node, cannot connect directly as root
+            #so copy to tmp and then download contents
+            if self.get_node_att(node, 'nodetype') != 'management' \
+                    and root_copy:
+                tmp_dir = "/tmp/tmp_tar_stream_dir"
+                _, stderr, returnc = self.run_command(
+                    node, "rm -rf {1} && cp -r {0} {1} && chown -R {2} {1}"
+                    .format(SftpTransfer.quote(remote_dir), tmp_dir,
+                            real_node.username),
+                    su_root=True)
+                if returnc != 0:
+                    self.log("error", "Failed to copy {0} to {1}: {2}"
+                             .format(remote_dir, tmp_dir, stderr))
+                    return False
+                self.__add_to_filepath_cleanup(node, tmp_dir, su_root=True)
+                real_node.download_dir(local_dir, tmp_dir, False)
+            else:
+                real_node.download_dir(local_dir, remote_dir, root_copy)
+        except IOError:
+            return False
+
+        return True
+
     def create_dir_on_node(self, node, remote_filepath,
                            su_root=False, add_to_cleanup=True):
         """Create a file/directory to the specified node.
@@ -5293,6 +6023,25 @@ class GenericTest(unittest.TestCase):
                                                 log_output=True,
                                                 show_option=""))
 
+        plan_state = self._translate_plan_state(plan_status)
+
+        if plan_state == test_constants.CMD_ERROR:
+            self.log("info", "Unexpected plan state: {0}".format(plan_status))
+
+        return plan_state
+
+    @staticmethod
+    def _translate_plan_state(plan_status):
+        """Translates a plan state as shown by LITP to its constant.
+
+        Args:
+            plan_status (str): The plan state, e.g. "running" or a
+                show_plan line containing it.
+
+        Returns:
+            int. An integer corresponding to the status of the
+                plan as defined in test_constants.
+        """
         if "initial" in plan_status.lower():
             return test_constants.PLAN_NOT_RUNNING
         elif "running" in plan_status.lower():
@@ -5308,10 +6057,111 @@ class GenericTest(unittest.TestCase):
         elif "invalid" in plan_status.lower():
             return test_constants.PLAN_INVALID
 
-        self.log("info", "Unexpected plan state: {0}".format(plan_status))
-
         return test_constants.CMD_ERROR
 
+    @staticmethod
+    def _fetch_node_plan_state(real_node):
+        """Fetches the plan state for the plan watcher. Only the connection
+        of the given node object is used as the watcher is shared by, and
+        may outlive, the test which created it.
+
+        Args:
+            real_node (GenericNode): The MS node object.
+
+        Returns:
+            int. The plan state as defined in test_constants, or CMD_ERROR
+                if it could not be read.
+        """
+        stdout, _, exit_code = real_node.execute(
+            '/usr/bin/litp show -p /plans/plan -j',
+            connection_timeout_secs=30)
+
+        try:
+            props = json.loads('\n'.join(stdout))['properties']
+        except (ValueError, KeyError, TypeError):
+            return test_constants.CMD_ERROR
+
+        if exit_code != 0:
+            return test_constants.CMD_ERROR
+
+        return GenericTest._translate_plan_state(str(props.get('state')))
+
+    @staticmethod
+    def _fetch_node_plan(real_node):
+        """Fetches the plan state and the state of every task for the plan
+        watcher. As for _fetch_node_plan_state only the connection of the
+        given node object is used.
+
+        Args:
+            real_node (GenericNode): The MS node object.
+
+        Returns:
+            int, dict. The plan state as defined in test_constants and a dict
+                of (phase, url, description) of each task mapped to its state.
+        """
+        plan_stream = StringIO.StringIO()
+        real_node.execute_stream('/usr/bin/litp show_plan -j', plan_stream,
+                                 connection_timeout_secs=30)
+
+        try:
+            plan = GenericTest._parse_plan_json(
+                json.loads(plan_stream.getvalue()))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # No plan exists or show_plan failed
+            return GenericTest._fetch_node_plan_state(real_node), dict()
+
+        tasks = dict()
+        for phase, clusters in plan['phases'].iteritems():
+            for cluster_tasks in clusters.itervalues():
+                for task in cluster_tasks:
+                    tasks[(phase, task['url'], task['desc'])] = task['state']
+
+        return GenericTest._translate_plan_state(plan['state']), tasks
+
+    def get_plan_watcher(self, node, seconds_increment=3):
+        """Returns the shared plan watcher of the given MS. All waiters on
+        the same plan share the polls made by the watcher.
+
+        The watcher polls over the connection of the MS node object it was
+        created with, never through the test which asked for it.
+
+        Args:
+            node (str): The MS node.
+
+        Kwargs:
+            seconds_increment (int): The time in seconds between polls while
+                the plan is changing. Polls back off while it is idle.
+
+        Returns:
+            PlanWatcher. The watcher for the plan on the MS.
+        """
+        real_node = self.get_node_list_by_name([node])[0]
+        ms_ip = real_node.ipv4
+
+        def plan_polled(state):
+            """The model may have changed while the plan ran"""
+            invalidate_model_mirror(ms_ip)
+            get_show_cache(ms_ip).set_plan_running(
+                state in [test_constants.PLAN_IN_PROGRESS,
+                          test_constants.PLAN_STOPPING], polled=True)
+
+        def fetch_state():
+            """Polls the plan state only"""
+            state = GenericTest._fetch_node_plan_state(real_node)
+            plan_polled(state)
+
+            return state
+
+        def fetch_plan():
+            """Fetches the full plan"""
+            plan = GenericTest._fetch_node_plan(real_node)
+            plan_polled(plan[0])
+
+            return plan
+
+        return get_plan_watcher(('cli', ms_ip, real_node.username),
+                                fetch_state, fetch_plan, seconds_increment)
+
     def set_pws_new_node(self, ms_node, node,
                          workspace='/home/lciadm100/jenkins/workspace/'):
         """
@@ -5461,34 +6311,24 @@ class GenericTest(unittest.TestCase):
         """
         self.log("info", "Entering wait_for_plan_state method")
 
-        retries = 3
         start_time = time.time()
-        full_show_increment_count = seconds_increment
-        seconds_count = seconds_increment
-        full_show_increment_secs = 60
-
-        plan_state = self.get_current_plan_state(node, full_show)
-
-        while True:
+        watcher = self.get_plan_watcher(node, seconds_increment)
+        # Lists so the counts can be updated from is_state_reached
+        retries = [3]
+        litp_retries = [1]
 
-            time.sleep(seconds_increment)
-            seconds_count += seconds_increment
-            full_show_increment_count += seconds_increment
-            minutes_passed = seconds_count / 60
-
-            if full_show_increment_count > full_show_increment_secs:
-                self.get_current_plan_state(node, full_show)
-                full_show_increment_count = 0
-
-            if minutes_passed > timeout_mins:
-                self.get_current_plan_state(node, full_show)
-                elapsed_time = int(time.time() - start_time)
-                self.log("info",
-                         "Exiting wait_for_plan_state method after " + \
-                             "{0} seconds (TIMEOUT)".format(elapsed_time))
-                return False
+        def is_state_reached(snapshot):
+            """Returns True/False once the state is reached/unreachable"""
+            plan_state = snapshot['state']
 
-            plan_state = self.get_current_plan_state(node)
+            if plan_state == test_constants.CMD_ERROR and litp_retries[0] > 0:
+                self.log('info',
+                         "[TORF-324244] - LITP plan state could not be "
+                         "read, waiting for node to come up before "
+                         "polling again")
+                litp_retries[0] -= 1
+                self.wait_for_node_up(node, wait_for_litp=True)
+                return None
 
             if plan_state == test_constants.PLAN_STOPPED or \
                     plan_state == test_constants.PLAN_FAILED:
@@ -5496,46 +6336,111 @@ class GenericTest(unittest.TestCase):
 
             #This covers case where you are waiting for plan to start
             if plan_state == state_value:
-                self.get_current_plan_state(node, full_show)
-                elapsed_time = int(time.time() - start_time)
-                self.log("info",
-                         "Exiting wait_for_plan_state method after " + \
-                             "{0} seconds (SUCCESS)".format(elapsed_time))
                 return True
 
             #If plan is not in progress need to exit or you will
             #loop forever
-            if plan_state != test_constants.PLAN_IN_PROGRESS:
-                if plan_state == state_value:
-                    self.get_current_plan_state(node, full_show)
-                    elapsed_time = int(time.time() - start_time)
-                    self.log("info",
-                             "Exiting wait_for_plan_state method after " + \
-                                 "{0} seconds (SUCCESS)".format(elapsed_time))
-                    return True
-                elif state_value == test_constants.PLAN_STOPPED and \
-                        plan_state == test_constants.PLAN_STOPPING:
-                    continue
-                elif state_value == test_constants.PLAN_COMPLETE and \
-                        plan_state == test_constants.PLAN_STOPPING:
-                    continue
-                elif plan_state == test_constants.PLAN_NOT_RUNNING and \
-                         retries > 0:
-                    self.log("info",
-                             "LITP Plan is not running. Retries left: {0}" \
-                                                            .format(retries))
-                    retries -= 1
-                    continue
-                else:
-                    self.get_current_plan_state(node, full_show)
-                    elapsed_time = int(time.time() - start_time)
-                    self.log("info",
-                             "Exiting wait_for_plan_state method after " + \
-                                 "{0} seconds (UNEXPECTED FINAL STATE: {1})" \
-                                 .format(elapsed_time, plan_state))
-                    return False
+            if plan_state == test_constants.PLAN_IN_PROGRESS:
+                return None
+            elif state_value == test_constants.PLAN_STOPPED and \
+                    plan_state == test_constants.PLAN_STOPPING:
+                return None
+            elif state_value == test_constants.PLAN_COMPLETE and \
+                    plan_state == test_constants.PLAN_STOPPING:
+                return None
+            elif plan_state == test_constants.PLAN_NOT_RUNNING and \
+                    retries[0] > 0:
+                self.log("info",
+                         "LITP Plan is not running. Retries left: {0}" \
+                                                        .format(retries[0]))
+                retries[0] -= 1
+                return None
+
+            return False
+
+        def log_task_change(task, old_state, new_state):
+            """Logs tasks changing state while waiting"""
+            if old_state:
+                self.log("info", "Phase {0} {1}: {2} -> {3}"
+                         .format(task[0], task[1], old_state, new_state))
+
+        # As before the plan watcher, show the full plan at most once a
+        # minute, or when its state changes, to log the progress of tasks
+        tasks_max_age_secs = None
+        if full_show:
+            tasks_max_age_secs = 60
+
+        watcher.add_listener(log_task_change)
+        try:
+            state_reached = watcher.wait_for(is_state_reached,
+                                             timeout_mins * 60,
+                                             tasks_max_age_secs)
+        finally:
+            watcher.remove_listener(log_task_change)
+
+        self.get_current_plan_state(node, full_show)
+        elapsed_time = int(time.time() - start_time)
+
+        if state_reached is None:
+            self.log("info",
+                     "Exiting wait_for_plan_state method after " + \
+                         "{0} seconds (TIMEOUT)".format(elapsed_time))
+            return False
+
+        if state_reached:
+            self.log("info",
+                     "Exiting wait_for_plan_state method after " + \
+                         "{0} seconds (SUCCESS)".format(elapsed_time))
+            return True
+
+        self.log("info",
+                 "Exiting wait_for_plan_state method after " + \
+                     "{0} seconds (UNEXPECTED FINAL STATE: {1})" \
+                     .format(elapsed_time, watcher.snapshot['state']))
+        return False
+
+    def get_plan_task_index(self, ms_node):
+        """
+        Fetches the plan once and returns an index which answers any number
+        of task state queries from memory.
+
+        Args:
+           ms_node (str): The node running the plan.
+
+        Returns:
+           PlanTaskIndex. Index of all tasks in the plan.
+
+        Raises:
+           ValueError if no plan could be read.
+        """
+        plan = self.get_plan_data(ms_node)
+
+        return PlanTaskIndex((task['desc'], task['state'])
+                             for clusters in plan['phases'].itervalues()
+                             for tasks in clusters.itervalues()
+                             for task in tasks)
+
+    @staticmethod
+    def __get_snapshot_task_index(snapshot):
+        """
+        Returns the task index of a plan watcher snapshot, building it on
+        first use so all waiters on the snapshot share it.
+
+        Args:
+           snapshot (dict): Plan watcher snapshot.
 
-    def get_task_state(self, ms_node, task_desc, ignore_variables=True):
+        Returns:
+           PlanTaskIndex. Index of all tasks in the snapshot.
+        """
+        if 'index' not in snapshot:
+            snapshot['index'] = PlanTaskIndex(
+                (task[2], state)
+                for task, state in snapshot['tasks'].iteritems())
+
+        return snapshot['index']
+
+    def get_task_state(self, ms_node, task_desc, ignore_variables=True,
+                       task_index=None):
         """
         Checks the state of tasks matching the selected description.
         NB: Anything inside "" is ignored unless flag is set.
@@ -5556,67 +6461,20 @@ class GenericTest(unittest.TestCase):
               the exact line. This is only allowed if your test creates the\
               variable in question.
 
-        Returns:
-           int. Constants value relating to the tasks state.
-        """
-        grep_variables = ""
-
-        if not ignore_variables:
-            found_var = False
-            var_str_ls = list()
-            var_str_ls = re.findall('\"(.+?)\"', task_desc)
-            grep_variables = str()
-            grep_variables += "| /bin/grep -A4 "
+           task_index (PlanTaskIndex): Index returned by get_plan_task_index.
+              If passed, the state is read from the index rather than
+              fetching the plan.
 
-            for var in var_str_ls:
-                found_var = True
-                grep_variables += ".*'{0}'"\
-                    .format(var)
-
-            if not found_var:
-                grep_variables = ""
-
-            #grep_variables = \
-                #"| /bin/grep -A3 -E '{0}'".format("|".join(var_str_ls))
-
-        #Replace all strings in "" with a match all charachter to ignore
-        #variables from the desc
-        task_desc = re.sub(r'\"(.+?)\"', '.*', task_desc)
-
-        show_plan_cmd = self.cli.get_show_plan_cmd("-j")
-        grep_task_desc = " |/bin/grep -A4 description | /bin/grep -A4 '{0}'" \
-            .format(task_desc)
-        grep_state = ' | /bin/grep \'"state":\''
-
-        grep_state_cmd = show_plan_cmd + grep_task_desc \
-            + grep_variables + grep_state
-
-        stdout, stderr, returnc = self.run_command(ms_node,
-                                                   grep_state_cmd)
-
-        #If no tasks are matched return error
-        if stderr != [] or returnc != 0:
-            return test_constants.CMD_ERROR
-
-        #If at least one task has failed return task failed
-        if self.is_text_in_list("Fail", stdout):
-            return test_constants.PLAN_TASKS_FAILED
-
-        #If the tasks matched have different states return INCONSISTENT
-        if not all(x == stdout[0] for x in stdout):
-            return test_constants.PLAN_TASKS_INCONSISTENT
-
-        if self.is_text_in_list("Success", stdout):
-            return test_constants.PLAN_TASKS_SUCCESS
-
-        if self.is_text_in_list("Initial", stdout):
-            return test_constants.PLAN_TASKS_INITIAL
-
-        if self.is_text_in_list("Stopped", stdout):
-            return test_constants.PLAN_TASKS_STOPPED
+        Returns:
+           int. Constants value relating to the tasks state.
+        """
+        if task_index is None:
+            try:
+                task_index = self.get_plan_task_index(ms_node)
+            except ValueError:
+                return test_constants.CMD_ERROR
 
-        if self.is_text_in_list("Run", stdout):
-            return test_constants.PLAN_TASKS_RUNNING
+        return task_index.get_task_state(task_desc, ignore_variables)
 
     def wait_for_task_state(self, ms_node, task_desc, expected_state,
                             ignore_variables=True, timeout_mins=10,
@@ -5657,25 +6515,18 @@ class GenericTest(unittest.TestCase):
            bool. True if task reaches expected state or False otherwise.
         """
 
-        seconds_count = seconds_increment
+        watcher = self.get_plan_watcher(ms_node, seconds_increment)
 
-        #Only keep checking while the plan is current running
-        while(self.get_current_plan_state(ms_node)
-              == test_constants.PLAN_IN_PROGRESS):
-
-            time.sleep(seconds_increment)
-            seconds_count += seconds_increment
-            minutes_passed = seconds_count / 60
-
-            if minutes_passed > timeout_mins:
-                self.get_current_plan_state(ms_node, True)
-                self.log("info",
-                         "Exiting wait_for_task_state method after " + \
-                             "{0} seconds (TIMEOUT)".format(seconds_count))
+        def is_task_state_reached(snapshot):
+            """Returns True/False once the state is reached/unreachable"""
+            #If the plan has stopped running before reaching expected
+            #state exit
+            if snapshot['state'] != test_constants.PLAN_IN_PROGRESS:
                 return False
 
-            task_state = self.get_task_state(ms_node, task_desc,
-                                             ignore_variables)
+            task_state = self.get_task_state(
+                ms_node, task_desc, ignore_variables,
+                task_index=self.__get_snapshot_task_index(snapshot))
 
             if task_state == expected_state:
                 return True
@@ -5689,8 +6540,20 @@ class GenericTest(unittest.TestCase):
             if task_state == test_constants.PLAN_TASKS_FAILED:
                 return False
 
-        #If the plan has stopped running before reaching expected state exit
-        return False
+            return None
+
+        state_reached = watcher.wait_for(is_task_state_reached,
+                                         timeout_mins * 60,
+                                         tasks_max_age_secs=0)
+
+        if state_reached is None:
+            self.get_current_plan_state(ms_node, True)
+            self.log("info",
+                     "Exiting wait_for_task_state method after " + \
+                         "{0} minutes (TIMEOUT)".format(timeout_mins))
+            return False
+
+        return state_reached
 
     # Group 9 - Networking related
 
@@ -5866,30 +6729,26 @@ class GenericTest(unittest.TestCase):
            available. If full_list arg given returns a list of all free ips.
         """
 
-        # get list of allowed ips by network name
-        allowed_ips = self.get_allowed_ips(ms_node, network_name)
+        net_info = self.get_network_props(ms_node, network_name)
 
-        if allowed_ips == None:
+        if net_info == None:
             return None
 
-        # get list of ips being used by managed nodes
+        # holds the allowed ips as an integer range, used ips are marked in
+        # a set rather than filtering a list of every ip in the subnet
+        allocator = IPAllocator(net_info['start'], net_info['end'])
+
+        # get the paths of all nodes, their interfaces, routes and vm
+        # interfaces then fetch the properties of all of them at once
         node_paths = self.find(ms_node, "/deployments", "node")
         node_paths.append("/ms")
-        node_ips = []
+        eth_paths = dict()
         for node_path in node_paths:
-            node_ips.extend(
-                self.get_node_net_from_tree(ms_node, node_path)['ips']
-            )
+            eth_paths[node_path] = self.find_children_of_collect(
+                ms_node, node_path, "network-interface")
 
-        # get gateway ips being used by managed nodes
         route_paths = self.find(ms_node, "/infrastructure", "route")
-        gw_ips = []
-        for route_path in route_paths:
-            gw_ips.append(
-                self.get_props_from_url(ms_node, route_path, "gateway")
-            )
 
-        vm_ips = []
         list_of_vm_interfaces = \
             self.find_children_of_collect(ms_node,
                                           "/deployments",
@@ -5902,47 +6761,101 @@ class GenericTest(unittest.TestCase):
                                               "vm-network-interface",
                                               find_all_collect=True))
 
+        all_paths = node_paths + route_paths + list_of_vm_interfaces
+        for paths in eth_paths.values():
+            all_paths.extend(paths)
+
+        all_props = self.get_props_bulk(ms_node, all_paths,
+                                        ["hostname", "ipaddress", "gateway",
+                                         "ipaddresses"])
+
+        # get list of ips being used by managed nodes, as returned by
+        # get_node_net_from_tree
+        node_ips = []
+        for node_path in node_paths:
+            if not (all_props[node_path] or dict()).get("hostname"):
+                continue
+
+            for eth_path in eth_paths[node_path]:
+                ipaddress = (all_props[eth_path] or dict()).get("ipaddress")
+                if ipaddress:
+                    node_ips.append(ipaddress)
+
+        # get gateway ips being used by managed nodes
+        gw_ips = []
+        for route_path in route_paths:
+            gw_ips.append((all_props[route_path] or dict()).get("gateway"))
+
+        vm_ips = []
         for vm_interface in list_of_vm_interfaces:
             ##this property can contain a , seperated list of ips
-            ip_list = self.get_props_from_url(ms_node, vm_interface,
-                                              "ipaddresses")
+            ip_list = (all_props[vm_interface] or dict()).get("ipaddresses")
             if not ip_list:
                 continue
             all_ips = ip_list.split(',')
             vm_ips.extend(all_ips)
 
-        used_ips = list()
-        used_ips.extend(node_ips)
-        used_ips.extend(gw_ips)
-        used_ips.extend(vm_ips)
-
-        # remove managed node IP addresses from list of IPs that we
-        # can use
-        valid_ips = [ip for ip in allowed_ips if ip not in used_ips]
+        allocator.mark_used(node_ips)
+        allocator.mark_used(gw_ips)
+        allocator.mark_used(vm_ips)
 
         #In some cases on physical even private ips may clash with other
         #systems. Test the first 3 ips are not pingable before returning data.
+        pingable_ips = self.__get_pingable_ips(ms_node, allocator.iter_free())
 
-        valid_ip_count = 0
-        for ip_addr in list(valid_ips):
-            if self.is_ip_pingable(ms_node, ip_addr):
-                valid_ips.remove(ip_addr)
-                continue
+        valid_ips = (ip_addr for ip_addr in allocator.iter_free()
+                     if ip_addr not in pingable_ips)
+
+        # give back all available ips
+        if full_list:
+            return list(valid_ips) or None
+
+        # give back first available ip or None if there are none
+        return next(valid_ips, None)
+
+    def __get_pingable_ips(self, ms_node, ips, required_count=3,
+                           batch_size=3):
+        """
+        Pings ips in order, several at a time, until the required number of
+        ips which cannot be pinged are found.
+
+        Args:
+            ms_node (str): The node to ping from.
+
+            ips (iterable): The ips to ping.
+
+        Kwargs:
+            required_count (int): The number of ips which cannot be pinged
+                to find before stopping.
+
+            batch_size (int): The number of ips pinged at the same time.
 
-            valid_ip_count += 1
+        Returns:
+            set. The ips which could be pinged.
+        """
+        pingable_ips = set()
+        unpingable_count = 0
+        ips = iter(ips)
 
-            if valid_ip_count > 2:
+        while unpingable_count < required_count:
+            batch = [ip_addr for _, ip_addr in zip(xrange(batch_size), ips)]
+            if not batch:
                 break
 
-        # make sure there are some free IP addresses
-        if len(valid_ips) < 1:
-            return None
+            ping_cmds = [self.net.get_ping_cmd(ip_addr) for ip_addr in batch]
+            results = self.run_commands(ms_node, ping_cmds,
+                                        add_to_cleanup=False,
+                                        concurrent=True)[ms_node]
 
-        # give back first available ip
-        if full_list:
-            return valid_ips
-        else:
-            return valid_ips[0]
+            for index, ip_addr in enumerate(batch):
+                self.assertEqual([], results[index]['stderr'])
+
+                if results[index]['rc'] == 0:
+                    pingable_ips.add(ip_addr)
+                else:
+                    unpingable_count += 1
+
+        return pingable_ips
 
     def find_ipv4_in_model(self, ms_node, ip_address):
         """
@@ -6409,18 +7322,20 @@ class GenericTest(unittest.TestCase):
         #3) Get the list of all mac addresses in this system
         eth_urls = self.find_children_of_collect(ms_node, node_url,
                                                  "network-interface")
+        eth_props = self.get_props_bulk(ms_node, eth_urls,
+                                        ["ipaddress", "device_name",
+                                         "macaddress"])
 
         for url in eth_urls:
-            ipaddress = self.get_props_from_url(ms_node, url, "ipaddress")
+            url_props = eth_props[url] or dict()
+
+            ipaddress = url_props.get("ipaddress")
             if ipaddress:
                 ips_in_tree.append(ipaddress)
 
-            interface = \
-                self.get_props_from_url(ms_node, url, "device_name")
-            macaddress = \
-                self.get_props_from_url(ms_node, url, "macaddress")
-            interface_mac_pairs_ls.append({"interface_name": interface,
-                                           "macaddress": macaddress})
+            interface_mac_pairs_ls.append(
+                {"interface_name": url_props.get("device_name"),
+                 "macaddress": url_props.get("macaddress")})
 
         #Add ips to return dict
         node_network_details[self.ips_key] = ips_in_tree
@@ -6836,47 +7751,17 @@ class GenericTest(unittest.TestCase):
 
         return stdout, stderr, returnc
 
-    def get_plan_data(self, node, logging=False):
-        """
-        Description:
-            Return data structure representing the plan layout and state
+    @staticmethod
+    def _parse_plan_json(plan_output):
+        """Converts the output of show_plan -j to the plan data structure
+        described in get_plan_data.
 
-            Data structure sample:
-            {'state': 'running',
-             'phases':
-                 '2':
-                    {'c1':
-                        [
-                           {'desc':'Install package "finger" on node "node1"',
-                            'url':'http://......',
-                            'state': 'Initial'},
-                           {'desc':'Install package "firefox" on node "node2"',
-                            'url':'http://......',
-                            'state': 'Initial'}
-                        ]
-                    }
-             }
         Args:
-            node (str): The node to get the plan from
-            logging (bool): If set to True plan data is logged
-        Return:
-            dict, The plan layout and state
-        """
-        plan_output_file = '/tmp/plan_output.json'
-        cmd = 'echo "$(/usr/bin/litp show_plan -j)" > {0}' \
-              .format(plan_output_file)
-        self.run_command(node,
-                         cmd,
-                         connection_timeout_secs=30,
-                         logging=True)
-
-        self.download_file_from_node(node,
-                                     plan_output_file,
-                                     plan_output_file)
-        plan_output = ''
-        with open(plan_output_file) as json_data:
-            plan_output = json.load(json_data)
+            plan_output (dict): The loaded JSON output of show_plan -j.
 
+        Returns:
+            dict. The plan layout and state.
+        """
         plan = {}
         plan['state'] = plan_output['properties']['state']
 
@@ -6911,6 +7796,52 @@ class GenericTest(unittest.TestCase):
                             phases[phase_id][cluster_id].append(task_data)
         plan['phases'] = phases
 
+        return plan
+
+    def get_plan_data(self, node, logging=False):
+        """
+        Description:
+            Return data structure representing the plan layout and state
+
+            Data structure sample:
+            {'state': 'running',
+             'phases':
+                 '2':
+                    {'c1':
+                        [
+                           {'desc':'Install package "finger" on node "node1"',
+                            'url':'http://......',
+                            'state': 'Initial'},
+                           {'desc':'Install package "firefox" on node "node2"',
+                            'url':'http://......',
+                            'state': 'Initial'}
+                        ]
+                    }
+             }
+        Args:
+            node (str): The node to get the plan from
+            logging (bool): If set to True plan data is logged
+        Return:
+            dict, The plan layout and state
+        """
+        # Read the plan straight off the channel rather than via a
+        # temporary file on the node which has to be downloaded
+        cmd = '/usr/bin/litp show_plan -j'
+        real_node = self.get_node_list_by_name([node])[0]
+        plan_stream = StringIO.StringIO()
+
+        self.g_util.log_now()
+        print "[{0}@{1}]# {2}".format(real_node.username,
+                                      real_node.ipv4, cmd)
+
+        stderr, exit_code = real_node.execute_stream(
+            cmd, plan_stream, connection_timeout_secs=30)
+
+        print '\n'.join(stderr)
+        print exit_code
+
+        plan = self._parse_plan_json(json.loads(plan_stream.getvalue()))
+
         if logging:
             for phase, clusters in sorted(plan['phases'].iteritems()):
                 self.log('info', '{0}'.format(phase))
@@ -7321,6 +8252,10 @@ class GenericTest(unittest.TestCase):
         Returns:
            bool. True if ping responds in time or False otherwise.
         """
+        if node is None:
+            return not self.wait_for_pings([ip_address], ping_success,
+                                           timeout_mins, retry_count)
+
         ping_cmd = self.net.get_ping_cmd(ip_address)
 
         counter = 0
@@ -7336,10 +8271,7 @@ class GenericTest(unittest.TestCase):
         retry = retry_count
 
         while True:
-            if node is None:
-                returnc = self.run_command_local(ping_cmd)[2]
-            else:
-                returnc = self.run_command(node, ping_cmd)[2]
+            returnc = self.run_command(node, ping_cmd)[2]
 
             if ping_success and returnc == 0:
                 return True
@@ -7368,34 +8300,110 @@ class GenericTest(unittest.TestCase):
                 self.log('info', "Exiting wait_for_ping due to timeout")
                 return False
 
-    def wait_for_node_up(self, node, timeout_mins=10, wait_for_litp=False):
+    def wait_for_pings(self, ip_addresses, ping_success=True,
+                       timeout_mins=15, retry_count=3):
         """
-        Waits until the node in question is responding to pings and
-        can be accessed via ssh.
+        Pings all ip addresses at the same time from the machine running
+        the test until all of them respond, or all of them stop responding,
+        depending on the flag set.
 
         Args:
+           ip_addresses (list): Ip addresses to ping.
 
-          node (str): The node in question which you wish to wait for.
+        KWargs:
+           ping_success (bool): By default waits until all pings succeed. If
+           set to False waits until all pings fail.
+
+           timeout_mins (int): Time to wait for all ips.
+
+           retry_count (int): The number of failed pings in a row before
+                              it's known that a ping fails.
+
+        Returns:
+           dict. Each ip which did not behave as expected before the timeout
+           mapped to the reason, empty if all did.
+        """
+        prober = LivenessProber(interval_secs=5)
+        confirm_count = 1 if ping_success else retry_count
+
+        stragglers = prober.wait_for(
+            dict((ip_address, ip_address) for ip_address in ip_addresses),
+            up=ping_success, timeout_secs=60 * timeout_mins,
+            confirm_count=confirm_count)
+
+        if stragglers:
+            self.log('info', "Exiting wait_for_pings due to timeout: {0}"
+                     .format(stragglers))
+
+        return stragglers
+
+    def wait_for_nodes_up(self, nodes, timeout_mins=10, wait_for_litp=False,
+                          checks=('icmp', 'ssh')):
+        """
+        Waits until all nodes in question are responding to pings and can be
+        accessed via ssh. All nodes are probed at the same time so the wait
+        takes as long as the slowest node.
+
+        Args:
+
+          nodes (list): The nodes in question which you wish to wait for.
 
         Kwargs:
 
-          timeout_mins (int): How long to wait for the node to come up.
+          timeout_mins (int): How long to wait for the nodes to come up.
 
           wait_for_litp (bool): Defaults to False. If set to True will
           wait until the LITP version command returns a 0 exit code
           indicating the LITP service is running.
 
+          checks (list): The LivenessProber checks run against all nodes at
+          the same time. Add 'litpd' to also wait for the LITP REST port
+          to accept connections.
+
         Returns:
-           bool. True if node comes up within timeout or False otherwise.
+           dict. Each node which did not come up within the timeout mapped
+           to the reason, empty if all nodes came up.
         """
-        node_ip = self.get_node_att(node, 'ipv4')
+        end_time = time.time() + 60 * timeout_mins
 
-        if not self.wait_for_ping(node_ip, timeout_mins=timeout_mins):
-            return False
+        prober = LivenessProber(interval_secs=5)
+        stragglers = prober.wait_for(
+            dict((node, self.get_node_att(node, 'ipv4')) for node in nodes),
+            checks=checks, timeout_secs=60 * timeout_mins)
+
+        for node in nodes:
+            if node in stragglers:
+                continue
 
+            if not self.__wait_for_ssh_login(node, end_time):
+                stragglers[node] = "ssh login"
+                continue
+
+            if wait_for_litp:
+                show_cmd = self.cli.get_show_cmd("/litp/maintenance")
+                if not self.wait_for_cmd(node, show_cmd, 0, timeout_mins=5):
+                    stragglers[node] = "litp"
+
+        if stragglers:
+            self.log('info', "Nodes not up before timeout: {0}"
+                     .format(stragglers))
+
+        return stragglers
+
+    def __wait_for_ssh_login(self, node, end_time):
+        """
+        Waits until a command can be run on the node over ssh.
+
+        Args:
+
+          node (str): The node to log in to.
+
+          end_time (float): Epoch time at which to give up.
+
+        Returns:
+           bool. True if ssh login succeeded or False otherwise.
+        """
         increment_secs = 10
-        count = 0
-        timeout_secs = 60 * timeout_mins
 
         while True:
             try:
@@ -7403,29 +8411,41 @@ class GenericTest(unittest.TestCase):
                 self.disconnect_all_nodes()
                 self.run_command(node, "hostname")
                 self.log('info', "SSH connection is successful")
-                break
+                return True
 
             except Exception as except_err:
                 if 'Authentication' in except_err:
                     self.log('info', "Node is now up")
-                    break
+                    return True
 
                 self.log('info', "SSH not yet avalable: {0}"\
                              .format(except_err))
                 time.sleep(increment_secs)
-                count += increment_secs
 
-                if count > timeout_secs:
+                if time.time() > end_time:
                     return False
 
-        if wait_for_litp:
-            show_cmd = self.cli.get_show_cmd("/litp/maintenance")
-            return self.wait_for_cmd(node,
-                                    show_cmd,
-                                    0,
-                                    timeout_mins=5)
+    def wait_for_node_up(self, node, timeout_mins=10, wait_for_litp=False):
+        """
+        Waits until the node in question is responding to pings and
+        can be accessed via ssh.
 
-        return True
+        Args:
+
+          node (str): The node in question which you wish to wait for.
+
+        Kwargs:
+
+          timeout_mins (int): How long to wait for the node to come up.
+
+          wait_for_litp (bool): Defaults to False. If set to True will
+          wait until the LITP version command returns a 0 exit code
+          indicating the LITP service is running.
+
+        Returns:
+           bool. True if node comes up within timeout or False otherwise.
+        """
+        return not self.wait_for_nodes_up([node], timeout_mins, wait_for_litp)
 
     def get_node_ilo_ip(self, ms_node, peer_node):
         """
@@ -7530,6 +8550,45 @@ class GenericTest(unittest.TestCase):
         finally:
             redfish_obj.logout()
 
+    def poweron_peer_nodes(self, ms_node, peer_nodes, wait_poweron=True,
+                           poweron_timeout_mins=10, ilo_ips=None):
+        """
+        Will perform a hard poweron of several peer nodes and wait for all
+        of them to come up at the same time.
+
+        Args:
+           ms_node (str): The ms node.
+
+           peer_nodes (list): The peer nodes you wish to poweron.
+
+        KWargs:
+          wait_poweron (bool): By default waits until all nodes have powered
+          back on and can be reached via ssh.
+
+          poweron_timeout_mins (int): Length of time to wait for all nodes
+                                      to power on before throwing assertion
+                                      error.
+
+          ilo_ips (dict): Peer node mapped to the IP of its ILo, needed for
+                          hardware poweron on Hardware
+
+        Raises:
+          AssertionError. If a poweron command returns an error or a node
+          has not come up before the timeout.
+        """
+        ilo_ips = ilo_ips or dict()
+
+        for peer_node in peer_nodes:
+            self.poweron_peer_node(ms_node, peer_node, wait_poweron=False,
+                                   ilo_ip=ilo_ips.get(peer_node))
+
+        if wait_poweron:
+            stragglers = self.wait_for_nodes_up(peer_nodes,
+                                                poweron_timeout_mins)
+            self.assertEqual({}, stragglers,
+                             "Nodes have not come up before timeout: {0}"
+                             .format(stragglers))
+
     @staticmethod
     def get_redfish_client(node_ip, ilo_ip=None):
         """
@@ -8056,11 +9115,16 @@ class GenericTest(unittest.TestCase):
             list, list, int. std_out, std_err, rc from running
             stop_plan command.
         """
-        # build and run show command
-        show_cmd = self.cli.get_show_cmd(url, args)
-        stdout, stderr, returnc = self.run_command(
-            node, show_cmd, username, password,
-        )
+        # build and run show command, shows expected to succeed may be
+        # read from the show cache
+        if expect_positive:
+            stdout, stderr, returnc = self.__run_show_cmd(
+                node, url, args, username, password)
+        else:
+            show_cmd = self.cli.get_show_cmd(url, args)
+            stdout, stderr, returnc = self.run_command(
+                node, show_cmd, username, password,
+            )
 
         # assert expected values
         if expect_positive:
@@ -8377,11 +9441,16 @@ class GenericTest(unittest.TestCase):
         Returns:
         str. The state of the item.
         """
-        filter_state_cmd = self.cli.get_path_state_cmd(url)
+        show_out, stderr, _ = self.__run_show_cmd(node, url, use_cache=False)
 
-        ##Ignore rc as we are piping commands so rc of not 0 may not be a
-        #failure
-        stdout, stderr, _ = self.run_command(node, filter_state_cmd)
+        # Same as get_path_state_cmd, the state within 3 lines of the path
+        stdout = list()
+        for index, line in enumerate(show_out):
+            if url in line:
+                stdout = [item_line.strip()[len("state:"):]
+                          for item_line in show_out[index:index + 4]
+                          if item_line.strip().startswith("state:")]
+                break
 
         self.assertEqual([], stderr)
         self.assertNotEqual([], stdout)
@@ -8412,9 +9481,13 @@ class GenericTest(unittest.TestCase):
            str. The value requested.
         """
         value = None
-        cmd = self.cli.get_show_data_value_cmd(url, filter_value)
+        show_out, stderr, returnc = self.__run_show_cmd(
+            node, url, use_cache=filter_value != "state")
 
-        stdout, stderr, returnc = self.run_command(node, cmd)
+        # Same as get_show_data_value_cmd
+        prefix = "{0}:".format(filter_value)
+        stdout = [line.strip()[len(prefix):] for line in show_out
+                  if line.strip().startswith(prefix)]
 
         if assert_value:
             if expect_positive:
@@ -8668,11 +9741,23 @@ class GenericTest(unittest.TestCase):
            property is set then all properties are returned as a dict.
         """
 
-        show_prop_cmds = self.cli.get_show_cmd(url)
+        # Plans and item states change while a plan runs, they are always
+        # read from the MS
+        mirror = self.get_model_mirror(node)
+        if mirror and mirror.answers_props(
+                url, [filter_prop] if filter_prop else None):
+            props = mirror.get_props(url, inherit_symbol=show_option != "-j")
+
+            if props is None or not filter_prop:
+                return props
+
+            if filter_prop not in props:
+                return None
+
+            return props[filter_prop]
 
-        # stdout, _, _ = self.run_command(node, show_prop_cmds)
         ##Logging the JSON can flood the test output
-        stdout, _, _ = self.run_expects_command(node, show_prop_cmds, [])
+        stdout, _, _ = self.__run_show_cmd(node, url, logging=False)
 
         if stdout == [] \
                 or not self.is_text_in_list('properties', stdout):
@@ -8680,13 +9765,91 @@ class GenericTest(unittest.TestCase):
 
         ###IF JSON OUTPUT
         if show_option == "-j":
-            show_prop_cmds_json = self.cli.get_show_cmd(url, show_option)
-            stdout, _, _ = self.run_command(node, show_prop_cmds_json,
-                                            logging=log_output)
+            stdout, _, _ = self.__run_show_cmd(node, url, show_option,
+                                               logging=log_output)
             return self.__parse_json_props(stdout, filter_prop)
         else:
             return self.__parse_std_props(stdout, filter_prop)
 
+    def get_props_bulk(self, ms_node, urls, props=None):
+        """Returns the properties of many items with at most one command
+        run on the MS. Items are read from the model mirror or the show
+        cache where possible, the rest are shown by a single script.
+
+        Args:
+           ms_node (str): The MS with the model.
+
+           urls (list): The litp paths to get the properties of.
+
+        Kwargs:
+           props (list): If set, only these properties are returned for
+           each path, set to None if the item does not have them.
+
+        Returns:
+           dict. Each url mapped to a dict of its properties as returned by
+           get_props_from_url, or None if the item cannot be found or has
+           no properties.
+        """
+        all_props = dict()
+        real_node = self.get_node_list_by_name([ms_node])[0]
+        show_cache = self.__get_checked_show_cache(ms_node, real_node)
+        mirror = self.get_model_mirror(ms_node)
+
+        urls_to_show = list()
+        for url in set(urls):
+            if mirror and mirror.answers_props(url, props):
+                all_props[url] = mirror.get_props(url)
+                continue
+
+            stdout = show_cache.get(url, "-j", real_node.username)
+            if stdout is None:
+                urls_to_show.append(url)
+            else:
+                all_props[url] = self.__get_json_props(stdout)
+
+        if urls_to_show:
+            bulk_cmd = self.cli.get_bulk_show_cmd(urls_to_show, "-j")
+            stdout, _, _ = self.run_command(ms_node, bulk_cmd, logging=False)
+            shows = self.cli.get_bulk_show_output(stdout)
+
+            for url in urls_to_show:
+                all_props[url] = None
+
+                if url not in shows or shows[url][1] != 0:
+                    continue
+
+                show_cache.put(url, "-j", shows[url][0], real_node.username)
+                all_props[url] = self.__get_json_props(shows[url][0])
+
+        if props:
+            for url, url_props in all_props.items():
+                if url_props is not None:
+                    all_props[url] = dict((prop, url_props.get(prop))
+                                          for prop in props)
+
+        return all_props
+
+    def __get_json_props(self, stdout):
+        """
+        Returns the properties in the output of a litp show -j.
+
+        Args:
+           stdout (list): Stdout from the show command ran.
+
+        Returns:
+           dict. The properties or None if there are none or the output
+           cannot be loaded.
+        """
+        try:
+            processed_props = self.cli.get_properties(stdout)
+        except (ValueError, AttributeError):
+            return None
+
+        if processed_props is None:
+            return None
+
+        return self.g_util.remove_unicode_from_dict(processed_props)
+
     def restart_litpd_service(self, ms_node, debug_on=True):
         """
         Restarts the litpd service on the selected node.
@@ -12959,25 +14122,56 @@ class GenericTest(unittest.TestCase):
             group_timeout_mins (int): Time to wait for groups on the
                 rebooted system to start. Default is 2 minutes.
         """
-        self.log('info', 'Powering off {0}...'.format(reboot_system))
-        self.poweroff_peer_node(ms_node, reboot_system)
+        self.vcs_reboot_and_wait_for_systems(
+            ms_node, active_system, [reboot_system],
+            system_timeout_mins, group_timeout_mins)
+
+    def vcs_reboot_and_wait_for_systems(
+            self, ms_node, active_system, reboot_systems,
+            system_timeout_mins=5, group_timeout_mins=2):
+        """
+        Reboot several systems together and wait for them to rejoin the VCS
+        cluster. Also waits for all group instances to start on the systems.
+        The systems boot at the same time so the wait takes as long as the
+        slowest system.
+
+        Args:
+            ms_node (str): The MS node.
+            active_system (str): Active VCS system in the cluster to use
+                to check for system states.
+            reboot_systems (list): Systems to reboot and wait for
+                SysState=Running and any groups on them to start.
+        Kwargs:
+            system_timeout_mins (int): Time to wait for the rebooted systems
+                to get into state Running. Default is 5 minutes.
+            group_timeout_mins (int): Time to wait for groups on the
+                rebooted systems to start. Default is 2 minutes.
+        """
+        for reboot_system in reboot_systems:
+            self.log('info', 'Powering off {0}...'.format(reboot_system))
+            self.poweroff_peer_node(ms_node, reboot_system)
 
         self.log('info', '{0} powered off successfully. Attempting to '
-                         'power it back on...'.format(reboot_system))
-        self.poweron_peer_node(ms_node, reboot_system)
+                         'power them back on...'.format(reboot_systems))
+        self.poweron_peer_nodes(ms_node, reboot_systems)
 
         self.log('info', '{0} powered on successfully. Waiting for VCS and '
-                         'groups to start...'.format(reboot_system))
-        timeout_seconds = system_timeout_mins * 60
+                         'groups to start...'.format(reboot_systems))
+        end_time = time.time() + system_timeout_mins * 60
+
+        # The systems are already booting so each wait only lasts until
+        # the slowest of them is running
+        for reboot_system in reboot_systems:
+            timeout_seconds = max(1, int(end_time - time.time()))
 
-        wait_cmd = self.vcs.get_hasys_cmd(
-            '-wait {0} SysState Running -time {1}'.format(
-                reboot_system, timeout_seconds))
+            wait_cmd = self.vcs.get_hasys_cmd(
+                '-wait {0} SysState Running -time {1}'.format(
+                    reboot_system, timeout_seconds))
 
-        self.run_command(active_system, wait_cmd,
-                         su_root=True, default_asserts=True)
+            self.run_command(active_system, wait_cmd,
+                             su_root=True, default_asserts=True)
 
-        self.log('info', 'VCS system started, waiting for groups...')
+        self.log('info', 'VCS systems started, waiting for groups...')
         self.wait_for_all_starting_vcs_groups(active_system,
                                               group_timeout_mins)
         self.log("info", "Groups started successfully.")
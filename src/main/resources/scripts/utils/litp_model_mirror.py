@@ -0,0 +1,580 @@
+"""
+LITP Model Mirror
+
+Local copy of the LITP model on an MS, loaded with a single recursive
+show and indexed so find and property lookups do not run commands on the
+MS. Parts of the model which change are reloaded by subtree.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import threading
+import time
+from os import environ
+
+
+class LitpModelMirror(object):
+    """In-memory copy of the LITP model indexed by path, item type, parent
+    and property value.
+
+    The mirror is loaded on first use and must be invalidated whenever the
+    model may have changed. Invalidated subtrees, and the items inheriting
+    from them, are reloaded on the next query. As a plan may be started in
+    ways which are not seen, the whole model is also reloaded once it is
+    older than ttl_secs.
+
+    Plans, and the state of items, change while a plan runs so they are
+    never answered from the mirror and must be read from the MS.
+    """
+
+    # Suffix shown by litp show on inherited property values
+    INHERIT_SYMBOL = " [*]"
+
+    # Subtree which is not mirrored
+    LIVE_PATH = "/plans"
+
+    # Item types only found under LIVE_PATH
+    PLAN_ITEM_TYPES = ["plan", "phase", "task"]
+
+    # Properties which are not answered from the mirror
+    LIVE_PROPERTIES = ["state"]
+
+    def __init__(self, fetch_show_output, ttl_secs=60):
+        """Initialise the mirror.
+
+        Args:
+            fetch_show_output (function): Called with a path to fetch that
+                part of the model. Returns the stdout lines of a recursive
+                litp show of the path, with their indentation, or None if
+                the show failed.
+
+        Kwargs:
+            ttl_secs (int): Age in seconds at which the whole model is
+                reloaded.
+        """
+        self.fetch_show_output = fetch_show_output
+        self.ttl_secs = ttl_secs
+        # Time the whole model was last loaded
+        self.__load_time = 0
+        # Number of times the model has been loaded and queries answered
+        self.loads = 0
+        self.queries = 0
+        # Incremented by every invalidation
+        self.__generation = 0
+        # Subtree path to be reloaded -> generation of its last invalidation
+        self.__dirty = {"/": 0}
+        # Paths in the order shown by litp show -r
+        self.__paths = list()
+        # path -> {'type', 'state', 'inherited from', 'properties'}
+        self.__items = dict()
+        # item type -> list of paths
+        self.__by_type = dict()
+        # parent path -> list of child paths
+        self.__by_parent = dict()
+        # (property name, value) -> list of paths
+        self.__by_property = dict()
+        self.__lock = threading.Lock()
+
+    def invalidate(self, path="/"):
+        """
+        Marks part of the model to be reloaded on the next query.
+
+        Kwargs:
+            path (str): The path of the changed item. Its subtree and every
+                item inheriting from the subtree are reloaded. Defaults to
+                the whole model.
+        """
+        path = path.rstrip("/") or "/"
+
+        with self.__lock:
+            self.__generation += 1
+
+            changed = [path]
+            done = set()
+
+            while changed:
+                changed_path = changed.pop()
+                if changed_path in done:
+                    continue
+                done.add(changed_path)
+
+                self.__dirty[changed_path] = self.__generation
+
+                # Items inheriting from the changed subtree change with it
+                for item_path, item in self.__items.iteritems():
+                    source = item['inherited from']
+                    if source and self.is_under(source, changed_path):
+                        changed.append(item_path)
+
+    @staticmethod
+    def parse(show_output):
+        """
+        Parses the output of a recursive litp show.
+
+        Args:
+            show_output (list): The stdout lines of litp show -r with their
+                indentation.
+
+        Returns:
+            list, dict. The paths in the order shown and the items by path.
+        """
+        paths = list()
+        items = dict()
+        item = None
+        in_properties = False
+
+        for line in show_output:
+            line = line.rstrip()
+            if not line.strip():
+                continue
+
+            if line.startswith("/"):
+                path = line.strip()
+                item = None
+                if LitpModelMirror.is_under(path, LitpModelMirror.LIVE_PATH):
+                    continue
+
+                item = {'type': None, 'state': None, 'inherited from': None,
+                        'properties': None}
+                items[path] = item
+                paths.append(path)
+                in_properties = False
+                continue
+
+            if item is None or ":" not in line:
+                continue
+
+            name, value = line.split(":", 1)
+            indent = len(name) - len(name.lstrip())
+            name = name.strip()
+            value = value[1:]
+
+            # Attributes of the item are indented by 4 and properties by 8
+            if indent <= 4:
+                in_properties = name == "properties"
+                if in_properties:
+                    item['properties'] = dict()
+                elif name in item:
+                    item[name] = value.strip()
+            elif in_properties:
+                item['properties'][name] = value
+
+        return paths, items
+
+    def load(self, show_output, path="/"):
+        """
+        Replaces a subtree of the mirror with the parsed output of a
+        recursive litp show.
+
+        Args:
+            show_output (list): The stdout lines of litp show -r of the path
+                with their indentation.
+
+        Kwargs:
+            path (str): The shown path. Defaults to the whole model.
+        """
+        with self.__lock:
+            self.__load(path, *self.parse(show_output))
+            if (path.rstrip("/") or "/") == "/":
+                self.__load_time = time.time()
+            self.__index()
+            self.loads += 1
+
+    def __load(self, path, paths, items):
+        """
+        Replaces the subtree under a path. Must be called holding the lock.
+
+        Args:
+            path (str): The shown path.
+
+            paths (list): The shown paths in order.
+
+            items (dict): The shown items by path.
+        """
+        path = path.rstrip("/") or "/"
+        old_paths = [item_path for item_path in self.__paths
+                     if self.is_under(item_path, path)]
+
+        for item_path in old_paths:
+            del self.__items[item_path]
+
+        if old_paths:
+            position = self.__paths.index(old_paths[0])
+        else:
+            # New item, shown after the last item under its parent
+            parent = self.get_parent_path(path) or "/"
+            position = len(self.__paths)
+            for index, item_path in enumerate(self.__paths):
+                if self.is_under(item_path, parent):
+                    position = index + 1
+
+        # The subtree is shown in one run so its position is unchanged
+        self.__paths = [item_path for item_path in self.__paths
+                        if not self.is_under(item_path, path)]
+        self.__paths[position:position] = paths
+        self.__items.update(items)
+
+    def __index(self):
+        """
+        Rebuilds the indexes from the items. Must be called holding the lock.
+        """
+        self.__by_type = dict()
+        self.__by_parent = dict()
+        self.__by_property = dict()
+
+        for path in self.__paths:
+            item = self.__items[path]
+            self.__by_type.setdefault(item['type'], list()).append(path)
+            self.__by_parent.setdefault(self.get_parent_path(path),
+                                        list()).append(path)
+            for name, value in (item['properties'] or dict()).iteritems():
+                key = (name, self.excl_inherit_symbol(value))
+                self.__by_property.setdefault(key, list()).append(path)
+
+    def refresh(self):
+        """
+        Reloads every invalidated part of the model.
+
+        Invalidations made while the model is being fetched are kept, by
+        generation, so the parts they cover are fetched again on the next
+        query.
+
+        Returns:
+            bool. True if the model is loaded or False if it could not be
+                fetched.
+        """
+        with self.__lock:
+            self.queries += 1
+
+            if time.time() - self.__load_time >= self.ttl_secs:
+                self.__generation += 1
+                self.__dirty["/"] = self.__generation
+
+            if not self.__dirty:
+                return True
+
+            generation = self.__generation
+            dirty_paths = sorted(self.__dirty)
+
+        # Nested invalidated subtrees are reloaded with the outermost one
+        paths = list()
+        for path in dirty_paths:
+            if not [parent for parent in paths
+                    if self.is_under(path, parent)]:
+                paths.append(path)
+
+        shown = list()
+        for path in paths:
+            show_output = self.fetch_show_output(path)
+
+            if show_output is None:
+                # The item may have been removed, reload the whole model
+                shown = None
+                break
+
+            shown.append((path, self.parse(show_output)))
+
+        if shown is None:
+            show_output = self.fetch_show_output("/")
+            if show_output is None:
+                return False
+
+            shown = [("/", self.parse(show_output))]
+
+        with self.__lock:
+            for path, (item_paths, items) in shown:
+                self.__load(path, item_paths, items)
+                if path == "/":
+                    self.__load_time = time.time()
+            self.__index()
+            self.loads += 1
+
+            for path, path_generation in self.__dirty.items():
+                if path_generation <= generation:
+                    del self.__dirty[path]
+
+        return True
+
+    @staticmethod
+    def get_parent_path(path):
+        """
+        Returns the parent of a path.
+
+        Args:
+            path (str): A LITP path.
+
+        Returns:
+            str. The parent path or None for the root path.
+        """
+        if path == "/":
+            return None
+
+        return path.rsplit("/", 1)[0] or "/"
+
+    @classmethod
+    def excl_inherit_symbol(cls, value):
+        """
+        Removes the symbol shown on inherited property values.
+
+        Args:
+            value (str): A property value from litp show.
+
+        Returns:
+            str. The value as shown by litp show -j.
+        """
+        return value.replace(cls.INHERIT_SYMBOL, "")
+
+    @staticmethod
+    def is_under(path, parent):
+        """
+        Checks if a path is a parent path or under it.
+
+        Args:
+            path (str): The path to check.
+
+            parent (str): The parent path.
+
+        Returns:
+            bool. True if path is parent or one of its descendants.
+        """
+        parent = parent.rstrip("/")
+
+        return path == parent or path.startswith(parent + "/") or \
+            not parent
+
+    def covers(self, path, resource=None):
+        """
+        Checks if a query can be answered from the mirror.
+
+        Args:
+            path (str): The path queried.
+
+        Kwargs:
+            resource (str): The item type searched for, if any.
+
+        Returns:
+            bool. False for paths under LIVE_PATH and plan item types,
+                which must be read from the MS.
+        """
+        return not self.is_under(path, self.LIVE_PATH) and \
+            resource not in self.PLAN_ITEM_TYPES
+
+    def answers_props(self, path, props=None):
+        """
+        Checks if properties of an item can be answered from the mirror.
+
+        Args:
+            path (str): The path of the item.
+
+        Kwargs:
+            props (list): The property names wanted, or None for all the
+                properties of the item.
+
+        Returns:
+            bool. False if the path is not covered or any of the properties
+                is one of LIVE_PROPERTIES, which must be read from the MS.
+        """
+        if not self.covers(path):
+            return False
+
+        if props is None:
+            props = (self.get_props(path) or dict()).keys()
+
+        return not [prop for prop in props if prop in self.LIVE_PROPERTIES]
+
+    def get_item(self, path):
+        """
+        Returns an item in the model.
+
+        Args:
+            path (str): The path of the item.
+
+        Returns:
+            dict. The type, state, inherited from path and properties of the
+                item or None if it is not in the model.
+        """
+        return self.__items.get(path.rstrip("/") or "/")
+
+    def get_paths(self, path="/"):
+        """
+        Returns all paths under a path.
+
+        Kwargs:
+            path (str): The path to search under, including itself.
+
+        Returns:
+            list. The paths in the order shown by litp show -r.
+        """
+        return [item_path for item_path in self.__paths
+                if self.is_under(item_path, path)]
+
+    def get_paths_by_type(self, item_types, path="/"):
+        """
+        Returns the paths of items of any of the given types.
+
+        Args:
+            item_types (list): The item types to match.
+
+        Kwargs:
+            path (str): The path to search under, including itself.
+
+        Returns:
+            list. The paths in the order shown by litp show -r.
+        """
+        matches = set()
+        for item_type in item_types:
+            matches.update(self.__by_type.get(item_type, list()))
+
+        return [item_path for item_path in self.__paths
+                if item_path in matches and self.is_under(item_path, path)]
+
+    def get_children(self, path):
+        """
+        Returns the immediate children of a path.
+
+        Args:
+            path (str): The parent path.
+
+        Returns:
+            list. The child paths.
+        """
+        return list(self.__by_parent.get(path.rstrip("/") or "/", list()))
+
+    def find_by_property(self, name, value, path="/"):
+        """
+        Returns the paths of items with a property set to a value.
+
+        Args:
+            name (str): The property name.
+
+            value (str): The property value, inherited or not.
+
+        Kwargs:
+            path (str): The path to search under, including itself.
+
+        Returns:
+            list. The matching paths.
+        """
+        return [item_path for item_path
+                in self.__by_property.get((name, value), list())
+                if self.is_under(item_path, path)]
+
+    def get_props(self, path, inherit_symbol=False):
+        """
+        Returns the properties of an item.
+
+        Args:
+            path (str): The path of the item.
+
+        Kwargs:
+            inherit_symbol (bool): If set, inherited values keep the [*]
+                symbol as in litp show, otherwise values are as shown by
+                litp show -j.
+
+        Returns:
+            dict. The item properties or None if the item is not in the
+                model or has no properties.
+        """
+        item = self.get_item(path)
+
+        if not item or item['properties'] is None:
+            return None
+
+        if inherit_symbol:
+            return dict(item['properties'])
+
+        return dict((name, self.excl_inherit_symbol(value))
+                    for name, value in item['properties'].iteritems())
+
+    def find(self, path, resource, rtn_type_children=True,
+             exact_match=False, find_refs=False):
+        """
+        Returns the paths matched by GenericTest.find.
+
+        Args:
+            path (str): The path to search under, including itself.
+
+            resource (str): The resource type to filter by.
+
+        Kwargs:
+            rtn_type_children (bool): Default returns items of the type and
+                references to it. Set to False to return collections.
+
+            exact_match (bool): If set, returns only items of exactly the
+                resource type.
+
+            find_refs (bool): If set, also returns ref collections.
+
+        Returns:
+            list. The matching paths.
+        """
+        if exact_match or (rtn_type_children and resource == "node"):
+            return self.get_paths_by_type([resource], path)
+
+        if rtn_type_children:
+            return self.get_paths_by_type(
+                [resource, "reference-to-{0}".format(resource)], path)
+
+        collection_types = ["collection-of-{0}".format(resource)]
+        if resource != "node":
+            collection_types.append("collection-of-{0}-base"
+                                    .format(resource))
+
+        paths = self.get_paths_by_type(collection_types, path)
+
+        if resource != "node" and (find_refs or not paths):
+            paths = self.get_paths_by_type(
+                collection_types +
+                ["ref-{0}".format(item_type)
+                 for item_type in collection_types], path)
+
+        return paths
+
+
+MODEL_MIRRORS = dict()
+MODEL_MIRRORS_LOCK = threading.Lock()
+MODEL_MIRROR_ENABLED = environ.get("LITP_MODEL_MIRROR", "true") == "true"
+
+
+def get_model_mirror(key, fetch_show_output):
+    """
+    Returns the mirror of the model on an MS, creating it if needed.
+
+    Args:
+        key (str): Identifies the MS, e.g. '10.10.10.100'.
+
+        fetch_show_output (function): See LitpModelMirror. Only used if the
+            mirror is created, so it must only depend on the connection to
+            the MS and not on the caller.
+
+    Returns:
+        LitpModelMirror. The mirror or None if mirroring is disabled.
+    """
+    if not MODEL_MIRROR_ENABLED:
+        return None
+
+    with MODEL_MIRRORS_LOCK:
+        if key not in MODEL_MIRRORS:
+            MODEL_MIRRORS[key] = LitpModelMirror(
+                fetch_show_output,
+                int(environ.get("LITP_MODEL_MIRROR_TTL", "60")))
+
+        return MODEL_MIRRORS[key]
+
+
+def invalidate_model_mirror(key, path="/"):
+    """
+    Invalidates part of the mirror of the model on an MS, if there is one.
+
+    Args:
+        key (str): Identifies the MS, e.g. '10.10.10.100'.
+
+    Kwargs:
+        path (str): The path of the changed item. Defaults to the whole
+            model.
+    """
+    with MODEL_MIRRORS_LOCK:
+        mirror = MODEL_MIRRORS.get(key)
+
+    if mirror:
+        mirror.invalidate(path)
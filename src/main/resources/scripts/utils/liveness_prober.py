@@ -0,0 +1,179 @@
+"""
+Liveness Prober
+
+Waits for many nodes at once to come up or go down, probing every node
+concurrently from the machine running the test.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import socket
+import threading
+import time
+from litp_generic_utils import GenericUtils
+from networking_utils import NetworkingUtils
+
+
+class LivenessProber(object):
+    """Probes a set of targets concurrently until all of them reach the
+    requested state or a timeout expires.
+
+    A target is up when all of its checks pass and down when any of them
+    fails. The available checks are 'icmp' (a ping), 'ssh' (a TCP connect
+    to port 22) and 'litpd' (a TCP connect to the LITP REST port).
+    """
+
+    PORTS = {'ssh': 22, 'litpd': 9999}
+
+    def __init__(self, interval_secs=5, connect_timeout_secs=5):
+        """Initialise the prober.
+
+        Kwargs:
+            interval_secs (int): Time between probes of a target which has
+                not reached the requested state.
+
+            connect_timeout_secs (int): Timeout of each TCP connect.
+        """
+        self.g_util = GenericUtils()
+        self.net = NetworkingUtils()
+        self.interval_secs = interval_secs
+        self.connect_timeout_secs = connect_timeout_secs
+
+    def probe_icmp(self, ip_address):
+        """
+        Pings an address once.
+
+        Args:
+            ip_address (str): The address to ping.
+
+        Returns:
+            bool. True if the ping was answered.
+        """
+        if ":" in ip_address:
+            ping_cmd = self.net.get_ping6_cmd(ip_address.split("/")[0])
+        else:
+            ping_cmd = self.net.get_ping_cmd(ip_address)
+
+        return self.g_util.run_command_local(ping_cmd, log=False)[2] == 0
+
+    def probe_tcp(self, ip_address, port):
+        """
+        Opens and closes a TCP connection.
+
+        Args:
+            ip_address (str): The address to connect to.
+
+            port (int): The port to connect to.
+
+        Returns:
+            bool. True if the connection was accepted.
+        """
+        try:
+            conn = socket.create_connection((ip_address.split("/")[0], port),
+                                            self.connect_timeout_secs)
+        except (socket.error, socket.timeout):
+            return False
+
+        conn.close()
+
+        return True
+
+    def probe(self, ip_address, checks):
+        """
+        Runs checks against an address in order, stopping at the first
+        failure.
+
+        Args:
+            ip_address (str): The address to probe.
+
+            checks (list): Names of the checks to run.
+
+        Returns:
+            str. The name of the first check which failed or None if all
+                passed.
+        """
+        for check in checks:
+            if check == 'icmp':
+                passed = self.probe_icmp(ip_address)
+            else:
+                passed = self.probe_tcp(ip_address, self.PORTS[check])
+
+            if not passed:
+                return check
+
+        return None
+
+    def wait_for(self, targets, up=True, checks=('icmp',), timeout_secs=600,
+                 confirm_count=1):
+        """
+        Waits until every target is up, or down.
+
+        Args:
+            targets (dict): Target name mapped to its IP address.
+
+        Kwargs:
+            up (bool): Set to False to wait for the targets to go down.
+
+            checks (list): Names of the checks which decide if a target is
+                up.
+
+            timeout_secs (int): Time to wait before giving up.
+
+            confirm_count (int): Number of probes in a row which must find a
+                target in the requested state. Probes lost while a node goes
+                down make a single failed probe unreliable.
+
+        Returns:
+            dict. Each target which did not reach the requested state mapped
+                to the check which last failed, or passed when waiting for
+                the target to go down. Empty if all targets reached it.
+        """
+        end_time = time.time() + timeout_secs
+        # target -> number of probes in a row in the requested state
+        confirmed = dict((name, 0) for name in targets)
+        last_result = dict((name, checks[0]) for name in targets)
+        lock = threading.Lock()
+
+        def probe_target(name):
+            """Probes one target and records the result"""
+            failed_check = self.probe(targets[name], checks)
+
+            with lock:
+                last_result[name] = failed_check
+                if (failed_check is None) == up:
+                    confirmed[name] += 1
+                else:
+                    confirmed[name] = 0
+
+        while True:
+            pending = [name for name in targets
+                       if confirmed[name] < confirm_count]
+
+            if not pending:
+                return dict()
+
+            threads = [threading.Thread(target=probe_target, args=(name,))
+                       for name in pending]
+
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            pending = [name for name in targets
+                       if confirmed[name] < confirm_count]
+
+            if not pending:
+                return dict()
+
+            if time.time() >= end_time:
+                return dict((name, last_result[name] or "all checks passed")
+                            for name in pending)
+
+            # Confirm a state change quickly once it has been seen
+            if any(confirmed[name] for name in pending):
+                time.sleep(1)
+            else:
+                time.sleep(self.interval_secs)
@@ -0,0 +1,442 @@
+"""
+Log Follower
+
+Follows a log file on a node over one long-lived SSH channel, filtering
+lines with grep on the node, so waiters are told of matching lines as
+soon as they are written instead of polling the file.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import atexit
+import collections
+import re
+import threading
+from os import environ
+from sftp_transfer import SftpTransfer
+
+
+class LogSubscription(object):
+    """Lines of a followed log matching any of a set of grep patterns.
+    """
+
+    def __init__(self, patterns, start_line):
+        """Initialise the subscription.
+
+        Args:
+            patterns (list): grep basic regular expressions to match.
+
+            start_line (int): The first line of the log file to match.
+        """
+        self.patterns = list(patterns)
+        self.regexes = [re.compile(LogFollower.bre_to_regex(pattern))
+                        for pattern in self.patterns]
+        # First line to match and last line delivered in the current log
+        # file, both reset when the log rotates
+        self.file_start = start_line
+        self.last_line = start_line - 1
+        # pattern -> list of matching lines
+        self.matches = dict((pattern, list()) for pattern in self.patterns)
+        # Set if the follower stopped unexpectedly
+        self.failed = False
+        self.__event = threading.Event()
+
+    def deliver(self, line_no, line):
+        """
+        Matches a line of the log against the patterns. Lines already
+        delivered are ignored.
+
+        Args:
+            line_no (int): The line number in the current log file.
+
+            line (str): The line.
+        """
+        if line_no <= self.last_line:
+            return
+
+        matched = False
+        for pattern, regex in zip(self.patterns, self.regexes):
+            if regex.search(line):
+                self.matches[pattern].append(line)
+                matched = True
+
+        if matched:
+            self.last_line = line_no
+
+        if self.all_found():
+            self.__event.set()
+
+    def rotated(self):
+        """
+        Starts matching the new log file from its first line.
+        """
+        self.file_start = 1
+        self.last_line = 0
+
+    def fail(self):
+        """
+        Wakes up the waiter as no more lines will be delivered.
+        """
+        self.failed = True
+        self.__event.set()
+
+    def all_found(self):
+        """
+        Checks if every pattern matched a line.
+
+        Returns:
+            bool. True if all patterns matched.
+        """
+        return all(self.matches.values())
+
+    def wait(self, timeout_secs):
+        """
+        Waits for every pattern to match a line.
+
+        Args:
+            timeout_secs (int): Time to wait.
+
+        Returns:
+            bool. True if all patterns matched.
+        """
+        self.__event.wait(timeout_secs)
+
+        return self.all_found()
+
+
+class LogFollower(object):
+    """Follows one log file with tail -F piped through grep on the node.
+
+    The grep filter holds the patterns of every subscription. A
+    subscription with patterns already in the filter, and starting at a
+    line the follower has read, is served from the matches seen so far and
+    shares the running channel. Otherwise the channel is restarted with
+    the patterns of all subscriptions from the earliest line any of them
+    needs, and lines already delivered are not delivered again.
+
+    The channel is left running for idle_secs after the last subscription
+    is removed, so waits made one after another share it, then closed.
+    """
+
+    LINE_REGEX = re.compile(r'^(\d+):(.*)$')
+    # Printed by tail -F when it starts reading a new file from the top
+    ROTATION_REGEX = re.compile(r'^tail: .*(following new file|'
+                                r'file truncated)')
+    # Matches kept to serve new subscriptions
+    HISTORY_SIZE = 10000
+
+    def __init__(self, log_file, idle_secs=60):
+        """Initialise the follower, which is started by the first
+        subscription.
+
+        Args:
+            log_file (str): Path of the log file on the node.
+
+        Kwargs:
+            idle_secs (int): Seconds the channel is kept open without
+                subscriptions.
+        """
+        self.log_file = log_file
+        self.idle_secs = idle_secs
+        self.patterns = list()
+        self.__subscriptions = list()
+        self.__channel = None
+        # Closes the channel once it has been idle for idle_secs
+        self.__idle_timer = None
+        # First line of the current log file the channel has read from
+        self.__covered_from = None
+        # (line number, line) of matches in the current log file
+        self.__history = collections.deque(maxlen=self.HISTORY_SIZE)
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def bre_to_regex(pattern):
+        """
+        Converts a grep basic regular expression to a Python regex.
+
+        Args:
+            pattern (str): The basic regular expression.
+
+        Returns:
+            str. The equivalent Python regex.
+        """
+        regex = list()
+        index = 0
+
+        while index < len(pattern):
+            char = pattern[index]
+            if char == "\\" and index + 1 < len(pattern):
+                index += 1
+                char = pattern[index]
+                # Escaped, these are operators in basic expressions
+                if char in "(){}|+?":
+                    regex.append(char)
+                else:
+                    regex.append("\\" + char)
+            elif char in "(){}|+?":
+                regex.append("\\" + char)
+            else:
+                regex.append(char)
+            index += 1
+
+        return "".join(regex)
+
+    @staticmethod
+    def get_follow_cmd(log_file, start_line, patterns):
+        """
+        Returns the command following a log file from a line, printing
+        'number:line' for matching lines and for tail messages. Numbers
+        count lines read by tail, including its own messages.
+
+        Args:
+            log_file (str): Path of the log file.
+
+            start_line (int): The first line to read.
+
+            patterns (list): grep basic regular expressions to match.
+
+        Returns:
+            str. The command.
+        """
+        grep_args = " ".join(["-e {0}".format(SftpTransfer.quote(pattern))
+                              for pattern in ["^tail: "] + list(patterns)])
+
+        return "tail -F -n +{0} {1} 2>&1 | grep --line-buffered -n {2}"\
+            .format(start_line, SftpTransfer.quote(log_file), grep_args)
+
+    def subscribe(self, patterns, start_line, open_channel):
+        """
+        Subscribes to lines matching any of the patterns from a line of the
+        current log file.
+
+        Args:
+            patterns (list): grep basic regular expressions to match.
+
+            start_line (int): The first line to match.
+
+            open_channel (function): Called with a command to run it on the
+                node as root if the channel has to be (re)started. Returns
+                the paramiko channel, on a transport of its own which is
+                closed with the channel. Only used during this call, so the
+                channel is opened through the subscribing caller's node.
+
+        Returns:
+            LogSubscription. The subscription, to wait on.
+        """
+        subscription = LogSubscription(patterns, max(start_line, 1))
+
+        with self.__lock:
+            self.__cancel_idle_timer()
+            self.__subscriptions.append(subscription)
+
+            if self.__channel and \
+                    set(patterns).issubset(self.patterns) and \
+                    subscription.file_start >= self.__covered_from:
+                for line_no, line in list(self.__history):
+                    subscription.deliver(line_no, line)
+                return subscription
+
+            patterns = list()
+            for active in self.__subscriptions:
+                patterns.extend([pattern for pattern in active.patterns
+                                 if pattern not in patterns])
+            start_line = min([active.file_start
+                              for active in self.__subscriptions])
+
+            self.__stop()
+            self.__start(start_line, patterns, open_channel)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stops delivering lines to a subscription. Once there are no
+        subscriptions the channel is left running for idle_secs for later
+        subscriptions, then closed.
+
+        Args:
+            subscription (LogSubscription): The subscription.
+        """
+        with self.__lock:
+            if subscription in self.__subscriptions:
+                self.__subscriptions.remove(subscription)
+
+            if self.__subscriptions or not self.__channel:
+                return
+
+            self.__cancel_idle_timer()
+            timer = threading.Timer(self.idle_secs, self.__stop_if_idle)
+            timer.daemon = True
+            self.__idle_timer = timer
+            timer.start()
+
+    def stop(self):
+        """
+        Stops following the log and fails every subscription.
+        """
+        with self.__lock:
+            self.__cancel_idle_timer()
+            self.__stop()
+            for subscription in self.__subscriptions:
+                subscription.fail()
+
+    def is_running(self):
+        """
+        Checks if the log is being followed.
+
+        Returns:
+            bool. True if the channel is open.
+        """
+        with self.__lock:
+            return self.__channel is not None
+
+    def __cancel_idle_timer(self):
+        """
+        Cancels the idle timer, if set. Must be called holding the lock.
+        """
+        if self.__idle_timer:
+            self.__idle_timer.cancel()
+            self.__idle_timer = None
+
+    def __stop_if_idle(self):
+        """
+        Idle timer callback. Closes the channel unless it was subscribed to
+        since the timer was set.
+        """
+        with self.__lock:
+            if self.__subscriptions or \
+                    self.__idle_timer is not threading.current_thread():
+                return
+
+            self.__idle_timer = None
+            self.__stop()
+
+    def __start(self, start_line, patterns, open_channel):
+        """
+        Opens a channel following the log. Must be called holding the lock.
+
+        Args:
+            start_line (int): The first line to read.
+
+            patterns (list): grep basic regular expressions to match.
+
+            open_channel (function): See subscribe.
+        """
+        self.patterns = patterns
+        self.__covered_from = start_line
+        self.__history.clear()
+
+        try:
+            channel = open_channel(
+                self.get_follow_cmd(self.log_file, start_line, patterns))
+        except Exception:
+            for subscription in self.__subscriptions:
+                subscription.fail()
+            return
+
+        self.__channel = channel
+        reader = threading.Thread(target=self.__read,
+                                  args=(channel, start_line))
+        reader.daemon = True
+        reader.start()
+
+    def __stop(self):
+        """
+        Closes the channel, if open. Must be called holding the lock.
+        """
+        if self.__channel:
+            try:
+                self.__channel.get_transport().close()
+            except Exception:
+                pass
+            self.__channel = None
+
+    def __read(self, channel, start_line):
+        """
+        Reads the channel until it closes, delivering each line.
+
+        Args:
+            channel (Channel): The channel following the log.
+
+            start_line (int): The first line the channel reads.
+        """
+        # Line number of the current log file = number printed by grep -
+        # offset
+        offset = 1 - start_line
+
+        try:
+            for output in channel.makefile('r'):
+                match = self.LINE_REGEX.match(output.rstrip("\r\n"))
+                if not match:
+                    continue
+                number, line = int(match.group(1)), match.group(2)
+
+                with self.__lock:
+                    if channel is not self.__channel:
+                        return
+
+                    if self.ROTATION_REGEX.match(line):
+                        offset = number
+                        self.__covered_from = 1
+                        self.__history.clear()
+                        for subscription in self.__subscriptions:
+                            subscription.rotated()
+                        continue
+
+                    if line.startswith("tail: "):
+                        continue
+
+                    self.__history.append((number - offset, line))
+                    for subscription in self.__subscriptions:
+                        subscription.deliver(number - offset, line)
+        except Exception:
+            pass
+
+        # The channel closed without being stopped
+        with self.__lock:
+            if channel is self.__channel:
+                self.__stop()
+                for subscription in self.__subscriptions:
+                    subscription.fail()
+
+
+LOG_FOLLOWERS = dict()
+LOG_FOLLOWERS_LOCK = threading.Lock()
+LOG_FOLLOWER_ENABLED = environ.get("LITP_LOG_FOLLOWER", "true") == "true"
+
+
+def get_log_follower(key, log_file):
+    """
+    Returns the follower of a log file on a node, creating it if needed.
+
+    Args:
+        key (str): Identifies the node, e.g. '10.10.10.100'.
+
+        log_file (str): Path of the log file on the node.
+
+    Returns:
+        LogFollower. The follower or None if following is disabled.
+    """
+    if not LOG_FOLLOWER_ENABLED:
+        return None
+
+    with LOG_FOLLOWERS_LOCK:
+        if (key, log_file) not in LOG_FOLLOWERS:
+            LOG_FOLLOWERS[(key, log_file)] = LogFollower(
+                log_file, int(environ.get("LITP_LOG_FOLLOWER_IDLE", "60")))
+
+        return LOG_FOLLOWERS[(key, log_file)]
+
+
+def stop_log_followers():
+    """
+    Stops every log follower, closing their channels.
+    """
+    with LOG_FOLLOWERS_LOCK:
+        followers = LOG_FOLLOWERS.values()
+
+    for follower in followers:
+        follower.stop()
+
+
+atexit.register(stop_log_followers)
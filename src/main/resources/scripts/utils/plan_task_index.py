@@ -0,0 +1,210 @@
+"""
+Plan Task Index
+
+In-memory index of plan tasks answering task state queries without
+running show_plan and grep on the MS for each query.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import re
+import test_constants
+
+
+class PlanTaskIndex(object):
+    """Tasks of one plan indexed by normalised description.
+
+    A normalised description has every quoted variable replaced with "",
+    e.g. 'Install package "finger" on node "node1"' becomes
+    'Install package "" on node ""', so all tasks created from the same
+    template share one index entry.
+    """
+
+    VARIABLE_REGEX = re.compile(r'\"(.+?)\"')
+
+    def __init__(self, tasks):
+        """Builds the index.
+
+        Args:
+            tasks (iterable): (description, state) pairs for every task in
+                the plan.
+        """
+        # normalised description -> list of (description, state)
+        self.__by_template = dict()
+        # query -> list of matching task states
+        self.__query_cache = dict()
+
+        for desc, state in tasks:
+            template = self.normalise_description(desc)
+            self.__by_template.setdefault(template, list()).append(
+                (desc, state))
+
+    @classmethod
+    def normalise_description(cls, desc):
+        """
+        Replaces every quoted variable in a task description with "".
+
+        Args:
+            desc (str): The task description.
+
+        Returns:
+            str. The normalised description.
+        """
+        return cls.VARIABLE_REGEX.sub('""', desc)
+
+    @classmethod
+    def get_description_regex(cls, task_desc, ignore_variables=True):
+        """
+        Builds the regex used to match task descriptions. Text outside
+        quotes is matched literally and anything inside quotes is matched
+        by a wildcard, in the same way get_task_state matched descriptions
+        with grep.
+
+        Args:
+            task_desc (str): The task description to match.
+
+        Kwargs:
+            ignore_variables (bool): If set to False, the quoted variables
+                must also appear, in order, in the matching description.
+
+        Returns:
+            regex, regex. Regex matched against normalised descriptions and
+                regex matched against full descriptions (None if variables
+                are ignored).
+        """
+        parts = cls.VARIABLE_REGEX.split(task_desc)
+        # After the split, literal text is at even and variables at odd
+        # indexes
+        template_regex = re.compile(
+            '.*'.join([re.escape(part) for part in parts[::2]]))
+
+        if ignore_variables or len(parts) < 2:
+            return template_regex, None
+
+        variable_regex = re.compile(
+            '.*'.join([re.escape(var) for var in parts[1::2]]))
+
+        return template_regex, variable_regex
+
+    def get_matching_states(self, task_desc, ignore_variables=True):
+        """
+        Returns the states of all tasks matching a description.
+
+        Args:
+            task_desc (str): The task description to match.
+
+        Kwargs:
+            ignore_variables (bool): If set to False, the quoted variables
+                must also appear in the matching description.
+
+        Returns:
+            list. The states of the matching tasks.
+        """
+        query = (task_desc, ignore_variables)
+
+        if query not in self.__query_cache:
+            template_regex, variable_regex = \
+                self.get_description_regex(task_desc, ignore_variables)
+            self.__query_cache[query] = self.__search(template_regex,
+                                                      variable_regex)
+
+        return self.__query_cache[query]
+
+    def get_matching_states_regex(self, desc_regex):
+        """
+        Returns the states of all tasks with a description matching a regex.
+
+        Args:
+            desc_regex (str): Regex searched for in each full description.
+
+        Returns:
+            list. The states of the matching tasks.
+        """
+        query = (desc_regex, None)
+
+        if query not in self.__query_cache:
+            self.__query_cache[query] = self.__search(None,
+                                                      re.compile(desc_regex))
+
+        return self.__query_cache[query]
+
+    def __search(self, template_regex, desc_regex):
+        """
+        Searches the index.
+
+        Args:
+            template_regex (regex): Searched for in normalised descriptions,
+                None to search all tasks.
+
+            desc_regex (regex): Searched for in the full description of
+                tasks with a matching template, None to match all of them.
+
+        Returns:
+            list. The states of the matching tasks.
+        """
+        states = list()
+
+        for template, tasks in self.__by_template.iteritems():
+            if template_regex and not template_regex.search(template):
+                continue
+
+            for desc, state in tasks:
+                if desc_regex is None or desc_regex.search(desc):
+                    states.append(state)
+
+        return states
+
+    def get_task_state(self, task_desc, ignore_variables=True):
+        """
+        Returns the combined state of all tasks matching a description.
+
+        Args:
+            task_desc (str): The task description to match.
+
+        Kwargs:
+            ignore_variables (bool): If set to False, the quoted variables
+                must also appear in the matching description.
+
+        Returns:
+            int. Constants value relating to the tasks state.
+        """
+        return self.get_combined_state(
+            self.get_matching_states(task_desc, ignore_variables))
+
+    @staticmethod
+    def get_combined_state(states):
+        """
+        Combines the states of several tasks into one state.
+
+        Args:
+            states (list): Task states, e.g. "Initial" or "Success".
+
+        Returns:
+            int. CMD_ERROR if there are no states, PLAN_TASKS_FAILED if any
+                task has failed, PLAN_TASKS_INCONSISTENT if the tasks are in
+                different states or the constant of their common state.
+        """
+        if not states:
+            return test_constants.CMD_ERROR
+
+        #If at least one task has failed return task failed
+        if any("Fail" in state for state in states):
+            return test_constants.PLAN_TASKS_FAILED
+
+        #If the tasks matched have different states return INCONSISTENT
+        if not all(state == states[0] for state in states):
+            return test_constants.PLAN_TASKS_INCONSISTENT
+
+        if "Success" in states[0]:
+            return test_constants.PLAN_TASKS_SUCCESS
+
+        if "Initial" in states[0]:
+            return test_constants.PLAN_TASKS_INITIAL
+
+        if "Stopped" in states[0]:
+            return test_constants.PLAN_TASKS_STOPPED
+
+        if "Run" in states[0]:
+            return test_constants.PLAN_TASKS_RUNNING
+
+        return None
@@ -0,0 +1,232 @@
+"""
+Plan Watcher
+
+Shared, cached view of the plan running on an MS which any number of
+waiters can wait on.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import threading
+import time
+
+
+class PlanWatcher(object):
+    """Polls the plan on one MS on behalf of all waiters.
+
+    Each poll only fetches the plan state, which is cheap. The full plan
+    with the state of every task is only fetched for waiters which ask for
+    it, when the plan state changes or when the task states are older than
+    the waiter allows.
+
+    The plan is polled at most once per poll interval however many
+    waiters there are. The interval is reset to min_interval_secs whenever
+    the plan or any task changes state and doubles, up to
+    max_interval_secs, on each poll where nothing changed.
+    """
+
+    def __init__(self, fetch_state, fetch_plan=None, min_interval_secs=3,
+                 max_interval_secs=10):
+        """Initialise the watcher.
+
+        Args:
+            fetch_state (function): Called with no arguments to fetch the
+                plan state as defined in test_constants.
+
+        Kwargs:
+            fetch_plan (function): Called with no arguments to fetch the
+                full plan. Returns the plan state and a dict of task key
+                mapped to task state string. If not set no task states
+                are reported.
+
+            min_interval_secs (int): Poll interval while the plan is changing.
+
+            max_interval_secs (int): Longest poll interval while the plan
+                is idle.
+        """
+        self.fetch_state = fetch_state
+        self.fetch_plan = fetch_plan
+        self.min_interval_secs = min_interval_secs
+        self.max_interval_secs = max_interval_secs
+        self.interval_secs = min_interval_secs
+        # Most recent snapshot: {'state': int, 'tasks': {task key: state}}
+        self.snapshot = None
+        self.snapshot_time = 0
+        # Time the task states in the snapshot were fetched
+        self.tasks_time = 0
+        # Number of times the plan has been fetched
+        self.polls = 0
+        self.__listeners = list()
+        # Held while fetching so concurrent waiters share one poll
+        self.__lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """
+        Registers a callback for task state changes.
+
+        Args:
+            callback (function): Called with the task key, the previous task
+                state (None for a new task) and the new task state.
+        """
+        self.__listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Removes a callback registered with add_listener.
+
+        Args:
+            callback (function): The callback to remove.
+        """
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    def __tasks_due(self, tasks_max_age_secs):
+        """Returns True if the task states are older than the caller allows.
+        """
+        if tasks_max_age_secs is None or not self.fetch_plan:
+            return False
+
+        if tasks_max_age_secs == 0:
+            # Task states are wanted with every snapshot
+            return self.tasks_time < self.snapshot_time or not self.snapshot
+
+        return time.time() - self.tasks_time >= tasks_max_age_secs
+
+    def refresh(self, force=False, tasks_max_age_secs=None):
+        """
+        Returns the plan snapshot, polling the plan if the current snapshot
+        is older than the poll interval.
+
+        Kwargs:
+            force (bool): Set to True to always poll the plan.
+
+            tasks_max_age_secs (int): How old, in seconds, the task states
+                may be. The full plan is also fetched whenever the plan state
+                changes. 0 fetches the full plan on every poll. If not set
+                only the plan state is polled.
+
+        Returns:
+            dict. The plan state and task states.
+        """
+        with self.__lock:
+            full_fetch = self.__tasks_due(tasks_max_age_secs)
+
+            if not force and not full_fetch and self.snapshot and \
+                    time.time() - self.snapshot_time < self.interval_secs:
+                return self.snapshot
+
+            old_tasks = dict()
+            old_state = None
+            if self.snapshot:
+                old_tasks = self.snapshot['tasks']
+                old_state = self.snapshot['state']
+
+            if full_fetch:
+                state, tasks = self.fetch_plan()
+            else:
+                state = self.fetch_state()
+                tasks = old_tasks
+
+                if state != old_state and tasks_max_age_secs is not None \
+                        and self.fetch_plan:
+                    state, tasks = self.fetch_plan()
+                    full_fetch = True
+
+            self.polls += 1
+
+            changes = [(task, old_tasks.get(task), task_state)
+                       for task, task_state in tasks.iteritems()
+                       if old_tasks.get(task) != task_state]
+
+            if changes or state != old_state:
+                self.interval_secs = self.min_interval_secs
+            else:
+                self.interval_secs = min(self.interval_secs * 2,
+                                         self.max_interval_secs)
+
+            self.snapshot = {'state': state, 'tasks': tasks}
+            self.snapshot_time = time.time()
+            if full_fetch:
+                self.tasks_time = self.snapshot_time
+            snapshot = self.snapshot
+            listeners = list(self.__listeners)
+
+        for change in changes:
+            for callback in listeners:
+                callback(*change)
+
+        return snapshot
+
+    def wait_for(self, condition, timeout_secs, tasks_max_age_secs=None):
+        """
+        Waits until condition returns True or False for the plan snapshot.
+
+        The first poll always fetches the plan so a snapshot of an earlier
+        plan is never used.
+
+        Args:
+            condition (function): Called with each new snapshot. Returns True
+                or False to stop waiting with that result, or None to keep
+                waiting.
+
+            timeout_secs (int): Time to wait before giving up.
+
+        Kwargs:
+            tasks_max_age_secs (int): See refresh.
+
+        Returns:
+            bool. The result of condition, or None on timeout.
+        """
+        end_time = time.time() + timeout_secs
+        snapshot = self.refresh(True, tasks_max_age_secs)
+
+        while True:
+            result = condition(snapshot)
+            if result is not None:
+                return result
+
+            time_left = end_time - time.time()
+            if time_left <= 0:
+                return None
+
+            next_poll = self.snapshot_time + self.interval_secs - time.time()
+            time.sleep(max(0, min(next_poll, time_left)))
+
+            snapshot = self.refresh(tasks_max_age_secs=tasks_max_age_secs)
+
+
+PLAN_WATCHERS = dict()
+PLAN_WATCHERS_LOCK = threading.Lock()
+
+
+def get_plan_watcher(key, fetch_state, fetch_plan=None, min_interval_secs=3):
+    """
+    Returns the watcher for a plan, creating it if needed.
+
+    Args:
+        key (tuple): Identifies the MS, the user and the interface used to
+            fetch the plan, e.g. ('cli', '10.10.10.100', 'root').
+
+        fetch_state (function): See PlanWatcher. Only used if the watcher
+            is created, so it must only depend on the connection to the MS
+            identified by key and not on the caller.
+
+    Kwargs:
+        fetch_plan (function): See PlanWatcher, as for fetch_state.
+
+        min_interval_secs (int): Poll interval while the plan is changing.
+            The shortest interval asked for by any caller is used.
+
+    Returns:
+        PlanWatcher. The watcher for the plan.
+    """
+    with PLAN_WATCHERS_LOCK:
+        if key not in PLAN_WATCHERS:
+            PLAN_WATCHERS[key] = PlanWatcher(fetch_state, fetch_plan,
+                                             min_interval_secs)
+
+        watcher = PLAN_WATCHERS[key]
+        watcher.min_interval_secs = min(watcher.min_interval_secs,
+                                        min_interval_secs)
+
+        return watcher
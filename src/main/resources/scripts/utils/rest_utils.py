@@ -5,9 +5,19 @@ Note: :sysnopsis: for this file is located in source_code_docs.rst
 """
 
 from litp_generic_utils import GenericUtils
+from http_client import HTTP_CLIENT
+from plan_watcher import get_plan_watcher
+from litp_model_mirror import invalidate_model_mirror
+from show_cache import get_show_cache
+import base64
+import httplib
 import json
+import socket
 import test_constants
+import threading
 import time
+import Queue
+import urlparse
 
 
 class RestUtils(object):
@@ -19,7 +29,7 @@ class RestUtils(object):
 
     def __init__(self, server, port="9999", rest_version="v1",
                  username=None, password=None,
-                 rest_loc="/litp/rest/"):
+                 rest_loc="/litp/rest/", scheme="https"):
         """Initialise REST variables.
 
         Args:
@@ -35,6 +45,9 @@ class RestUtils(object):
             password (str): Password to use in authenticating to REST.
 
             rest_loc (str): Location of REST.
+
+            scheme (str): http or https. Set to http to send requests to a
+                local stand-in server.
         """
         # GENERIC UTILS
         self.g_utils = GenericUtils()
@@ -43,6 +56,8 @@ class RestUtils(object):
         self.server = server
         # REST SERVER PORT
         self.port = port
+        # REST SERVER SCHEME
+        self.scheme = scheme
         # USER NAME FOR AUTHENTICATION ON THE REST SERVER
 
         if not username or not password:
@@ -61,6 +76,11 @@ class RestUtils(object):
         self.restpath = "{0}{1}".format(rest_loc, rest_version)
         # CURL COMMAND WITH ABSOLUTE PATH
         self.curl_cmd = "/usr/bin/curl"
+        # Set to False to send requests with curl instead of the in-process
+        # keep-alive HTTP client. Curl is always used if options are passed.
+        self.native_http = True
+        # Latency in seconds of the most recent request
+        self.last_request_secs = None
         # ITEM TYPE PATH
         self.item_type_path = "/item-types"
         # PROPERTY TYPE PATH
@@ -196,6 +216,160 @@ class RestUtils(object):
 
         return stdout, stderr, status
 
+    @staticmethod
+    def __get_bulk_waves(operations):
+        """
+        Splits bulk operations into waves which can each be run
+        concurrently. An operation is placed in a later wave than any
+        earlier operation on the same path, an ancestor path or a
+        descendant path, so parent/child ordering is kept as listed.
+
+        Args:
+            operations (list): Bulk operation dicts, see bulk.
+
+        Returns:
+            list. A list of waves, each a list of indexes into operations.
+        """
+        # path -> highest wave of an operation on exactly this path
+        wave_at = dict()
+        # path -> highest wave of an operation on this path or below it
+        wave_under = dict()
+        waves = list()
+
+        for index, operation in enumerate(operations):
+            path = operation["path"].rstrip("/")
+            parts = path.split("/")
+            ancestors = ["/".join(parts[:num]) for num in range(1, len(parts))]
+
+            wave = max([wave_at.get(anc, -1) for anc in ancestors] +
+                       [wave_under.get(path, -1)]) + 1
+
+            wave_at[path] = max(wave_at.get(path, -1), wave)
+            for anc in ancestors + [path]:
+                wave_under[anc] = max(wave_under.get(anc, -1), wave)
+
+            if wave == len(waves):
+                waves.append(list())
+            waves[wave].append(index)
+
+        return waves
+
+    def __run_bulk_operation(self, operation):
+        """
+        Runs a single bulk operation.
+
+        Args:
+            operation (dict): Bulk operation dict, see bulk.
+
+        Returns:
+            str, str, int. stdout, stderr and status of the request.
+        """
+        props = dict((key, str(val)) for key, val in
+                     operation.get("props", dict()).iteritems())
+
+        if operation["op"] == "create":
+            parent_path, path_id = operation["path"].rsplit("/", 1)
+            msg_data = {"id": path_id, "type": operation["type"]}
+            if props:
+                msg_data["properties"] = props
+            return self.post(parent_path, self.HEADER_JSON,
+                             json.dumps(msg_data))
+
+        if operation["op"] == "inherit":
+            return self.inherit_cmd_rest(operation["path"],
+                                         operation["source_path"], props)
+
+        if operation["op"] == "update":
+            return self.put(operation["path"], self.HEADER_JSON,
+                            json.dumps({"properties": props}))
+
+        if operation["op"] == "delete":
+            return self.delete(operation["path"])
+
+        return "", "Unknown bulk operation: {0}".format(operation["op"]), -1
+
+    def bulk(self, operations, max_workers=4):
+        """
+        Runs a list of create, inherit, update and delete operations over
+        pooled keep-alive connections, with up to max_workers requests in
+        flight at once.
+
+        Operations on a path are only started once all earlier operations
+        on the same path, its ancestors or its descendants have finished,
+        so parents must be listed before children when creating and
+        children before parents when deleting (see bulk_delete).
+
+        Each operation is a dict with the keys:
+            op (str): One of "create", "inherit", "update" or "delete".
+
+            path (str): Full path of the item.
+
+            type (str): Item type, for create.
+
+            source_path (str): Path to inherit from, for inherit.
+
+            props (dict): Properties, for create, inherit and update.
+
+        Args:
+            operations (list): The operations to run.
+
+        Kwargs:
+            max_workers (int): Maximum concurrent requests. Default is 4.
+
+        Returns:
+            list. A (stdout, stderr, status) tuple per operation, in the
+                same order as operations.
+        """
+        results = [None] * len(operations)
+
+        for wave in self.__get_bulk_waves(operations):
+            work = Queue.Queue()
+            for index in wave:
+                work.put(index)
+
+            def worker():
+                """Runs queued operations until the queue is empty"""
+                while True:
+                    try:
+                        index = work.get_nowait()
+                    except Queue.Empty:
+                        return
+                    try:
+                        results[index] = \
+                            self.__run_bulk_operation(operations[index])
+                    except Exception as except_err:
+                        results[index] = ("", str(except_err), -1)
+
+            threads = [threading.Thread(target=worker)
+                       for _ in range(min(max_workers, len(wave)))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return results
+
+    def bulk_delete(self, paths, max_workers=4):
+        """
+        Deletes a list of paths using bulk, removing children before
+        their parents whatever order the paths are listed in.
+
+        Args:
+            paths (list): The paths to delete.
+
+        Kwargs:
+            max_workers (int): Maximum concurrent requests. Default is 4.
+
+        Returns:
+            dict. Path mapped to the (stdout, stderr, status) of its delete.
+        """
+        ordered = sorted(paths, key=lambda path: path.rstrip("/").count("/"),
+                         reverse=True)
+        results = self.bulk([{"op": "delete", "path": path}
+                             for path in ordered], max_workers)
+
+        return dict(zip(ordered, results))
+
     def clean_paths(self):
         """
         Performs REST level cleanup to remove any
@@ -210,8 +384,8 @@ class RestUtils(object):
             self.stop_plan_if_running_rest()
 
         # Remove inherit items
-        for path in list(self.inherited_paths_to_clean):
-            stdout, _, status = self.delete(path)
+        results = self.bulk_delete(list(self.inherited_paths_to_clean))
+        for stdout, _, status in results.values():
             if not self.is_status_success(status):
                 self.g_utils.log("error", "Cleanup of url failed: {0}"
                                  .format(stdout))
@@ -224,8 +398,8 @@ class RestUtils(object):
             self.remove_plan_rest()
 
         # Remove all other items
-        for path in list(self.paths_to_clean):
-            stdout, _, status = self.delete(path)
+        results = self.bulk_delete(list(self.paths_to_clean))
+        for stdout, _, status in results.values():
             if not self.is_status_success(status):
                 self.g_utils.log("error", "Cleanup of url failed: {0}"
                                  .format(stdout))
@@ -287,56 +461,66 @@ class RestUtils(object):
         """
         self.g_utils.log("info", "Entering wait_for_plan_state method")
 
-        seconds_increment = 3
-        seconds_count = seconds_increment
+        start_time = time.time()
 
-        plan_state = self.get_current_plan_state_rest()
+        def fetch_state():
+            """Fetches the plan state, the model may change while it runs"""
+            state = self.get_current_plan_state_rest()
 
-        # Loop until break
-        while True:
+            invalidate_model_mirror(self.server)
+            get_show_cache(self.server).set_plan_running(
+                state in [test_constants.PLAN_IN_PROGRESS,
+                          test_constants.PLAN_STOPPING], polled=True)
 
-            time.sleep(seconds_increment)
-            seconds_count += seconds_increment
-            minutes_passed = seconds_count / 60
+            return state
 
-            if minutes_passed > timeout_mins:
-                self.get_current_plan_state_rest()
-                self.g_utils.log("info",
-                             "Exiting wait_for_plan_state method after " + \
-                                 "{0} seconds (TIMEOUT)"\
-                                 .format(seconds_count))
-                return False
+        # The watcher keeps polling through the connection of the first
+        # RestUtils for the server and user, whichever test created it
+        watcher = get_plan_watcher(('rest', self.server, self.user),
+                                   fetch_state)
 
-            plan_state = self.get_current_plan_state_rest()
+        def is_state_reached(snapshot):
+            """Returns True/False once the state is reached/unreachable"""
+            plan_state = snapshot['state']
 
             # This covers case where you are waiting for plan to start
             if plan_state == state_value:
-                self.get_current_plan_state_rest()
-                self.g_utils.log("info",
+                return True
+
+            # If plan is not in progress, need to exit or you will loop forever
+            if plan_state == test_constants.PLAN_IN_PROGRESS:
+                return None
+
+            # If we are waiting for stopped state and current state is
+            # stopping, wait.
+            if state_value == test_constants.PLAN_STOPPED and \
+                    plan_state == test_constants.PLAN_STOPPING:
+                return None
+
+            return False
+
+        state_reached = watcher.wait_for(is_state_reached, timeout_mins * 60)
+        seconds_count = int(time.time() - start_time)
+
+        if state_reached is None:
+            self.g_utils.log("info",
+                             "Exiting wait_for_plan_state method after " + \
+                                 "{0} seconds (TIMEOUT)"\
+                                 .format(seconds_count))
+            return False
+
+        if state_reached:
+            self.g_utils.log("info",
                              "Exiting wait_for_plan_state method after " + \
                                  "{0} seconds (SUCCESS)"\
                                  .format(seconds_count))
-                return True
+            return True
 
-            # If plan is not in progress, need to exit or you will loop forever
-            if plan_state != test_constants.PLAN_IN_PROGRESS:
-                if plan_state == state_value:
-                    self.g_utils.log("info",
-                                 "Exiting wait_for_plan_state method after"\
-                                     + " {0} seconds (SUCCESS)"\
-                                     .format(seconds_count))
-                    return True
-                # If we are waiting for stopped state and current state is
-                # stopping, wait.
-                elif state_value == test_constants.PLAN_STOPPED and \
-                        plan_state == test_constants.PLAN_STOPPING:
-                    continue
-                else:
-                    self.g_utils.log("info",
-                                 "Exiting wait_for_plan_state method after"\
-                                     + " {0} seconds (UNEXPECTED STATE)" \
-                                     .format(seconds_count))
-                    return False
+        self.g_utils.log("info",
+                         "Exiting wait_for_plan_state method after"\
+                             + " {0} seconds (UNEXPECTED STATE)" \
+                             .format(seconds_count))
+        return False
 
     def get_current_plan_state_rest(self):
         """Returns the status of the currently running plan.
@@ -397,6 +581,127 @@ class RestUtils(object):
             str, str, int. Standard output and error strings corresponding
                 to the REST request output, and HTTP response status.
         """
+        if self.native_http and not options:
+            stdout, sderr, status = self.__native_request(url, header,
+                                                          request, data)
+        else:
+            stdout, sderr, status = self.__curl_request(url, header,
+                                                        request, data,
+                                                        options)
+
+        # Any request other than a GET may have changed the model
+        if request != "GET":
+            self.__invalidate_model_caches(url, request)
+
+        # If someone has performed a successful update on plan item, assume a
+        # plan has been run in the test and will require a plan run at cleanup
+        if self.is_status_success(status) \
+                and "plans/plan" in url and request == "PUT":
+            self.plan_has_run = True
+
+        return stdout, sderr, status
+
+    def __invalidate_model_caches(self, url, request):
+        """Invalidates the model mirror and the shows cached for the part
+        of the model changed by a request.
+
+        Args:
+            url (str): URL of the resource.
+
+            request (str): Request type, one of: POST, PUT, DELETE.
+        """
+        show_cache = get_show_cache(self.server)
+        path = urlparse.urlsplit(url).path
+
+        if path.startswith(self.restpath):
+            path = path[len(self.restpath):] or "/"
+        else:
+            path = "/"
+
+        # Updating the plan runs or stops it
+        if path.startswith("/plans") and request == "PUT":
+            show_cache.set_plan_running(True)
+
+        invalidate_model_mirror(self.server, path)
+        show_cache.invalidate(path)
+
+    def __native_request(self, url, header, request, data):
+        """Sends a request to REST server using the in-process HTTP client,
+        reusing keep-alive connections.
+
+        Args:
+            url (str): URL points to the resource.
+
+            header (str): Header of the REST request, separated by
+                space if there are more.
+
+            request (str): Request type, one of: GET, POST, PUT, DELETE.
+
+            data (str): Input data for REST request.
+
+        Returns:
+            str, str, int. Response body, error string, and HTTP response
+                status (-1 if the server could not be reached, as with
+                curl).
+        """
+        headers = dict()
+        if header != "":
+            for header_element in header.split(" "):
+                name, value = header_element.strip("'").split(":", 1)
+                headers[name] = value
+
+        # curl -d sends form data unless told otherwise
+        if data and "content-type" not in \
+                [name.lower() for name in headers]:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        headers["Authorization"] = "Basic {0}".format(
+            base64.b64encode("{0}:{1}".format(self.user, self.password)))
+
+        self.g_utils.log_now()
+        print "[rest]# {0} {1}".format(request, url)
+
+        start_time = time.time()
+        try:
+            status, content, self.last_request_secs = \
+                HTTP_CLIENT.request(request, url, headers, data or None)
+        except (httplib.HTTPException, socket.error) as except_err:
+            self.last_request_secs = time.time() - start_time
+            status = -1
+            content = ""
+            sderr = str(except_err)
+        else:
+            sderr = ""
+
+        # Match the curl output, where the body was split into lines
+        stdout = "\n".join(content.splitlines())
+
+        print stdout
+        print sderr
+        print "{0} ({1:.3f}s)".format(status, self.last_request_secs)
+
+        return stdout, sderr, status
+
+    def __curl_request(self, url, header, request, data, options):
+        """Sends a request to REST server by running curl.
+
+        Args:
+            url (str): URL points to the resource.
+
+            header (str): Header of the REST request, separated by
+                space if there are more.
+
+            request (str): Request type, one of: GET, POST, PUT, DELETE.
+
+            data (str): Input data for REST request.
+
+            options (str): Further curl options.
+
+        Returns:
+            str, str, int. Standard output and error strings corresponding
+                to the REST request output, and HTTP response status.
+        """
+        start_time = time.time()
         header_option = ""
         if header != "":
             header_list = header.split(" ")
@@ -428,12 +733,7 @@ class RestUtils(object):
 
         stdout = "\n".join(outlist)
         sderr = "\n".join(stderr)
-
-        # If someone has performed a successful update on plan item, assume a
-        # plan has been run in the test and will require a plan run at cleanup
-        if self.is_status_success(status) \
-                and "plans/plan" in url and request == "PUT":
-            self.plan_has_run = True
+        self.last_request_secs = time.time() - start_time
 
         return stdout, sderr, status
 
@@ -450,8 +750,8 @@ class RestUtils(object):
             str, str, int. Standard output and error strings corresponding
                 to the REST request output, and HTTP response status.
         """
-        url = "https://{0}:{1}{2}{3}".format(self.server, self.port,
-                                             self.restpath, path)
+        url = "{0}://{1}:{2}{3}{4}".format(self.scheme, self.server,
+                                           self.port, self.restpath, path)
 
         return self.request(url=url, request="GET", options=options)
 
@@ -473,8 +773,8 @@ class RestUtils(object):
             str, str, int. Standard output and error strings corresponding
                 to the REST request output, and HTTP response status.
         """
-        url = "https://{0}:{1}{2}{3}".format(self.server, self.port,
-                                             self.restpath, path)
+        url = "{0}://{1}:{2}{3}{4}".format(self.scheme, self.server,
+                                           self.port, self.restpath, path)
 
         stdout, sderr, status = self.request(url=url, header=header,
                                              request="POST", data=data,
@@ -514,8 +814,8 @@ class RestUtils(object):
             str, str, int. Standard output and error strings corresponding
                 to the REST request output, and HTTP response status.
         """
-        url = "https://{0}:{1}{2}{3}".format(self.server, self.port,
-                                             self.restpath, path)
+        url = "{0}://{1}:{2}{3}{4}".format(self.scheme, self.server,
+                                           self.port, self.restpath, path)
 
         return self.request(url=url, header=header, request="PUT",
                             data=data, options=options)
@@ -533,8 +833,8 @@ class RestUtils(object):
             str, str, int. Standard output and error strings corresponding
                 to the REST request output, and HTTP response status.
         """
-        url = "https://{0}:{1}{2}{3}".format(self.server, self.port,
-                                             self.restpath, path)
+        url = "{0}://{1}:{2}{3}{4}".format(self.scheme, self.server,
+                                           self.port, self.restpath, path)
 
         stdout, sderr, status = self.request(url=url, request="DELETE",
                                              options=options)
@@ -598,5 +898,5 @@ class RestUtils(object):
         Returns:
             str. The REST URI.
         """
-        return "https://{0}:{1}{2}".format(self.server, self.port,
-                                           self.restpath)
+        return "{0}://{1}:{2}{3}".format(self.scheme, self.server,
+                                         self.port, self.restpath)
@@ -0,0 +1,303 @@
+"""
+SFTP Transfer
+
+Bulk file transfer over one SFTP session per node, with pipelined writes,
+prefetched reads and checksums to skip files already present on the node.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import hashlib
+import os
+import re
+import threading
+
+
+class SftpTransfer(object):
+    """Moves many files over a single SFTP session.
+
+    Writes are pipelined, so a file is sent without waiting for each block
+    to be acknowledged, and reads are prefetched, so blocks of a file are
+    requested before they are read. Local checksums are cached by path,
+    modification time and size.
+    """
+
+    # Data read from or written to a file at a time. paramiko splits it into
+    # SFTP requests of its maximum request size
+    CHUNK_SIZE = 262144
+
+    CHECKSUM_REGEX = re.compile(r'^([0-9a-f]{32})\s+\*?(.+)$')
+
+    # (local path, mtime, size) -> md5 hex digest
+    LOCAL_CHECKSUMS = dict()
+    LOCAL_CHECKSUMS_LOCK = threading.Lock()
+
+    @classmethod
+    def get_local_checksum(cls, local_path):
+        """
+        Returns the md5 checksum of a local file.
+
+        Args:
+            local_path (str): Path of the local file.
+
+        Returns:
+            str. The md5 hex digest of the file.
+        """
+        file_stat = os.stat(local_path)
+        key = (local_path, file_stat.st_mtime, file_stat.st_size)
+
+        with cls.LOCAL_CHECKSUMS_LOCK:
+            checksum = cls.LOCAL_CHECKSUMS.get(key)
+
+        if checksum:
+            return checksum
+
+        md5 = hashlib.md5()
+        with open(local_path, 'rb') as local_file:
+            while True:
+                data = local_file.read(cls.CHUNK_SIZE)
+                if not data:
+                    break
+                md5.update(data)
+
+        checksum = md5.hexdigest()
+
+        with cls.LOCAL_CHECKSUMS_LOCK:
+            cls.LOCAL_CHECKSUMS[key] = checksum
+
+        return checksum
+
+    @staticmethod
+    def quote(arg):
+        """
+        Quotes an argument for the remote shell.
+
+        Args:
+            arg (str): The argument.
+
+        Returns:
+            str. The argument in single quotes.
+        """
+        return "'{0}'".format(arg.replace("'", "'\\''"))
+
+    @classmethod
+    def get_remote_checksums_cmd(cls, remote_sizes):
+        """
+        Returns a command printing the md5 checksum of each remote file
+        which exists with the expected size. Files of another size are not
+        read.
+
+        Args:
+            remote_sizes (dict): Remote file path mapped to its expected
+                size.
+
+        Returns:
+            str. The command, whose output is read by
+                get_remote_checksums.
+        """
+        checks = ["[ -f {0} ] && [ $(stat -c %s {0}) -eq {1} ] && "
+                  "md5sum {0}".format(cls.quote(remote_path), size)
+                  for remote_path, size in sorted(remote_sizes.items())]
+
+        return "; ".join(checks + ["true"])
+
+    @staticmethod
+    def get_remote_dirs_cmd(remote_paths):
+        """
+        Returns a command printing the index of each remote path which is a
+        directory. Paths are not quoted, as with remote_path_exists.
+
+        Args:
+            remote_paths (list): The remote paths.
+
+        Returns:
+            str. The command.
+        """
+        checks = ["[ -d {0} ] && echo {1}".format(remote_path, index)
+                  for index, remote_path in enumerate(remote_paths)]
+
+        return "; ".join(checks + ["true"])
+
+    @classmethod
+    def get_remote_checksums(cls, stdout):
+        """
+        Parses the output of the command from get_remote_checksums_cmd.
+
+        Args:
+            stdout (list): The output of the command.
+
+        Returns:
+            dict. Remote file path mapped to its md5 hex digest.
+        """
+        checksums = dict()
+
+        for line in stdout:
+            match = cls.CHECKSUM_REGEX.match(line.strip())
+            if match:
+                checksums[match.group(2)] = match.group(1)
+
+        return checksums
+
+    @classmethod
+    def get_unchanged(cls, file_pairs, remote_checksums):
+        """
+        Returns the remote paths whose content matches the local file.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs.
+
+            remote_checksums (dict): Remote file path mapped to its md5 hex
+                digest, as returned by get_remote_checksums.
+
+        Returns:
+            set. The remote paths of files which need not be copied.
+        """
+        return set(remote_path for local_path, remote_path in file_pairs
+                   if remote_checksums.get(remote_path) ==
+                   cls.get_local_checksum(local_path))
+
+    @classmethod
+    def put(cls, sftp, local_path, remote_path):
+        """
+        Writes a local file to the node without waiting for each block to be
+        acknowledged. Errors are raised when the remote file is closed.
+
+        Args:
+            sftp (SFTPClient): An open SFTP session.
+
+            local_path (str): Path of the local file.
+
+            remote_path (str): Path of the remote file.
+
+        Raises:
+            IOError if filepaths are invalid or the write failed.
+        """
+        with open(local_path, 'rb') as local_file:
+            remote_file = sftp.file(remote_path, 'wb')
+            try:
+                remote_file.set_pipelined(True)
+                while True:
+                    data = local_file.read(cls.CHUNK_SIZE)
+                    if not data:
+                        break
+                    remote_file.write(data)
+            finally:
+                remote_file.close()
+
+    @staticmethod
+    def put_delta(sftp, local_path, remote_path, remote_blocks, block_size):
+        """
+        Updates a remote file to match a local file by writing only the
+        blocks which differ, then truncating it to the local size.
+
+        Args:
+            sftp (SFTPClient): An open SFTP session.
+
+            local_path (str): Path of the local file.
+
+            remote_path (str): Path of the remote file.
+
+            remote_blocks (list): md5 hex digest of each block of the remote
+                file.
+
+            block_size (int): Size of the blocks.
+
+        Returns:
+            int. The number of bytes sent.
+
+        Raises:
+            IOError if filepaths are invalid or the write failed.
+        """
+        sent = 0
+        index = 0
+
+        with open(local_path, 'rb') as local_file:
+            remote_file = sftp.file(remote_path, 'r+b')
+            try:
+                remote_file.set_pipelined(True)
+                while True:
+                    data = local_file.read(block_size)
+                    if not data:
+                        break
+                    if index >= len(remote_blocks) or \
+                            hashlib.md5(data).hexdigest() != \
+                            remote_blocks[index]:
+                        remote_file.seek(index * block_size)
+                        remote_file.write(data)
+                        sent += len(data)
+                    index += 1
+                remote_file.flush()
+                remote_file.truncate(os.path.getsize(local_path))
+            finally:
+                remote_file.close()
+
+        return sent
+
+    @classmethod
+    def get(cls, sftp, remote_path, local_path):
+        """
+        Reads a remote file from the node, requesting all of its blocks
+        before reading them.
+
+        Args:
+            sftp (SFTPClient): An open SFTP session.
+
+            remote_path (str): Path of the remote file.
+
+            local_path (str): Path of the local file.
+
+        Raises:
+            IOError if filepaths are invalid or the read failed.
+        """
+        remote_file = sftp.file(remote_path, 'rb')
+        try:
+            remote_file.prefetch()
+            with open(local_path, 'wb') as local_file:
+                while True:
+                    data = remote_file.read(cls.CHUNK_SIZE)
+                    if not data:
+                        break
+                    local_file.write(data)
+        finally:
+            remote_file.close()
+
+    @staticmethod
+    def run_per_node(transfer, nodes):
+        """
+        Runs a transfer for each node, with all nodes in parallel.
+
+        Args:
+            transfer (function): Called with a node to transfer its files.
+
+            nodes (list): The nodes.
+
+        Returns:
+            dict. Each node mapped to the value returned by transfer.
+
+        Raises:
+            The first exception raised by a transfer, once all of them have
+                finished.
+        """
+        results = dict()
+        errors = list()
+
+        def run_on_node(node):
+            """Runs the transfer for one node, storing any exception"""
+            try:
+                results[node] = transfer(node)
+            except Exception as except_err:
+                errors.append(except_err)
+
+        threads = [threading.Thread(target=run_on_node, args=(node,))
+                   for node in nodes]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return results
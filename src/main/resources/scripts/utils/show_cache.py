@@ -0,0 +1,319 @@
+"""
+Show Cache
+
+Read-through cache of litp show output per MS, keyed by path and
+invalidated by subtree when the model changes.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import re
+import threading
+import time
+from os import environ
+
+
+class ShowCache(object):
+    """Cache of successful litp show output keyed by (path, args, user).
+    Shows are cached per user as the output may depend on what the user
+    is allowed to see.
+
+    When a path changes, every cached show which may include it is dropped.
+    That covers shows of the path and its descendants, of its parent
+    (which lists it as a child), recursive shows of its ancestors and,
+    following inherited from links, shows of every item inheriting from the
+    changed subtree.
+
+    As a plan may be started in ways which are not seen, cached shows are
+    only used for ttl_secs after a poll of the plan confirmed no plan is
+    running, and each is dropped ttl_secs after it was cached. Shows of
+    plans, which change while they run, are never cached.
+    """
+
+    # Subtree which is never cached
+    LIVE_PATH = "/plans"
+
+    TEXT_SOURCE_REGEX = re.compile(r'^\s*inherited from:\s*(/\S*)',
+                                   re.MULTILINE)
+    JSON_SOURCE_REGEX = re.compile(r'"inherited-from":\s*\{\s*"href":\s*'
+                                   r'"[^"]*?/litp/rest/v[^/]*(/[^"]*)"')
+
+    def __init__(self, ttl_secs=30):
+        """Initialise an empty cache.
+
+        Kwargs:
+            ttl_secs (int): Seconds a cached show, or a poll confirming no
+                plan is running, is trusted for.
+        """
+        self.ttl_secs = ttl_secs
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Number of cached shows dropped by invalidations
+        self.evictions = 0
+        # Set while a plan may be running, nothing is cached as item states
+        # can change at any time
+        self.plan_running = False
+        # Time a poll of the plan last confirmed no plan is running
+        self.plan_checked_time = 0
+        # path -> {(args, user): (time cached, stdout)}
+        self.__entries = dict()
+        # source path -> set of cached paths inheriting from it
+        self.__references = dict()
+        # Cached paths which inherit from an unknown source, dropped on any
+        # invalidation
+        self.__unknown_references = set()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def is_under(path, parent):
+        """
+        Checks if a path is a parent path or under it.
+
+        Args:
+            path (str): The path to check.
+
+            parent (str): The parent path.
+
+        Returns:
+            bool. True if path is parent or one of its descendants.
+        """
+        parent = parent.rstrip("/")
+
+        return path == parent or path.startswith(parent + "/") or \
+            not parent
+
+    def is_cacheable(self, path):
+        """
+        Checks if shows of a path may be cached.
+
+        Args:
+            path (str): The shown path.
+
+        Returns:
+            bool. False for paths under LIVE_PATH.
+        """
+        return not self.is_under(path, self.LIVE_PATH)
+
+    def needs_plan_check(self):
+        """
+        Checks if the plan must be polled before the cache is used.
+
+        Returns:
+            bool. True if no poll confirmed no plan is running within
+                ttl_secs.
+        """
+        with self.__lock:
+            return self.plan_running or \
+                time.time() - self.plan_checked_time >= self.ttl_secs
+
+    def __is_trusted(self):
+        """
+        Checks if cached shows may be used or added. Must be called holding
+        the lock.
+
+        Returns:
+            bool. True if a recent poll confirmed no plan is running.
+        """
+        return not self.plan_running and \
+            time.time() - self.plan_checked_time < self.ttl_secs
+
+    @staticmethod
+    def is_recursive(args):
+        """
+        Checks if show arguments include items below the shown path.
+
+        Args:
+            args (str): litp show arguments.
+
+        Returns:
+            bool. True if the arguments make a recursive or depth show.
+        """
+        return bool(re.search(r'(^|\s)-(r|n)', args))
+
+    def get(self, path, args="", user=None):
+        """
+        Returns the cached output of a show.
+
+        Args:
+            path (str): The shown path.
+
+        Kwargs:
+            args (str): litp show arguments.
+
+            user (str): The user the show is run as.
+
+        Returns:
+            list. Copy of the cached stdout or None if it is not cached.
+        """
+        with self.__lock:
+            entry = None
+            if self.__is_trusted() and self.is_cacheable(path):
+                entry = self.__entries.get(path, dict()).get(
+                    (args.strip(), user))
+
+            if entry is None or time.time() - entry[0] >= self.ttl_secs:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+            return list(entry[1])
+
+    def put(self, path, args, stdout, user=None):
+        """
+        Caches the output of a successful show.
+
+        Args:
+            path (str): The shown path.
+
+            args (str): litp show arguments.
+
+            stdout (list): The show output.
+
+        Kwargs:
+            user (str): The user the show was run as.
+        """
+        output = "\n".join(stdout)
+        sources = self.TEXT_SOURCE_REGEX.findall(output) + \
+            self.JSON_SOURCE_REGEX.findall(output)
+
+        with self.__lock:
+            if not self.__is_trusted() or not self.is_cacheable(path):
+                return
+
+            self.__entries.setdefault(path, dict())[(args.strip(), user)] = \
+                (time.time(), list(stdout))
+
+            for source in sources:
+                self.__references.setdefault(source, set()).add(path)
+
+            if not sources and "inherited" in output:
+                self.__unknown_references.add(path)
+
+    def invalidate(self, path):
+        """
+        Drops every cached show which may include a changed path.
+
+        Args:
+            path (str): The path of the changed item.
+        """
+        with self.__lock:
+            self.invalidations += 1
+
+            changed = [path]
+            done = set()
+            changed.extend(self.__unknown_references)
+            self.__unknown_references = set()
+
+            while changed:
+                changed_path = changed.pop()
+                if changed_path in done:
+                    continue
+                done.add(changed_path)
+
+                self.__drop(changed_path)
+
+                # Items inheriting from the changed subtree change with it
+                for source, paths in self.__references.items():
+                    if self.is_under(source, changed_path):
+                        changed.extend(paths)
+                        del self.__references[source]
+
+    def __drop(self, changed_path):
+        """
+        Drops every cached show which may include a changed path. Must be
+        called holding the lock.
+
+        Args:
+            changed_path (str): The path of the changed item.
+        """
+        parent = changed_path.rstrip("/").rsplit("/", 1)[0] or "/"
+
+        for path in self.__entries.keys():
+            shows = self.__entries[path]
+
+            if self.is_under(path, changed_path) or path == parent:
+                self.evictions += len(shows)
+                del self.__entries[path]
+                continue
+
+            if self.is_under(changed_path, path):
+                for show_key in shows.keys():
+                    if self.is_recursive(show_key[0]):
+                        self.evictions += 1
+                        del shows[show_key]
+                if not shows:
+                    del self.__entries[path]
+
+    def invalidate_all(self):
+        """
+        Drops every cached show.
+        """
+        with self.__lock:
+            self.invalidations += 1
+            self.evictions += sum([len(shows) for shows
+                                   in self.__entries.values()])
+            self.__entries = dict()
+            self.__references = dict()
+            self.__unknown_references = set()
+
+    def set_plan_running(self, plan_running, polled=False):
+        """
+        Sets whether a plan may be running. Everything cached is dropped
+        when a plan starts and nothing is cached until a poll confirms it
+        stopped.
+
+        Args:
+            plan_running (bool): True if a plan may be running.
+
+        Kwargs:
+            polled (bool): Set to True if the plan state was read from the
+                MS, rather than assumed from a command run.
+        """
+        # Nothing is cached while a plan is running
+        if plan_running and not self.plan_running:
+            self.invalidate_all()
+
+        with self.__lock:
+            self.plan_running = plan_running
+            if polled:
+                self.plan_checked_time = time.time()
+
+    def get_stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict. Number of hits, which are SSH round trips saved, misses,
+                invalidations, evicted shows and cached shows.
+        """
+        with self.__lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "invalidations": self.invalidations,
+                    "evictions": self.evictions,
+                    "cached": sum([len(shows) for shows
+                                   in self.__entries.values()])}
+
+
+SHOW_CACHES = dict()
+SHOW_CACHES_LOCK = threading.Lock()
+
+
+def get_show_cache(key):
+    """
+    Returns the show cache of an MS, creating it if needed.
+
+    Args:
+        key (str): Identifies the MS, e.g. '10.10.10.100'.
+
+    Returns:
+        ShowCache. The cache for the MS.
+    """
+    with SHOW_CACHES_LOCK:
+        if key not in SHOW_CACHES:
+            SHOW_CACHES[key] = ShowCache(
+                int(environ.get("LITP_SHOW_CACHE_TTL", "30")))
+
+        return SHOW_CACHES[key]
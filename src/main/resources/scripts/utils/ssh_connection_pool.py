@@ -0,0 +1,250 @@
+"""
+SSH Connection Pool
+
+Process wide pool of authenticated paramiko SSH connections which survives
+across GenericTest instances.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import atexit
+import hashlib
+import threading
+import time
+from os import environ
+from litp_generic_utils import GenericUtils
+
+
+class SSHConnectionPool(object):
+    """Pool of idle SSH connections keyed by (host, user, password hash,
+    ipv4).
+
+    A :class:`GenericNode` checks a connection out of the pool before
+    opening a new one and hands it back on disconnect, so each test case
+    does not pay a fresh key exchange and authentication for every node.
+    """
+
+    def __init__(self, ttl_secs=300, enabled=True):
+        """Initialise the pool.
+
+        Kwargs:
+            ttl_secs (int): Time in seconds an idle connection is kept
+                before it is evicted. Default is 300 seconds.
+
+            enabled (bool): Set to False to disable pooling, connections
+                handed back are then closed.
+        """
+        self.g_util = GenericUtils()
+        self.ttl_secs = ttl_secs
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> list of (ssh client, time released)
+        self.__idle = dict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def get_key(host, username, password, ipv4=True):
+        """
+        Returns the key under which a connection is pooled. The password
+        is part of the key, so a connection is only reused with the
+        credentials it was authenticated with.
+
+        Args:
+            host (str): IP address of the node.
+
+            username (str): Username the connection is authenticated as.
+
+            password (str): Password the connection is authenticated with.
+
+        Kwargs:
+            ipv4 (bool): True if the host is an ipv4 address.
+
+        Returns:
+            tuple. The pool key.
+        """
+        return (host, username,
+                hashlib.sha256(str(password)).hexdigest(), ipv4)
+
+    @staticmethod
+    def is_healthy(ssh):
+        """
+        Checks that the transport of a pooled connection is still usable.
+
+        Args:
+            ssh (SSHClient): The connection to check.
+
+        Returns:
+            bool. True if the transport is active and responds or False
+                otherwise.
+        """
+        transport = ssh.get_transport()
+
+        if not transport or not transport.is_active():
+            return False
+
+        try:
+            # Forces a write on the socket, fails if the peer has gone
+            transport.send_ignore()
+        except Exception:
+            return False
+
+        return True
+
+    @staticmethod
+    def __close(ssh):
+        """
+        Closes a connection, ignoring any errors.
+
+        Args:
+            ssh (SSHClient): The connection to close.
+        """
+        try:
+            ssh.close()
+        except Exception:
+            pass
+
+    def acquire(self, key):
+        """
+        Checks a healthy idle connection out of the pool.
+
+        Args:
+            key (tuple): Pool key as returned by get_key.
+
+        Returns:
+            SSHClient. An authenticated connection or None if no healthy
+                connection is available for the key.
+        """
+        if not self.enabled:
+            return None
+
+        self.evict_expired()
+        # Connections of the user authenticated with another password are
+        # stale once the password has changed
+        self.discard_user(key[0], key[1], keep_key=key)
+
+        while True:
+            with self.__lock:
+                idle = self.__idle.get(key)
+                if not idle:
+                    self.misses += 1
+                    return None
+                ssh, _ = idle.pop()
+
+            if self.is_healthy(ssh):
+                with self.__lock:
+                    self.hits += 1
+                return ssh
+
+            with self.__lock:
+                self.evictions += 1
+            self.__close(ssh)
+
+    def release(self, key, ssh):
+        """
+        Hands a connection back to the pool for reuse.
+
+        Args:
+            key (tuple): Pool key as returned by get_key.
+
+            ssh (SSHClient): The connection to hand back.
+        """
+        if not self.enabled:
+            self.__close(ssh)
+            return
+
+        with self.__lock:
+            self.__idle.setdefault(key, list()).append((ssh, time.time()))
+
+    def evict_expired(self):
+        """
+        Closes all idle connections which have been in the pool for longer
+        than the TTL.
+        """
+        expired = list()
+        oldest_allowed = time.time() - self.ttl_secs
+
+        with self.__lock:
+            for key in self.__idle.keys():
+                keep = list()
+                for ssh, released in self.__idle[key]:
+                    if released < oldest_allowed:
+                        expired.append(ssh)
+                    else:
+                        keep.append((ssh, released))
+                if keep:
+                    self.__idle[key] = keep
+                else:
+                    del self.__idle[key]
+            self.evictions += len(expired)
+
+        for ssh in expired:
+            self.__close(ssh)
+
+    def discard_user(self, host, username, keep_key=None):
+        """
+        Closes the idle connections of a user on a node, e.g. when the
+        password of the user changes.
+
+        Args:
+            host (str): IP address of the node.
+
+            username (str): The user.
+
+        Kwargs:
+            keep_key (tuple): Pool key of connections to keep, if any.
+        """
+        discarded = list()
+
+        with self.__lock:
+            for key in self.__idle.keys():
+                if key[0] == host and key[1] == username and \
+                        key != keep_key:
+                    discarded.extend([ssh for ssh, _ in self.__idle[key]])
+                    del self.__idle[key]
+            self.evictions += len(discarded)
+
+        for ssh in discarded:
+            self.__close(ssh)
+
+    def close_all(self):
+        """
+        Closes all idle connections in the pool.
+        """
+        with self.__lock:
+            idle = self.__idle
+            self.__idle = dict()
+
+        for connections in idle.values():
+            for ssh, _ in connections:
+                self.__close(ssh)
+
+    def get_stats(self):
+        """
+        Returns the pool counters.
+
+        Returns:
+            dict. Number of hits, misses, evictions and idle connections.
+        """
+        with self.__lock:
+            idle_count = sum([len(conns) for conns in self.__idle.values()])
+
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "idle": idle_count}
+
+    def log_stats(self):
+        """
+        Logs the pool counters.
+        """
+        self.g_util.log("info", "SSH connection pool: {0}"
+                        .format(self.get_stats()))
+
+
+SSH_POOL = SSHConnectionPool(
+    ttl_secs=int(environ.get("LITP_SSH_POOL_TTL", "300")),
+    enabled=environ.get("LITP_SSH_POOL", "true") == "true")
+
+atexit.register(SSH_POOL.close_all)
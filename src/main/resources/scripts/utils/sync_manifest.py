@@ -0,0 +1,320 @@
+"""
+Sync Manifest
+
+Per node record, kept for the session, of the content of files copied to
+or checksummed on the node, so files already on the node are not sent
+again.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import os
+import re
+import threading
+from sftp_transfer import SftpTransfer
+
+
+class SyncManifest(object):
+    """Checksums of files on one node, keyed by remote path.
+
+    An entry is trusted while the remote file keeps the size, inode, change
+    time and sub-second modification time recorded with it, which one stat
+    command checks for all files of a copy. The change time cannot be set
+    back by users, so a file rewritten in the same second, or given back
+    its old modification time, is not mistaken for the recorded one. Entries are also indexed by checksum, so content
+    already on the node at another path is copied there on the node
+    instead of being sent again.
+    """
+
+    # Size, inode, change time and modification time as printed by stat %y,
+    # e.g. '2026-10-18 10:00:00.123456789 +0000'
+    STAT_REGEX = re.compile(r'^S (\d+) (\d+) (\d+) (\S+ \S+ \S+) (.+)$')
+
+    # Files at least this large which changed on the node are updated by
+    # sending only their changed blocks
+    DELTA_MIN_SIZE = 1024 * 1024
+
+    DELTA_BLOCK_SIZE = 65536
+
+    def __init__(self):
+        """Initialise an empty manifest.
+        """
+        # remote path -> (md5 hex digest, (size, inode, ctime, mtime))
+        self.__entries = dict()
+        # md5 hex digest -> set of remote paths
+        self.__by_checksum = dict()
+        self.__lock = threading.Lock()
+        # Number of files not sent and number of bytes not sent
+        self.files_saved = 0
+        self.bytes_saved = 0
+
+    def record(self, remote_path, checksum, stat):
+        """
+        Records the content of a file on the node.
+
+        Args:
+            remote_path (str): Path of the remote file.
+
+            checksum (str): md5 hex digest of the file.
+
+            stat (tuple): Size, inode, change time and modification time of
+                the remote file, as returned by parse_stats.
+        """
+        with self.__lock:
+            self.__forget(remote_path)
+            self.__entries[remote_path] = (checksum, stat)
+            self.__by_checksum.setdefault(checksum, set()).add(remote_path)
+
+    def forget(self, remote_path):
+        """
+        Removes a file from the manifest.
+
+        Args:
+            remote_path (str): Path of the remote file.
+        """
+        with self.__lock:
+            self.__forget(remote_path)
+
+    def __forget(self, remote_path):
+        """
+        Removes a file from the manifest. Must be called holding the lock.
+
+        Args:
+            remote_path (str): Path of the remote file.
+        """
+        entry = self.__entries.pop(remote_path, None)
+
+        if entry:
+            self.__by_checksum[entry[0]].discard(remote_path)
+
+    def get_checksum(self, remote_path, stat):
+        """
+        Returns the recorded checksum of a file if it is still current.
+
+        Args:
+            remote_path (str): Path of the remote file.
+
+            stat (tuple): Current size, inode, change time and modification
+                time of the remote file.
+
+        Returns:
+            str. The md5 hex digest or None if the file is not recorded or
+                changed since it was recorded.
+        """
+        with self.__lock:
+            entry = self.__entries.get(remote_path)
+
+        if entry and entry[1] == stat:
+            return entry[0]
+
+        return None
+
+    def get_paths(self, checksum):
+        """
+        Returns the remote paths recorded with a checksum.
+
+        Args:
+            checksum (str): md5 hex digest.
+
+        Returns:
+            list. The remote paths.
+        """
+        with self.__lock:
+            return sorted(self.__by_checksum.get(checksum, set()))
+
+    def is_recorded(self, remote_path):
+        """
+        Checks if a file is in the manifest.
+
+        Args:
+            remote_path (str): Path of the remote file.
+
+        Returns:
+            bool. True if the file is recorded.
+        """
+        with self.__lock:
+            return remote_path in self.__entries
+
+    @staticmethod
+    def get_stat_cmd(remote_paths):
+        """
+        Returns a command printing 'S <size> <inode> <ctime> <mtime> <path>'
+        for each remote path which is a file. The modification time is
+        printed with sub-second precision.
+
+        Args:
+            remote_paths (list): The remote paths.
+
+        Returns:
+            str. The command.
+        """
+        checks = ["[ -f {0} ] && stat -c 'S %s %i %Z %y %n' {0}".format(
+            SftpTransfer.quote(remote_path))
+                  for remote_path in remote_paths]
+
+        return "; ".join(checks + ["true"])
+
+    def get_check_cmd(self, file_pairs):
+        """
+        Returns the command checking the node before a copy. Destination
+        files and other recorded files with the same content are stat'ed.
+        Destination files not in the manifest are also checksummed if they
+        have the size of the local file.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs.
+
+        Returns:
+            str. The command, whose output is read by plan.
+        """
+        stat_paths = set()
+        remote_sizes = dict()
+
+        for local_path, remote_path in file_pairs:
+            stat_paths.add(remote_path)
+            stat_paths.update(self.get_paths(
+                SftpTransfer.get_local_checksum(local_path)))
+            if not self.is_recorded(remote_path):
+                remote_sizes[remote_path] = os.path.getsize(local_path)
+
+        return "{0}; {1}".format(
+            self.get_stat_cmd(sorted(stat_paths)),
+            SftpTransfer.get_remote_checksums_cmd(remote_sizes))
+
+    def parse_stats(self, stdout):
+        """
+        Parses the output of a stat command.
+
+        Args:
+            stdout (list): The output of the command.
+
+        Returns:
+            dict. Remote path mapped to (size, inode, ctime, mtime).
+        """
+        stats = dict()
+
+        for line in stdout:
+            match = self.STAT_REGEX.match(line.strip())
+            if match:
+                stats[match.group(5)] = (int(match.group(1)),
+                                         int(match.group(2)),
+                                         int(match.group(3)),
+                                         match.group(4))
+
+        return stats
+
+    def plan(self, file_pairs, stdout):
+        """
+        Decides how to copy each file from the output of the check
+        command. Checksums found on the node are recorded.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs.
+
+            stdout (list): The output of the command from get_check_cmd.
+
+        Returns:
+            list. (action, local path, remote path, source) tuples in the
+                order of file_pairs. The action is 'skip' if the content is
+                already at the remote path, 'copy' if it is at the source
+                path on the node, 'delta' if the remote file should be
+                updated block by block and 'put' if the file must be sent.
+        """
+        stats = self.parse_stats(stdout)
+        remote_checksums = SftpTransfer.get_remote_checksums(stdout)
+
+        for remote_path, checksum in remote_checksums.iteritems():
+            if remote_path in stats:
+                self.record(remote_path, checksum, stats[remote_path])
+
+        actions = list()
+        for local_path, remote_path in file_pairs:
+            checksum = SftpTransfer.get_local_checksum(local_path)
+            size = os.path.getsize(local_path)
+            stat = stats.get(remote_path)
+
+            if stat and self.get_checksum(remote_path, stat) == checksum:
+                self.files_saved += 1
+                self.bytes_saved += size
+                actions.append(('skip', local_path, remote_path, None))
+                continue
+
+            sources = [path for path in self.get_paths(checksum)
+                       if path in stats and
+                       self.get_checksum(path, stats[path]) == checksum]
+            if sources:
+                self.files_saved += 1
+                self.bytes_saved += size
+                actions.append(('copy', local_path, remote_path, sources[0]))
+            elif stat and stat[0] and size >= self.DELTA_MIN_SIZE:
+                actions.append(('delta', local_path, remote_path, None))
+            else:
+                actions.append(('put', local_path, remote_path, None))
+
+        return actions
+
+    def record_copied(self, file_pairs, stdout):
+        """
+        Records the files of a copy from the output of a stat command run
+        after it.
+
+        Args:
+            file_pairs (list): (local path, remote path) pairs copied.
+
+            stdout (list): The output of the command from get_stat_cmd.
+        """
+        stats = self.parse_stats(stdout)
+
+        for local_path, remote_path in file_pairs:
+            if remote_path in stats:
+                self.record(remote_path,
+                            SftpTransfer.get_local_checksum(local_path),
+                            stats[remote_path])
+            else:
+                self.forget(remote_path)
+
+    @classmethod
+    def get_block_checksums_cmd(cls, remote_path):
+        """
+        Returns a command printing the md5 checksum of each block of a
+        remote file.
+
+        Args:
+            remote_path (str): Path of the remote file.
+
+        Returns:
+            str. The command.
+        """
+        script = ("import hashlib, sys\n"
+                  "remote_file = open(sys.argv[1], 'rb')\n"
+                  "while True:\n"
+                  "    data = remote_file.read(int(sys.argv[2]))\n"
+                  "    if not data:\n"
+                  "        break\n"
+                  "    sys.stdout.write(hashlib.md5(data).hexdigest()\n"
+                  "                     + '\\n')\n")
+
+        return "python -c {0} {1} {2}".format(
+            SftpTransfer.quote(script), SftpTransfer.quote(remote_path),
+            cls.DELTA_BLOCK_SIZE)
+
+
+SYNC_MANIFESTS = dict()
+SYNC_MANIFESTS_LOCK = threading.Lock()
+
+
+def get_sync_manifest(key):
+    """
+    Returns the manifest of a node, creating it if needed.
+
+    Args:
+        key (str): Identifies the node, e.g. '10.10.10.100'.
+
+    Returns:
+        SyncManifest. The manifest for the node.
+    """
+    with SYNC_MANIFESTS_LOCK:
+        if key not in SYNC_MANIFESTS:
+            SYNC_MANIFESTS[key] = SyncManifest()
+
+        return SYNC_MANIFESTS[key]
@@ -0,0 +1,277 @@
+"""
+Tar Stream
+
+Copies directory trees to and from a node as a single compressed tar
+stream over one SSH channel, extracting at the receiver as data arrives.
+
+Note: :synopsis: for this file is located in source_code_docs.rst
+"""
+
+import subprocess
+import threading
+import time
+from sftp_transfer import SftpTransfer
+
+
+class TarStream(object):
+    """Streams a tar archive of a directory over an SSH channel.
+
+    The archive is compressed with a codec chosen from the speed of the
+    link to the node, which is measured once per host. Fast links are not
+    compressed, as compression would then be slower than the link.
+    """
+
+    # (minimum link speed in bytes per second, compress cmd, decompress cmd)
+    # in order of preference
+    CODECS = [(40 * 1024 * 1024, "cat", "cat"),
+              (4 * 1024 * 1024, "gzip -1", "gzip -dc"),
+              (0, "gzip -6", "gzip -dc")]
+
+    # Bytes read from /dev/zero on the node to measure the link speed
+    PROBE_SIZE = 2 * 1024 * 1024
+
+    CHUNK_SIZE = 65536
+
+    # host -> measured link speed in bytes per second
+    LINK_SPEEDS = dict()
+    LINK_SPEEDS_LOCK = threading.Lock()
+
+    def __init__(self, transport, host, timeout_secs=60):
+        """Initialise the stream.
+
+        Args:
+            transport (Transport): The paramiko transport of a connection
+                to the node.
+
+            host (str): The address of the node, identifies its link speed.
+
+        Kwargs:
+            timeout_secs (int): Time to wait for data before the transfer
+                fails.
+        """
+        self.transport = transport
+        self.host = host
+        self.timeout_secs = timeout_secs
+
+    def __open_channel(self, cmd):
+        """
+        Runs a command on the node in a new channel.
+
+        Args:
+            cmd (str): The command.
+
+        Returns:
+            Channel. The channel the command runs in.
+        """
+        channel = self.transport.open_session()
+        channel.settimeout(self.timeout_secs)
+        channel.exec_command(cmd)
+
+        return channel
+
+    def get_link_speed(self):
+        """
+        Returns the speed of the link to the node, measured on first use by
+        reading data from the node. The time to the first byte is excluded
+        so command latency does not count.
+
+        Returns:
+            float. The link speed in bytes per second.
+        """
+        with self.LINK_SPEEDS_LOCK:
+            if self.host in self.LINK_SPEEDS:
+                return self.LINK_SPEEDS[self.host]
+
+        channel = self.__open_channel("head -c {0} /dev/zero"
+                                      .format(self.PROBE_SIZE))
+        try:
+            received = len(channel.recv(self.CHUNK_SIZE))
+            start_time = time.time()
+            first_chunk = received
+            while True:
+                data = channel.recv(self.CHUNK_SIZE)
+                if not data:
+                    break
+                received += len(data)
+        finally:
+            channel.close()
+
+        elapsed = max(time.time() - start_time, 0.001)
+        link_speed = (received - first_chunk) / elapsed
+
+        with self.LINK_SPEEDS_LOCK:
+            self.LINK_SPEEDS[self.host] = link_speed
+
+        return link_speed
+
+    def choose_codec(self):
+        """
+        Chooses the compression codec for the link to the node.
+
+        Returns:
+            str, str. The compress and decompress commands.
+        """
+        link_speed = self.get_link_speed()
+
+        for min_speed, compress_cmd, decompress_cmd in self.CODECS:
+            if link_speed >= min_speed:
+                return compress_cmd, decompress_cmd
+
+        return self.CODECS[-1][1:]
+
+    @staticmethod
+    def get_pack_cmd(src_dir, compress_cmd):
+        """
+        Returns a command writing a compressed tar archive of a directory to
+        stdout.
+
+        Args:
+            src_dir (str): The directory to archive.
+
+            compress_cmd (str): The compress command.
+
+        Returns:
+            str. The command.
+        """
+        return "set -o pipefail; tar -cf - -C {0} . | {1}".format(
+            SftpTransfer.quote(src_dir), compress_cmd)
+
+    @staticmethod
+    def get_unpack_cmd(dest_dir, decompress_cmd):
+        """
+        Returns a command extracting a compressed tar archive read from
+        stdin into a directory, creating the directory if needed.
+
+        Args:
+            dest_dir (str): The directory to extract into.
+
+            decompress_cmd (str): The decompress command.
+
+        Returns:
+            str. The command.
+        """
+        return "set -o pipefail; mkdir -p {0} && {1} | tar -xf - -C {0}"\
+            .format(SftpTransfer.quote(dest_dir), decompress_cmd)
+
+    @staticmethod
+    def __run_local(cmd, **kwargs):
+        """
+        Starts a command on the machine running the test.
+
+        Args:
+            cmd (str): The command.
+
+        Kwargs:
+            Passed to subprocess.Popen.
+
+        Returns:
+            Popen. The process.
+        """
+        return subprocess.Popen(["/bin/bash", "-c", cmd],
+                                stderr=subprocess.PIPE, **kwargs)
+
+    @staticmethod
+    def __check(returnc, stderr, description):
+        """
+        Raises an error if a side of the transfer failed.
+
+        Args:
+            returnc (int): The return code of the command.
+
+            stderr (str): The stderr of the command.
+
+            description (str): Describes the command.
+
+        Raises:
+            IOError if the return code is not 0.
+        """
+        if returnc != 0:
+            raise IOError("{0} failed with return code {1}: {2}"
+                          .format(description, returnc, stderr.strip()))
+
+    def upload(self, local_dir, remote_dir):
+        """
+        Copies the contents of a local directory into a directory on the
+        node.
+
+        Args:
+            local_dir (str): The local directory.
+
+            remote_dir (str): The remote directory, created if needed.
+
+        Returns:
+            int. The number of bytes sent over the link.
+
+        Raises:
+            IOError if the transfer failed.
+        """
+        compress_cmd, decompress_cmd = self.choose_codec()
+        sent = 0
+
+        pack = self.__run_local(self.get_pack_cmd(local_dir, compress_cmd),
+                                stdout=subprocess.PIPE)
+        channel = self.__open_channel(
+            self.get_unpack_cmd(remote_dir, decompress_cmd))
+
+        try:
+            while True:
+                data = pack.stdout.read(self.CHUNK_SIZE)
+                if not data:
+                    break
+                channel.sendall(data)
+                sent += len(data)
+
+            channel.shutdown_write()
+            self.__check(pack.wait(), pack.stderr.read(), "Local tar")
+            self.__check(channel.recv_exit_status(),
+                         channel.makefile_stderr().read(), "Remote untar")
+        finally:
+            channel.close()
+            if pack.poll() is None:
+                pack.kill()
+
+        return sent
+
+    def download(self, remote_dir, local_dir):
+        """
+        Copies the contents of a directory on the node into a local
+        directory.
+
+        Args:
+            remote_dir (str): The remote directory.
+
+            local_dir (str): The local directory, created if needed.
+
+        Returns:
+            int. The number of bytes received over the link.
+
+        Raises:
+            IOError if the transfer failed.
+        """
+        compress_cmd, decompress_cmd = self.choose_codec()
+        received = 0
+
+        channel = self.__open_channel(
+            self.get_pack_cmd(remote_dir, compress_cmd))
+        unpack = self.__run_local(
+            self.get_unpack_cmd(local_dir, decompress_cmd),
+            stdin=subprocess.PIPE)
+
+        try:
+            while True:
+                data = channel.recv(self.CHUNK_SIZE)
+                if not data:
+                    break
+                unpack.stdin.write(data)
+                received += len(data)
+
+            unpack.stdin.close()
+            self.__check(channel.recv_exit_status(),
+                         channel.makefile_stderr().read(), "Remote tar")
+            self.__check(unpack.wait(), unpack.stderr.read(), "Local untar")
+        finally:
+            channel.close()
+            if unpack.poll() is None:
+                unpack.kill()
+
+        return received